@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Agregados compartidos de los reportes (Fases 2 y 3)
+Calcula en una sola pasada los conteos por grupo, los nulos por columna y los
+promedios que usan el reporte de análisis, las gráficas, los dashboards y la
+monitorización, y los memoriza por dataframe: cada consumidor pide los
+agregados con obtener_agregados(df) y solo el primero los calcula.
+"""
+
+import weakref
+
+# Columnas categóricas cuyos conteos por valor se reutilizan en los reportes
+COLUMNAS_GRUPO = ['Ciudad_Act', 'Region', 'Nivel_Riesgo', 'Tamaño_Empresa', 'CodDANE']
+
+# Columnas numéricas cuyo promedio se reutiliza en los reportes
+COLUMNAS_MEDIA = ['Porcentaje_Completitud', 'Puntuacion_Riesgo']
+
+class Agregados:
+    """Conteos por grupo, nulos por columna y promedios de un dataframe, calculados una vez"""
+
+    def __init__(self, df):
+        self.total = len(df)
+        self.columnas = tuple(df.columns)
+        self.nulos = df.isna().sum()
+        self.conteos = {col: df[col].value_counts() for col in COLUMNAS_GRUPO if col in df.columns}
+        self.medias = {col: df[col].mean() for col in COLUMNAS_MEDIA if col in df.columns}
+
+    def conteo(self, columna, top=None):
+        """Número de filas por valor de la columna, de mayor a menor (los top primeros si se indica)"""
+        conteos = self.conteos[columna]
+        return conteos if top is None else conteos.head(top)
+
+    def proporcion(self, columna, top=None):
+        """Proporción de filas no nulas por valor de la columna (equivale a value_counts(normalize=True))"""
+        conteos = self.conteos[columna]
+        proporciones = conteos / conteos.sum()
+        return proporciones if top is None else proporciones.head(top)
+
+    def unicos(self, columna):
+        """Número de valores distintos no nulos de la columna"""
+        return int((self.conteos[columna] > 0).sum())
+
+    def no_nulos(self, columna):
+        """Número de filas con valor en la columna"""
+        return int(self.total - self.nulos[columna])
+
+    def total_en(self, columna, valores):
+        """Número de filas cuya columna toma alguno de los valores indicados"""
+        conteos = self.conteos[columna]
+        return int(conteos[conteos.index.isin(valores)].sum())
+
+    def media(self, columna):
+        """Promedio de una columna numérica (sin contar nulos)"""
+        return self.medias[columna]
+
+# Agregados memorizados por dataframe: id(df) -> (referencia débil, agregados)
+_MEMORIA = {}
+
+def obtener_agregados(df):
+    """Devuelve los agregados de df, calculándolos solo la primera vez.
+
+    Si df cambió de filas o columnas desde el cálculo anterior, se recalculan.
+    Los cambios de valores en sitio (df.loc[...] = ..., fillna(inplace=True))
+    no se detectan: quien modifique así un dataframe ya agregado debe llamar a
+    invalidar_agregados(df) o trabajar sobre una copia.
+    """
+    clave = id(df)
+    entrada = _MEMORIA.get(clave)
+    if entrada is not None:
+        referencia, agregados = entrada
+        if referencia() is df and agregados.total == len(df) and agregados.columnas == tuple(df.columns):
+            return agregados
+
+    agregados = Agregados(df)
+    _MEMORIA[clave] = (weakref.ref(df), agregados)
+    # La entrada se descarta cuando el dataframe deja de existir
+    weakref.finalize(df, _MEMORIA.pop, clave, None)
+    return agregados
+
+def invalidar_agregados(df):
+    """Descarta los agregados memorizados de df (tras modificar sus valores en sitio)"""
+    entrada = _MEMORIA.get(id(df))
+    if entrada is not None and entrada[0]() is df:
+        del _MEMORIA[id(df)]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Rutas críticas del ETL a escala
+Mide limpiar_datos, eliminar_duplicados_avanzado, calcular_completitud,
+calcular_puntuacion_riesgo, crear_base_datos y la ejecución de extremo a
+extremo (limpieza, enriquecimiento, integración y carga) sobre datos
+sintéticos con el esquema y la suciedad de BD.xlsx (generar_datos_sinteticos.py).
+
+Los tiempos se comparan con las líneas base guardadas en lineas_base.json
+(por número de filas) y se marca como regresión toda etapa que tarde más que
+la línea base más la tolerancia; en ese caso el benchmark termina con código 1.
+Las líneas base dependen de la máquina: regenérelas con --guardar-linea-base
+en la máquina donde se vayan a comparar.
+
+Uso: python benchmarks/benchmark_etl.py [--filas 1e5 1e6 1e7] [--repeticiones N]
+                                        [--tolerancia 0.25] [--guardar-linea-base]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(BASE_DIR), str(BASE_DIR / "data")]
+
+from generar_datos_sinteticos import generar_datos, leer_datos
+from limpieza_datos import eliminar_duplicados_avanzado, limpiar_bloque, limpiar_datos
+from fase2_analisis import calcular_completitud, enriquecer_datos
+from fase3_integracion import calcular_puntuacion_riesgo, crear_base_datos, integrar_datos_externos
+
+RUTA_LINEAS_BASE = Path(__file__).resolve().parent / "lineas_base.json"
+
+# Margen sobre la línea base antes de considerar una etapa como regresión
+TOLERANCIA = 0.25
+
+def cronometrar(funcion, *args, repeticiones=1):
+    """Ejecuta la función sin su salida por consola y devuelve (mejor tiempo en segundos, resultado)"""
+    mejor, resultado = float('inf'), None
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultado = funcion(*args)
+            mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def cargar_en_base_nueva(df):
+    """crear_base_datos en un directorio temporal (siempre una carga inicial completa)"""
+    with tempfile.TemporaryDirectory() as directorio:
+        if not crear_base_datos(df, Path(directorio)):
+            raise RuntimeError("crear_base_datos falló")
+
+def extremo_a_extremo(df):
+    """Limpieza, enriquecimiento, integración y carga en SQLite"""
+    df_integrado = integrar_datos_externos(enriquecer_datos(limpiar_datos(df)))
+    cargar_en_base_nueva(df_integrado)
+    return df_integrado
+
+def medir_etapas(df, repeticiones=1):
+    """Mide cada etapa sobre el conjunto de datos crudo; devuelve {etapa: segundos}"""
+    tiempos = {}
+    tiempos['limpiar_datos'], df_limpio = cronometrar(limpiar_datos, df, repeticiones=repeticiones)
+
+    # La eliminación de duplicados se mide sola, sobre la salida de los pasos por fila
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_bloque = limpiar_bloque(df)
+    tiempos['eliminar_duplicados_avanzado'], _ = cronometrar(
+        eliminar_duplicados_avanzado, df_bloque, repeticiones=repeticiones)
+    del df_bloque
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_integrado = integrar_datos_externos(enriquecer_datos(df_limpio))
+    tiempos['calcular_completitud'], _ = cronometrar(calcular_completitud, df_limpio, repeticiones=repeticiones)
+    tiempos['calcular_puntuacion_riesgo'], _ = cronometrar(
+        calcular_puntuacion_riesgo, df_integrado, repeticiones=repeticiones)
+    tiempos['crear_base_datos'], _ = cronometrar(cargar_en_base_nueva, df_integrado, repeticiones=repeticiones)
+    del df_limpio, df_integrado
+
+    tiempos['extremo_a_extremo'], _ = cronometrar(extremo_a_extremo, df, repeticiones=repeticiones)
+    return tiempos
+
+def cargar_lineas_base(ruta=RUTA_LINEAS_BASE):
+    """Lee las líneas base guardadas ({filas: {etapa: segundos}})"""
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text(encoding='utf-8'))
+
+def guardar_lineas_base(lineas_base, ruta=RUTA_LINEAS_BASE):
+    """Guarda las líneas base junto con una descripción de la máquina"""
+    lineas_base['_entorno'] = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+    }
+    ruta.write_text(json.dumps(lineas_base, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+
+def comparar(tiempos, linea_base, tolerancia=TOLERANCIA):
+    """Imprime los tiempos frente a la línea base y devuelve las etapas con regresión"""
+    regresiones = []
+    print(f"{'Etapa':<30} {'Tiempo':>9} {'Base':>9} {'Cambio':>8}")
+    for etapa, segundos in tiempos.items():
+        base = linea_base.get(etapa)
+        if base is None:
+            print(f"{etapa:<30} {segundos:8.3f}s {'-':>9} {'-':>8}")
+            continue
+        cambio = segundos / base - 1
+        estado = ""
+        if cambio > tolerancia:
+            estado = "  ✗ REGRESIÓN"
+            regresiones.append(etapa)
+        print(f"{etapa:<30} {segundos:8.3f}s {base:8.3f}s {cambio:+7.1%}{estado}")
+    return regresiones
+
+def main():
+    """Función principal del benchmark"""
+    parser = argparse.ArgumentParser(description="Mide las rutas críticas del ETL sobre datos sintéticos")
+    parser.add_argument('--filas', type=float, nargs='+', default=[1e5],
+                        help="tamaños a medir (por defecto 1e5; admite 1e6 y 1e7)")
+    parser.add_argument('--datos', default=None,
+                        help="archivo generado con generar_datos_sinteticos.py (en lugar de generar en memoria)")
+    parser.add_argument('--repeticiones', type=int, default=3, help="repeticiones por etapa (se toma la mejor)")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help="margen relativo sobre la línea base antes de marcar una regresión")
+    parser.add_argument('--guardar-linea-base', action='store_true',
+                        help="guardar los tiempos medidos como nuevas líneas base")
+    args = parser.parse_args()
+
+    lineas_base = cargar_lineas_base()
+    regresiones = []
+
+    if args.datos:
+        conjuntos = [(None, args.datos)]
+    else:
+        conjuntos = [(int(filas), None) for filas in args.filas]
+
+    for filas, ruta in conjuntos:
+        print("=" * 60)
+        inicio = time.perf_counter()
+        df = leer_datos(ruta) if ruta else generar_datos(filas)
+        filas = len(df)
+        print(f"BENCHMARK ETL - {filas:,} filas sintéticas (preparadas en {time.perf_counter() - inicio:.1f}s)")
+        print("=" * 60)
+
+        tiempos = medir_etapas(df, args.repeticiones)
+        del df
+        clave = str(filas)
+        regresiones += [f"{etapa} ({filas:,} filas)"
+                        for etapa in comparar(tiempos, lineas_base.get(clave, {}), args.tolerancia)]
+        if args.guardar_linea_base:
+            lineas_base[clave] = {etapa: round(segundos, 4) for etapa, segundos in tiempos.items()}
+
+    if args.guardar_linea_base:
+        guardar_lineas_base(lineas_base)
+        print(f"\n✓ Líneas base guardadas en {RUTA_LINEAS_BASE}")
+    elif regresiones:
+        print(f"\n✗ Regresiones (tolerancia {args.tolerancia:.0%}): {', '.join(regresiones)}")
+        sys.exit(1)
+    else:
+        print("\n✓ Sin regresiones frente a las líneas base")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Normalización de texto (Fase 1, paso 3)
+Compara la ruta por celda (Series.apply con normalizar_texto) contra la
+versión por columna (normalizar_columna_texto) y verifica que ambas producen
+exactamente el mismo resultado.
+
+Uso: python benchmarks/benchmark_normalizacion_texto.py [factor_replicacion]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+from limpieza_datos import cargar_datos, normalizar_texto, normalizar_columna_texto
+
+def medir(funcion, repeticiones=3):
+    """Devuelve el mejor tiempo (segundos) de varias ejecuciones y el último resultado"""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def main():
+    """Función principal del benchmark"""
+    factor = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    df = cargar_datos(Path.cwd() / "data" / "raw" / "BD.xlsx")
+    if df is None:
+        return
+
+    df = pd.concat([df] * factor, ignore_index=True)
+    text_columns = [col for col in df.columns if df[col].dtype == 'object']
+    celdas = len(df) * len(text_columns)
+
+    print("=" * 60)
+    print(f"BENCHMARK NORMALIZACIÓN DE TEXTO ({len(df)} filas, {celdas} celdas)")
+    print("=" * 60)
+
+    total_celda = total_columna = 0.0
+    for col in text_columns:
+        t_celda, r_celda = medir(lambda: df[col].apply(normalizar_texto))
+        t_columna, r_columna = medir(lambda: normalizar_columna_texto(df[col]))
+
+        # La salida debe ser idéntica valor a valor, incluidos los nulos
+        pd.testing.assert_series_equal(r_celda, r_columna)
+
+        total_celda += t_celda
+        total_columna += t_columna
+        print(f"- {col}: por celda {t_celda:.3f}s | por columna {t_columna:.3f}s | x{t_celda / t_columna:.1f}")
+
+    print(f"\nTotal por celda:   {total_celda:.3f}s ({celdas / total_celda:,.0f} celdas/s)")
+    print(f"Total por columna: {total_columna:.3f}s ({celdas / total_columna:,.0f} celdas/s)")
+    print(f"Aceleración: x{total_celda / total_columna:.1f}")
+
+if __name__ == "__main__":
+    main()
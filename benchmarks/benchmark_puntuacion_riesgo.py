@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Puntuación y nivel de riesgo (Fase 3)
+Compara la versión anterior fila a fila (iterrows + pd.cut) contra el motor de
+reglas vectorizado (calcular_puntuacion_riesgo + clasificar_nivel_riesgo),
+verifica que ambas producen exactamente el mismo resultado y mide el motor
+vectorizado sobre varios millones de filas.
+
+Uso: python benchmarks/benchmark_puntuacion_riesgo.py [millones_de_filas]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fase3_integracion import calcular_puntuacion_riesgo, clasificar_nivel_riesgo
+
+def puntuacion_fila_a_fila(df):
+    """Implementación de referencia anterior (una iteración de Python por fila)"""
+    puntuaciones = []
+    for _, row in df.iterrows():
+        puntuacion = 5
+        completitud = row.get('Porcentaje_Completitud', 50)
+        if completitud < 60:
+            puntuacion += 2
+        elif completitud < 80:
+            puntuacion += 1
+        region = row.get('Region', 'OTRA')
+        if region in ['CAUCA', 'NARIÑO']:
+            puntuacion += 2
+        elif region == 'OTRA':
+            puntuacion += 1
+        tamaño = row.get('Tamaño_Empresa', 'PEQUEÑA')
+        if tamaño == 'PEQUEÑA':
+            puntuacion += 1
+        puntuaciones.append(min(puntuacion, 10))
+    return puntuaciones
+
+def generar_datos(filas, semilla=0):
+    """Genera datos sintéticos con las columnas que usan las reglas de riesgo (incluye nulos)"""
+    rng = np.random.default_rng(semilla)
+    completitud = rng.choice([0, 12.5, 25, 50, 62.5, 75, 87.5, 100], size=filas).astype(float)
+    completitud[rng.random(filas) < 0.01] = np.nan
+    regiones = np.array(['BOGOTÁ', 'ANTIOQUIA', 'CAUCA', 'NARIÑO', 'OTRA', 'VALLE', None], dtype=object)
+    tamaños = np.array(['GRANDE', 'PEQUEÑA', None], dtype=object)
+    return pd.DataFrame({
+        'Porcentaje_Completitud': completitud,
+        'Region': rng.choice(regiones, size=filas),
+        'Tamaño_Empresa': rng.choice(tamaños, size=filas),
+    })
+
+def main():
+    """Función principal del benchmark"""
+    millones = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+
+    print("=" * 60)
+    print("BENCHMARK PUNTUACIÓN DE RIESGO")
+    print("=" * 60)
+
+    # Equivalencia con la versión fila a fila sobre una muestra
+    muestra = generar_datos(50_000)
+    inicio = time.perf_counter()
+    referencia = puntuacion_fila_a_fila(muestra)
+    nivel_referencia = pd.cut(referencia, bins=[0, 3, 6, 9, 10], labels=['BAJO', 'MEDIO', 'ALTO', 'CRÍTICO'])
+    t_filas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    puntuacion = calcular_puntuacion_riesgo(muestra)
+    nivel = clasificar_nivel_riesgo(puntuacion)
+    t_vectorizado = time.perf_counter() - inicio
+
+    np.testing.assert_array_equal(np.asarray(referencia), puntuacion)
+    pd.testing.assert_series_equal(pd.Series(nivel_referencia), nivel)
+    print(f"Muestra de {len(muestra)} filas: fila a fila {t_filas:.3f}s | vectorizado {t_vectorizado:.4f}s "
+          f"| x{t_filas / t_vectorizado:.0f}")
+
+    # Escala: millones de filas con el motor vectorizado
+    df = generar_datos(int(millones * 1_000_000))
+    inicio = time.perf_counter()
+    puntuacion = calcular_puntuacion_riesgo(df)
+    clasificar_nivel_riesgo(puntuacion)
+    t_total = time.perf_counter() - inicio
+    print(f"{len(df)} filas con el motor vectorizado: {t_total:.3f}s ({len(df) / t_total:,.0f} filas/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Memoria de los datos integrados con tipos compactos
+Pasa datos sintéticos con el esquema de BD.xlsx por la limpieza, el
+enriquecimiento y la integración, y compara columna a columna la memoria del
+dataframe con los tipos que pandas infiere (object para los textos, float64
+para los teléfonos leídos de CSV) frente a los tipos compactos del registro de
+esquema_datos: category, string[pyarrow] y números reducidos.
+
+Uso: python benchmarks/benchmark_tipos_compactos.py [filas]
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(BASE_DIR), str(BASE_DIR / "data")]
+
+from generar_datos_sinteticos import generar_datos
+from limpieza_datos import limpiar_datos
+from fase2_analisis import enriquecer_datos
+from fase3_integracion import integrar_datos_externos
+from esquema_datos import ESQUEMA_INTEGRADOS, compactar, informe_memoria, leer_csv
+
+def main():
+    """Función principal del benchmark"""
+    filas = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100_000
+
+    print("=" * 60)
+    print(f"BENCHMARK TIPOS COMPACTOS - {filas:,} filas sintéticas")
+    print("=" * 60)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_integrado = integrar_datos_externos(enriquecer_datos(limpiar_datos(generar_datos(filas))))
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_csv = Path(directorio) / "datos_integrados.csv"
+        df_integrado.to_csv(ruta_csv, index=False)
+
+        # Antes: read_csv sin dtype ni usecols, como hacían los cargadores
+        inicio = time.perf_counter()
+        inferido = pd.read_csv(ruta_csv)
+        t_inferido = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            compacto = leer_csv(ruta_csv, ESQUEMA_INTEGRADOS)
+        t_compacto = time.perf_counter() - inicio
+
+    pd.testing.assert_frame_equal(compacto, compactar(compacto))
+    print(f"Lectura de CSV: tipos inferidos {t_inferido:.2f}s | esquema compartido {t_compacto:.2f}s\n")
+
+    informe = informe_memoria(inferido[compacto.columns], compacto)
+    with pd.option_context('display.width', 120, 'display.max_rows', 100):
+        print(informe.to_string(float_format=lambda valor: f"{valor:.2f}"))
+
+if __name__ == "__main__":
+    main()
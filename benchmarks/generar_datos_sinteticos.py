@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos con el esquema de BD.xlsx
+Produce conjuntos de 100k, 1M o 10M filas con la suciedad de los datos reales
+para medir las rutas críticas del ETL a escala: las columnas y los tipos se
+toman de BD.xlsx, los valores se muestrean de sus distribuciones observadas
+(incluidas las ciudades mal escritas) y se añaden variantes nuevas de las
+ciudades de CORRECCIONES_CIUDADES, teléfonos y códigos DANE mal formados,
+gerentes repetidos en varias empresas, duplicados exactos y casi duplicados
+con errores de digitación.
+
+Uso: python benchmarks/generar_datos_sinteticos.py <filas> [--salida datos.arrow] [--semilla N]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(BASE_DIR), str(BASE_DIR / "data")]
+
+from limpieza_datos import CORRECCIONES_CIUDADES, VALORES_NULOS_EXCEL, enteros_anulables
+
+RUTA_BD = BASE_DIR / "data" / "raw" / "BD.xlsx"
+
+# Filas generadas por bloque (la memoria del generador no depende del total)
+TAMANO_BLOQUE_GENERACION = 500_000
+
+# Proporciones de suciedad añadida sobre la distribución observada en BD.xlsx
+PROPORCIONES_SUCIEDAD = {
+    'ciudad_variante_nueva': 0.05,   # variantes de ciudades que no están en BD.xlsx
+    'telefono_mal_formado': 0.04,    # longitudes inválidas
+    'dane_invalido': 0.03,           # códigos que no tienen 8 dígitos
+    'duplicado_exacto': 0.02,        # filas repetidas
+    'casi_duplicado': 0.015,         # misma empresa con un error de digitación en el nombre
+}
+
+# Fracción de gerentes generales que se repiten en varias empresas
+PROPORCION_GERENTES_REPETIDOS = 0.10
+
+class PerfilBD:
+    """Esquema y distribuciones de valores observadas en BD.xlsx"""
+
+    def __init__(self, ruta_bd=RUTA_BD):
+        if not Path(ruta_bd).exists():
+            raise SystemExit(f"No se encontró {ruta_bd}: el generador toma el esquema y los valores de BD.xlsx")
+        # Con los tipos de cargar_datos (Int64 para teléfonos y códigos DANE)
+        df = enteros_anulables(pd.read_excel(ruta_bd))
+        self.columnas = list(df.columns)
+        self.tipos = df.dtypes.to_dict()
+        self.nulos = df.isna().mean().to_dict()
+        self.valores = {}
+        self.pesos = {}
+        for col in self.columnas:
+            conteos = df[col].value_counts()
+            self.valores[col] = conteos.index.to_numpy()
+            self.pesos[col] = (conteos / conteos.sum()).to_numpy(dtype=np.float64)
+
+def mutar_texto(texto, rng):
+    """Introduce un error de digitación: letra repetida, símbolos al final, mayúsculas o una letra cambiada"""
+    if not texto:
+        return texto
+    posicion = int(rng.integers(len(texto)))
+    tipo = int(rng.integers(4))
+    if tipo == 0:
+        return texto[:posicion] + texto[posicion] + texto[posicion:]
+    if tipo == 1:
+        return texto + ''.join(rng.choice(list("%)=?ZS0"), size=int(rng.integers(1, 4))))
+    if tipo == 2:
+        return ''.join(c.upper() if rng.random() < 0.5 else c.lower() for c in texto)
+    return texto[:posicion] + str(rng.choice(list("AEIOUYZKH"))) + texto[posicion + 1:]
+
+def variantes_ciudades(rng, cantidad=500):
+    """Variantes mal escritas nuevas de las ciudades de CORRECCIONES_CIUDADES"""
+    bases = sorted(set(CORRECCIONES_CIUDADES.values()))
+    return np.array([mutar_texto(str(rng.choice(bases)).title(), rng) for _ in range(cantidad)], dtype=object)
+
+def muestrear(perfil, col, filas, rng):
+    """Muestrea una columna con la distribución y la proporción de nulos observadas"""
+    valores = rng.choice(perfil.valores[col], size=filas, p=perfil.pesos[col])
+    if perfil.tipos[col] == object:
+        valores = valores.astype(object)
+    else:
+        valores = valores.astype(float)
+    valores[rng.random(filas) < perfil.nulos[col]] = None if perfil.tipos[col] == object else np.nan
+    return valores
+
+def digitos_aleatorios(longitudes, rng):
+    """Números con la cantidad de dígitos indicada para cada fila"""
+    minimos = 10.0 ** (longitudes - 1)
+    return np.floor(minimos + rng.random(len(longitudes)) * (10.0 ** longitudes - minimos))
+
+def generar_bloque(perfil, filas, rng, variantes, gerentes_frecuentes):
+    """Genera un bloque de filas con el esquema de BD.xlsx y suciedad realista"""
+    df = pd.DataFrame({col: muestrear(perfil, col, filas, rng) for col in perfil.columnas})
+
+    # Ciudades: además de las variantes observadas, variantes nuevas de las ciudades conocidas
+    nuevas = rng.random(filas) < PROPORCIONES_SUCIEDAD['ciudad_variante_nueva']
+    df.loc[nuevas, 'Ciudad_Act'] = rng.choice(variantes, size=int(nuevas.sum()))
+
+    # Gerentes generales repetidos en varias empresas
+    repetidos = rng.random(filas) < PROPORCION_GERENTES_REPETIDOS
+    elegidos = rng.integers(len(gerentes_frecuentes), size=int(repetidos.sum()))
+    df.loc[repetidos, 'NombresGerenteGeneral_Act'] = gerentes_frecuentes[elegidos, 0]
+    df.loc[repetidos, 'ApellidosGerenteGeneral_Act'] = gerentes_frecuentes[elegidos, 1]
+
+    # Teléfonos mal formados: demasiado cortos o largos
+    for col in ('Telefono_Act1', 'Telefono_Act2'):
+        malos = df[col].notna().to_numpy() & (rng.random(filas) < PROPORCIONES_SUCIEDAD['telefono_mal_formado'])
+        df.loc[malos, col] = digitos_aleatorios(rng.choice([3, 4, 5, 6, 11, 12], size=int(malos.sum())), rng)
+
+    # Códigos DANE inválidos (no tienen 8 dígitos)
+    invalidos = rng.random(filas) < PROPORCIONES_SUCIEDAD['dane_invalido']
+    df.loc[invalidos, 'CodDANE'] = digitos_aleatorios(rng.choice([4, 5, 6, 7, 9], size=int(invalidos.sum())), rng)
+
+    # Casi duplicados: copia de otra fila con un error de digitación en el nombre del gerente
+    casi = np.flatnonzero(rng.random(filas) < PROPORCIONES_SUCIEDAD['casi_duplicado'])
+    if len(casi):
+        origen = rng.integers(filas, size=len(casi))
+        df.iloc[casi] = df.iloc[origen].to_numpy()
+        df.iloc[casi, df.columns.get_loc('NombresGerenteGeneral_Act')] = [
+            mutar_texto(nombre, rng) if isinstance(nombre, str) else nombre
+            for nombre in df['NombresGerenteGeneral_Act'].iloc[casi]
+        ]
+
+    # Duplicados exactos
+    exactos = np.flatnonzero(rng.random(filas) < PROPORCIONES_SUCIEDAD['duplicado_exacto'])
+    if len(exactos):
+        df.iloc[exactos] = df.iloc[rng.integers(filas, size=len(exactos))].to_numpy()
+
+    return df.astype(perfil.tipos)
+
+def generar_bloques(filas, semilla=0, tamano_bloque=TAMANO_BLOQUE_GENERACION, perfil=None):
+    """Genera el conjunto sintético por bloques (todos con las columnas y tipos de BD.xlsx)"""
+    perfil = perfil or PerfilBD()
+    rng = np.random.default_rng(semilla)
+    variantes = variantes_ciudades(rng)
+    cantidad_gerentes = max(filas // 50, 10)
+    gerentes_frecuentes = np.column_stack([
+        rng.choice(perfil.valores['NombresGerenteGeneral_Act'], size=cantidad_gerentes),
+        rng.choice(perfil.valores['ApellidosGerenteGeneral_Act'], size=cantidad_gerentes),
+    ]).astype(object)
+
+    for inicio in range(0, filas, tamano_bloque):
+        yield generar_bloque(perfil, min(tamano_bloque, filas - inicio), rng, variantes, gerentes_frecuentes)
+
+def generar_datos(filas, semilla=0, perfil=None):
+    """Genera el conjunto sintético completo en un solo DataFrame"""
+    return pd.concat(list(generar_bloques(filas, semilla, perfil=perfil)), ignore_index=True)
+
+def guardar_datos(bloques, ruta):
+    """Guarda los bloques como Arrow (streaming), CSV o XLSX según la extensión de la ruta"""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    filas = 0
+    if ruta.suffix == '.arrow':
+        import pyarrow as pa
+
+        escritor = None
+        try:
+            for bloque in bloques:
+                tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+                if escritor is None:
+                    escritor = pa.ipc.new_file(ruta, tabla.schema)
+                escritor.write_table(tabla)
+                filas += len(bloque)
+        finally:
+            if escritor is not None:
+                escritor.close()
+    elif ruta.suffix in ('.csv', '.xlsx'):
+        from exportaciones import EscritorExportaciones
+
+        with EscritorExportaciones(ruta.with_suffix(''), (ruta.suffix[1:],)) as escritor:
+            for bloque in bloques:
+                escritor.escribir(bloque)
+                filas += len(bloque)
+    else:
+        raise ValueError(f"Extensión no soportada: {ruta.suffix} (use .arrow, .csv o .xlsx)")
+    return filas
+
+def leer_datos(ruta):
+    """Lee un conjunto sintético guardado con guardar_datos"""
+    ruta = Path(ruta)
+    if ruta.suffix == '.arrow':
+        import pyarrow as pa
+
+        with pa.memory_map(str(ruta)) as fuente:
+            return enteros_anulables(pa.ipc.open_file(fuente).read_all().to_pandas())
+    if ruta.suffix == '.csv':
+        return enteros_anulables(pd.read_csv(ruta, keep_default_na=False, na_values=VALORES_NULOS_EXCEL))
+    return enteros_anulables(pd.read_excel(ruta))
+
+def main():
+    """Función principal del generador"""
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el esquema y la suciedad de BD.xlsx")
+    parser.add_argument('filas', type=float, help="número de filas (admite 1e5, 1e6, 1e7)")
+    parser.add_argument('--salida', default=None,
+                        help="archivo de salida .arrow, .csv o .xlsx (por defecto data/sinteticos/bd_<filas>.arrow)")
+    parser.add_argument('--semilla', type=int, default=0, help="semilla del generador aleatorio")
+    args = parser.parse_args()
+
+    filas = int(args.filas)
+    salida = args.salida or BASE_DIR / "data" / "sinteticos" / f"bd_{filas}.arrow"
+    print(f"Generando {filas} filas sintéticas a partir de {RUTA_BD}...")
+    escritas = guardar_datos(generar_bloques(filas, args.semilla), salida)
+    print(f"✓ {escritas} filas guardadas en {salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Carga masiva en el almacén SQLite (Fase 3)
+Inserta los dataframes por lotes con executemany dentro de una transacción
+explícita, con modo WAL y PRAGMAs ajustados para carga, en lugar del camino
+fila a fila de to_sql. La tabla se actualiza por upsert sobre su clave (el ID
+estable de la empresa) y los índices secundarios se crean después de la carga.
+"""
+
+import sqlite3
+import time
+
+import pandas as pd
+
+# PRAGMAs aplicados a cada conexión de carga
+PRAGMAS_CARGA = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -65536,        # 64 MiB
+    'mmap_size': 268435456,      # 256 MiB
+}
+
+# Filas por llamada a executemany
+TAMANO_LOTE = 5_000
+
+# Índices secundarios de la tabla empresas: columnas por las que filtran y ordenan los
+# dashboards, seguidas de ID_Empresa para recorrer las páginas por clave sin ordenar en memoria
+INDICES_EMPRESAS = {
+    'idx_empresas_region': ('Region', 'ID_Empresa'),
+    'idx_empresas_ciudad': ('Ciudad_Act', 'ID_Empresa'),
+    'idx_empresas_nivel_riesgo': ('Nivel_Riesgo', 'ID_Empresa'),
+    'idx_empresas_puntuacion_riesgo': ('Puntuacion_Riesgo', 'ID_Empresa'),
+    'idx_empresas_completitud': ('Porcentaje_Completitud', 'ID_Empresa'),
+}
+
+def abrir_conexion(ruta_db):
+    """Abre una conexión en modo de transacciones explícitas con los PRAGMAs de carga"""
+    conexion = sqlite3.connect(ruta_db, isolation_level=None)
+    for pragma, valor in PRAGMAS_CARGA.items():
+        conexion.execute(f"PRAGMA {pragma} = {valor}")
+    return conexion
+
+def columnas_tabla(conexion, tabla):
+    """Devuelve las columnas de una tabla (lista vacía si no existe)"""
+    return [fila[1] for fila in conexion.execute(f'PRAGMA table_info("{tabla}")')]
+
+def tiene_restriccion_unica(conexion, tabla, clave):
+    """Indica si la tabla tiene una PRIMARY KEY o un índice único exactamente sobre la clave"""
+    for _, nombre, unico, *_ in conexion.execute(f'PRAGMA index_list("{tabla}")').fetchall():
+        if unico and [fila[2] for fila in conexion.execute(f'PRAGMA index_info("{nombre}")')] == [clave]:
+            return True
+    return False
+
+def filas_por_lotes(df, tamano_lote=TAMANO_LOTE):
+    """Genera lotes de tuplas con tipos nativos de Python (nulos como None) sin convertir todo el dataframe"""
+    for inicio in range(0, len(df), tamano_lote):
+        bloque = df.iloc[inicio:inicio + tamano_lote]
+        bloque = bloque.astype(object).where(bloque.notna(), None)
+        yield list(bloque.itertuples(index=False, name=None))
+
+def crear_indices(conexion, tabla, indices):
+    """Crea los índices secundarios indicados si no existen"""
+    for nombre, columnas in indices.items():
+        lista = ', '.join(f'"{col}"' for col in columnas)
+        conexion.execute(f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" ({lista})')
+
+def eliminar_indices(conexion, indices):
+    """Elimina los índices secundarios indicados (se recrean al terminar la carga)"""
+    for nombre in indices:
+        conexion.execute(f'DROP INDEX IF EXISTS "{nombre}"')
+
+def cargar_tabla(conexion, df, tabla='empresas', clave='ID_Empresa', indices=INDICES_EMPRESAS,
+                 sincronizar=True, reconstruir_indices=True, tamano_lote=TAMANO_LOTE):
+    """Carga un dataframe en una tabla por upsert sobre la clave y devuelve estadísticas de la carga.
+
+    Si la tabla no existe, o en una carga completa sus columnas no coinciden, se
+    crea de nuevo con la clave como PRIMARY KEY. sincronizar: borrar las filas
+    cuya clave no está en df (carga completa); sin sincronizar (carga de un
+    delta) una tabla con otras columnas nunca se borra: se lanza ValueError y
+    hace falta una recarga completa. reconstruir_indices: eliminar los índices secundarios
+    antes de la carga y crearlos al final (conveniente en cargas grandes).
+    Si la conexión ya está dentro de una transacción, la carga forma parte de
+    ella; si no, abre y confirma la suya.
+    """
+    inicio = time.perf_counter()
+    columnas = list(df.columns)
+    lista_columnas = ', '.join(f'"{col}"' for col in columnas)
+    marcadores = ', '.join('?' * len(columnas))
+    actualizaciones = ', '.join(f'"{col}" = excluded."{col}"' for col in columnas if col != clave)
+    sentencia = (
+        f'INSERT INTO "{tabla}" ({lista_columnas}) VALUES ({marcadores}) '
+        f'ON CONFLICT ("{clave}") DO UPDATE SET {actualizaciones}'
+    )
+
+    propia = not conexion.in_transaction
+    if propia:
+        conexion.execute("BEGIN")
+    try:
+        existentes = columnas_tabla(conexion, tabla)
+        if existentes and not sincronizar and set(existentes) != set(columnas):
+            raise ValueError(f"Las columnas de '{tabla}' no coinciden con las de la carga parcial: "
+                             "se necesita una recarga completa")
+        nueva = not existentes or (sincronizar and existentes != columnas)
+        if nueva:
+            conexion.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+            conexion.execute(pd.io.sql.get_schema(df, tabla, keys=clave, con=conexion))
+        elif not tiene_restriccion_unica(conexion, tabla, clave):
+            # Tablas creadas antes sin PRIMARY KEY: el upsert necesita una restricción única
+            conexion.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{tabla}_{clave}" ON "{tabla}" ("{clave}")')
+        if reconstruir_indices:
+            eliminar_indices(conexion, indices)
+
+        for lote in filas_por_lotes(df, tamano_lote):
+            conexion.executemany(sentencia, lote)
+
+        eliminadas = 0
+        if sincronizar and not nueva:
+            conexion.execute(f'CREATE TEMP TABLE claves_carga ("{clave}" PRIMARY KEY)')
+            conexion.executemany(
+                "INSERT OR IGNORE INTO claves_carga VALUES (?)",
+                ((valor,) for valor in df[clave].tolist())
+            )
+            eliminadas = conexion.execute(
+                f'DELETE FROM "{tabla}" WHERE "{clave}" NOT IN (SELECT "{clave}" FROM claves_carga)'
+            ).rowcount
+            conexion.execute("DROP TABLE claves_carga")
+
+        crear_indices(conexion, tabla, indices)
+        if propia:
+            conexion.execute("COMMIT")
+    except Exception:
+        if propia:
+            conexion.execute("ROLLBACK")
+        raise
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'tabla': tabla,
+        'filas': len(df),
+        'eliminadas': eliminadas,
+        'tabla_nueva': nueva,
+        'segundos': segundos,
+        'filas_por_segundo': len(df) / segundos if segundos > 0 else float('inf')
+    }
+
+def imprimir_estadisticas_carga(estadisticas):
+    """Muestra el resultado de una carga"""
+    print(f"Carga de '{estadisticas['tabla']}': {estadisticas['filas']} filas en {estadisticas['segundos']:.3f}s "
+          f"({estadisticas['filas_por_segundo']:,.0f} filas/s)")
+    if estadisticas['tabla_nueva']:
+        print("  - Tabla creada de nuevo (no existía o cambiaron sus columnas)")
+    elif estadisticas['eliminadas']:
+        print(f"  - Filas eliminadas por no estar en la carga: {estadisticas['eliminadas']}")
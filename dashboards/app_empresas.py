@@ -5,6 +5,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 
+from consultas_empresas import (PoolConexiones, TAMANO_PAGINA, consultar_opciones_filtros, consultar_metricas,
+                                consultar_conteo_por, consultar_correlacion, consultar_columnas,
+                                consultar_columnas_orden, consultar_pagina)
+
 # Configurar página
 st.set_page_config(page_title="Dashboard Empresas Colombia", layout="wide")
 
@@ -12,60 +16,117 @@ st.set_page_config(page_title="Dashboard Empresas Colombia", layout="wide")
 st.title("📊 Dashboard de Empresas Colombianas")
 st.markdown("Análisis integral de datos empresariales con indicadores de calidad y riesgo")
 
-# Cargar datos
+# Conexiones de solo lectura compartidas por todas las sesiones
+@st.cache_resource
+def obtener_pool():
+    return PoolConexiones('database/empresas_colombia.db')
+
+pool = obtener_pool()
+version = pool.version()
+
+# Resultados en caché por selección de filtros (y versión de la base de datos)
 @st.cache_data
-def load_data():
-    return pd.read_csv('data/processed/datos_integrados.csv')
+def opciones_filtros(version):
+    return consultar_opciones_filtros(pool)
 
-df = load_data()
+@st.cache_data
+def metricas(version, regiones=(), niveles=()):
+    return consultar_metricas(pool, regiones, niveles)
+
+@st.cache_data
+def conteo_por(version, columna, regiones, niveles):
+    return consultar_conteo_por(pool, columna, regiones, niveles)
+
+@st.cache_data
+def correlacion(version, regiones, niveles):
+    return consultar_correlacion(pool, regiones, niveles)
 
 # Métricas principales
+resumen = metricas(version)
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total Empresas", len(df))
+    st.metric("Total Empresas", resumen['total_empresas'])
 with col2:
-    st.metric("Completitud Promedio", f"{df['Porcentaje_Completitud'].mean():.1f}%")
+    st.metric("Completitud Promedio", f"{resumen['completitud_promedio'] or 0:.1f}%")
 with col3:
-    st.metric("Riesgo Promedio", f"{df['Puntuacion_Riesgo'].mean():.1f}/10")
+    st.metric("Riesgo Promedio", f"{resumen['riesgo_promedio'] or 0:.1f}/10")
 with col4:
-    alto_riesgo = len(df[df['Nivel_Riesgo'].isin(['ALTO', 'CRÍTICO'])])
-    st.metric("Empresas Alto Riesgo", alto_riesgo)
+    st.metric("Empresas Alto Riesgo", resumen['empresas_alto_riesgo'])
 
 # Filtros
+opciones_region, opciones_nivel = opciones_filtros(version)
 st.sidebar.header("Filtros")
-region = st.sidebar.multiselect("Región", options=df['Region'].unique())
-nivel_riesgo = st.sidebar.multiselect("Nivel de Riesgo", options=df['Nivel_Riesgo'].unique())
-
-# Aplicar filtros
-if region:
-    df = df[df['Region'].isin(region)]
-if nivel_riesgo:
-    df = df[df['Nivel_Riesgo'].isin(nivel_riesgo)]
+region = tuple(sorted(st.sidebar.multiselect("Región", options=opciones_region)))
+nivel_riesgo = tuple(sorted(st.sidebar.multiselect("Nivel de Riesgo", options=opciones_nivel)))
 
 # Gráficos
 col1, col2 = st.columns(2)
 
 with col1:
-    fig = px.pie(df, names='Region', title='Distribución por Región')
+    por_region = conteo_por(version, 'Region', region, nivel_riesgo)
+    fig = px.pie(por_region, names='Region', values='Cantidad', title='Distribución por Región')
     st.plotly_chart(fig, use_container_width=True)
 
 with col2:
-    fig = px.bar(df['Nivel_Riesgo'].value_counts(), 
+    por_nivel = conteo_por(version, 'Nivel_Riesgo', region, nivel_riesgo)
+    fig = px.bar(por_nivel, x='Nivel_Riesgo', y='Cantidad',
                  title='Distribución por Nivel de Riesgo',
-                 color=df['Nivel_Riesgo'].value_counts().index,
+                 color='Nivel_Riesgo',
                  color_discrete_map={'BAJO': 'green', 'MEDIO': 'yellow', 'ALTO': 'orange', 'CRÍTICO': 'red'})
     st.plotly_chart(fig, use_container_width=True)
 
 # Mapa de calor de correlación
 st.subheader("Mapa de Calor de Correlación")
-corr_matrix = df[['Porcentaje_Completitud', 'Puntuacion_Riesgo', 'PIB_Per_Capita']].corr()
+corr_matrix = correlacion(version, region, nivel_riesgo)
 fig = px.imshow(corr_matrix, text_auto=True, aspect="auto")
 st.plotly_chart(fig, use_container_width=True)
 
-# Datos crudos
+# Datos crudos: una página a la vez, ordenada y proyectada en el servidor
+@st.cache_data
+def pagina_datos(version, columnas, regiones, niveles, orden, descendente, cursor):
+    return consultar_pagina(pool, list(columnas), regiones, niveles, orden, descendente, cursor)
+
 if st.checkbox("Mostrar datos crudos"):
     st.subheader("Datos Crudos")
-    st.dataframe(df)
+    columnas_disponibles = consultar_columnas(pool)
+    columnas_iniciales = [col for col in ['ID_Empresa', 'NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act',
+                                          'Ciudad_Act', 'Region', 'Nivel_Riesgo'] if col in columnas_disponibles]
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        columnas = tuple(st.multiselect("Columnas", options=columnas_disponibles, default=columnas_iniciales))
+    with col2:
+        columnas_orden = consultar_columnas_orden(pool)
+        orden = st.selectbox("Ordenar por", options=columnas_orden, index=columnas_orden.index('ID_Empresa'))
+    with col3:
+        descendente = st.checkbox("Descendente")
+    
+    # Los cursores de las páginas visitadas se reinician al cambiar filtros, columnas u orden
+    vista = (region, nivel_riesgo, columnas, orden, descendente)
+    if st.session_state.get('vista_datos') != vista:
+        st.session_state['vista_datos'] = vista
+        st.session_state['cursores'] = [None]
+        st.session_state['pagina'] = 0
+    cursores = st.session_state['cursores']
+    
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("⬅ Anterior") and st.session_state['pagina'] > 0:
+            st.session_state['pagina'] -= 1
+    with col2:
+        if st.button("Siguiente ➡") and st.session_state['pagina'] + 1 < len(cursores):
+            st.session_state['pagina'] += 1
+    
+    numero_pagina = st.session_state['pagina']
+    pagina, cursor_siguiente = pagina_datos(version, columnas, region, nivel_riesgo, orden, descendente,
+                                            cursores[numero_pagina])
+    if cursor_siguiente is not None and len(cursores) == numero_pagina + 1:
+        cursores.append(cursor_siguiente)
+    
+    total_filas = int(por_nivel['Cantidad'].sum())
+    with col3:
+        st.markdown(f"Página {numero_pagina + 1} de {max(1, -(-total_filas // TAMANO_PAGINA))} "
+                    f"({total_filas} empresas)")
+    st.dataframe(pagina, use_container_width=True)
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Consultas del dashboard sobre empresas_colombia.db
+Los filtros de Región y Nivel de Riesgo, las métricas y los agregados de los
+gráficos se resuelven en SQLite con consultas parametrizadas que usan los
+índices de la tabla empresas; al dashboard solo llegan resultados agregados,
+de modo que la memoria por sesión no depende del tamaño de la tabla.
+"""
+
+import queue
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+RUTA_BD = Path("database") / "empresas_colombia.db"
+
+# Columnas del mapa de calor de correlación
+COLUMNAS_CORRELACION = ['Porcentaje_Completitud', 'Puntuacion_Riesgo', 'PIB_Per_Capita']
+
+# Filas por página de la vista de datos crudos
+TAMANO_PAGINA = 50
+
+class PoolConexiones:
+    """Pool de conexiones de solo lectura compartido entre sesiones del dashboard"""
+
+    def __init__(self, ruta_db=RUTA_BD, tamano=4):
+        self.ruta_db = Path(ruta_db)
+        self.disponibles = queue.Queue()
+        for _ in range(tamano):
+            self.disponibles.put(self._abrir())
+
+    def _abrir(self):
+        """Abre una conexión de solo lectura utilizable desde cualquier hilo"""
+        conexion = sqlite3.connect(f"file:{self.ruta_db.resolve()}?mode=ro", uri=True, check_same_thread=False)
+        conexion.execute("PRAGMA query_only = ON")
+        return conexion
+
+    @contextmanager
+    def conexion(self):
+        """Toma una conexión del pool y la devuelve al terminar"""
+        conexion = self.disponibles.get()
+        try:
+            yield conexion
+        finally:
+            self.disponibles.put(conexion)
+
+    def version(self):
+        """Marca de cambios de la base de datos (incluye el archivo WAL) para invalidar resultados"""
+        rutas = [self.ruta_db, self.ruta_db.with_name(self.ruta_db.name + "-wal")]
+        return max((ruta.stat().st_mtime_ns for ruta in rutas if ruta.exists()), default=0)
+
+def condicion_filtros(regiones=(), niveles=()):
+    """Construye la cláusula WHERE parametrizada para los filtros seleccionados"""
+    condiciones, parametros = [], []
+    if regiones:
+        condiciones.append(f"Region IN ({', '.join('?' * len(regiones))})")
+        parametros += list(regiones)
+    if niveles:
+        condiciones.append(f"Nivel_Riesgo IN ({', '.join('?' * len(niveles))})")
+        parametros += list(niveles)
+    clausula = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return clausula, parametros
+
+def consultar_opciones_filtros(pool):
+    """Valores disponibles para los filtros (recorren los índices de Region y Nivel_Riesgo)"""
+    with pool.conexion() as conexion:
+        regiones = [fila[0] for fila in conexion.execute(
+            "SELECT DISTINCT Region FROM empresas WHERE Region IS NOT NULL ORDER BY Region")]
+        niveles = [fila[0] for fila in conexion.execute(
+            "SELECT DISTINCT Nivel_Riesgo FROM empresas WHERE Nivel_Riesgo IS NOT NULL ORDER BY Nivel_Riesgo")]
+    return regiones, niveles
+
+def consultar_metricas(pool, regiones=(), niveles=()):
+    """Métricas de las tarjetas: total, completitud promedio, riesgo promedio y empresas de alto riesgo"""
+    clausula, parametros = condicion_filtros(regiones, niveles)
+    with pool.conexion() as conexion:
+        total, completitud, riesgo, alto_riesgo = conexion.execute(
+            "SELECT COUNT(*), AVG(Porcentaje_Completitud), AVG(Puntuacion_Riesgo), "
+            f"TOTAL(Nivel_Riesgo IN ('ALTO', 'CRÍTICO')) FROM empresas {clausula}", parametros
+        ).fetchone()
+    return {
+        'total_empresas': total,
+        'completitud_promedio': completitud,
+        'riesgo_promedio': riesgo,
+        'empresas_alto_riesgo': int(alto_riesgo)
+    }
+
+def consultar_conteo_por(pool, columna, regiones=(), niveles=()):
+    """Número de empresas por valor de una columna (Region o Nivel_Riesgo), de mayor a menor"""
+    if columna not in ('Region', 'Nivel_Riesgo'):
+        raise ValueError(f"Columna no permitida para agrupar: {columna}")
+    clausula, parametros = condicion_filtros(regiones, niveles)
+    with pool.conexion() as conexion:
+        filas = conexion.execute(
+            f"SELECT {columna}, COUNT(*) AS Cantidad FROM empresas {clausula} "
+            f"GROUP BY {columna} ORDER BY Cantidad DESC", parametros
+        ).fetchall()
+    return pd.DataFrame(filas, columns=[columna, 'Cantidad'])
+
+def consultar_correlacion(pool, regiones=(), niveles=(), columnas=COLUMNAS_CORRELACION):
+    """Matriz de correlación de Pearson calculada con sumas en SQLite (pares con ambos valores no nulos)"""
+    clausula, parametros = condicion_filtros(regiones, niveles)
+    pares = [(a, b) for i, a in enumerate(columnas) for b in columnas[i:]]
+    expresiones = []
+    for a, b in pares:
+        ambos = f"({a} IS NOT NULL AND {b} IS NOT NULL)"
+        expresiones += [
+            f"TOTAL({ambos})",
+            f"TOTAL(CASE WHEN {ambos} THEN {a} END)", f"TOTAL(CASE WHEN {ambos} THEN {b} END)",
+            f"TOTAL(CASE WHEN {ambos} THEN {a} * {a} END)", f"TOTAL(CASE WHEN {ambos} THEN {b} * {b} END)",
+            f"TOTAL(CASE WHEN {ambos} THEN {a} * {b} END)",
+        ]
+    with pool.conexion() as conexion:
+        sumas = conexion.execute(f"SELECT {', '.join(expresiones)} FROM empresas {clausula}", parametros).fetchone()
+
+    matriz = pd.DataFrame(float('nan'), index=columnas, columns=columnas)
+    for k, (a, b) in enumerate(pares):
+        n, sa, sb, saa, sbb, sab = sumas[6 * k:6 * k + 6]
+        if n < 2:
+            continue
+        covarianza = sab - sa * sb / n
+        varianza = (saa - sa * sa / n) * (sbb - sb * sb / n)
+        if varianza > 0:
+            matriz.loc[a, b] = matriz.loc[b, a] = covarianza / varianza ** 0.5
+    return matriz
+
+def consultar_columnas(pool):
+    """Columnas de la tabla empresas (lista blanca para proyección y ordenamiento)"""
+    with pool.conexion() as conexion:
+        return [fila[1] for fila in conexion.execute("PRAGMA table_info(empresas)")]
+
+def consultar_columnas_orden(pool):
+    """Columnas por las que se puede ordenar: ID_Empresa y las que tienen un índice (columna, ID_Empresa)"""
+    with pool.conexion() as conexion:
+        indexadas = {'ID_Empresa'}
+        for _, nombre, *_ in conexion.execute("PRAGMA index_list(empresas)").fetchall():
+            columnas = [fila[2] for fila in conexion.execute(f'PRAGMA index_info("{nombre}")')]
+            if len(columnas) == 2 and columnas[1] == 'ID_Empresa':
+                indexadas.add(columnas[0])
+    return [col for col in consultar_columnas(pool) if col in indexadas]
+
+def consultar_pagina(pool, columnas, regiones=(), niveles=(), orden='ID_Empresa', descendente=False,
+                     cursor=None, tamano=TAMANO_PAGINA):
+    """Lee una página de empresas con paginación por clave (keyset) sobre (orden, ID_Empresa).
+    
+    Solo se leen las columnas pedidas y las filas de la página, sin OFFSET, y
+    cada consulta recorre el índice (orden, ID_Empresa) en lugar de ordenar en
+    memoria, de modo que el costo de cada página no crece con el número de
+    filas que cumplen los filtros. Solo se puede ordenar por las columnas de
+    consultar_columnas_orden. Los nulos de la columna de orden van al final,
+    en un segmento propio recorrido por ID_Empresa.
+    cursor: valor devuelto por la página anterior (None para la primera).
+    Devuelve el dataframe de la página y el cursor de la siguiente (None si no hay más).
+    """
+    permitidas = set(consultar_columnas(pool))
+    columnas = [col for col in dict.fromkeys(columnas) if col in permitidas] or ['ID_Empresa']
+    if orden not in consultar_columnas_orden(pool):
+        raise ValueError(f"Columna de orden no permitida: {orden}")
+    
+    clausula, parametros = condicion_filtros(regiones, niveles)
+    filtros = [clausula[len("WHERE "):]] if clausula else []
+    sentido, comparacion = ('DESC', '<') if descendente else ('ASC', '>')
+    seleccion = ', '.join(f'"{col}"' for col in dict.fromkeys(columnas + [orden, 'ID_Empresa']))
+    
+    def leer(condiciones, valores, orden_sql, limite):
+        donde = f"WHERE {' AND '.join(filtros + condiciones)}" if filtros + condiciones else ""
+        with pool.conexion() as conexion:
+            return pd.read_sql(
+                f"SELECT {seleccion} FROM empresas {donde} ORDER BY {orden_sql} LIMIT ?",
+                conexion, params=parametros + valores + [limite]
+            )
+    
+    if orden == 'ID_Empresa':
+        condiciones, valores = ([f"ID_Empresa {comparacion} ?"], [cursor[0]]) if cursor is not None else ([], [])
+        pagina = leer(condiciones, valores, f"ID_Empresa {sentido}", tamano + 1)
+    else:
+        # Primero el segmento con valor, por (orden, ID_Empresa); después el de nulos, por ID_Empresa
+        partes = []
+        en_nulos = cursor is not None and cursor[0]
+        if not en_nulos:
+            condiciones, valores = [f'"{orden}" IS NOT NULL'], []
+            if cursor is not None:
+                condiciones.append(f'("{orden}", ID_Empresa) {comparacion} (?, ?)')
+                valores += [cursor[1], cursor[2]]
+            partes.append(leer(condiciones, valores, f'"{orden}" {sentido}, ID_Empresa {sentido}', tamano + 1))
+        faltan = tamano + 1 - sum(len(parte) for parte in partes)
+        if faltan > 0:
+            condiciones, valores = [f'"{orden}" IS NULL'], []
+            if en_nulos:
+                condiciones.append(f"ID_Empresa {comparacion} ?")
+                valores.append(cursor[2])
+            partes.append(leer(condiciones, valores, f"ID_Empresa {sentido}", faltan))
+        partes = [parte for parte in partes if len(parte)] or partes[:1]
+        pagina = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    
+    siguiente = None
+    if len(pagina) > tamano:
+        pagina = pagina.iloc[:tamano]
+        ultima = pagina.iloc[-1]
+        if orden == 'ID_Empresa':
+            siguiente = (ultima['ID_Empresa'],)
+        else:
+            valor = ultima[orden]
+            # Los parámetros de sqlite3 deben ser tipos nativos de Python
+            valor = None if pd.isna(valor) else getattr(valor, 'item', lambda: valor)()
+            siguiente = (valor is None, valor, ultima['ID_Empresa'])
+    return pagina[columnas].reset_index(drop=True), siguiente
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Caché persistente de valores crudo → limpio para los limpiadores de la Fase 1
+Cada limpiador se aplica solo a los valores distintos de la columna que no
+estén ya en la caché; los resultados se guardan en una tabla SQLite con
+expulsión por antigüedad de uso e invalidación al cambiar la versión de reglas.
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+# SQLite limita el número de parámetros por sentencia
+TAMANO_LOTE_CONSULTA = 500
+
+class CacheLimpieza:
+    """Caché en disco de resultados de limpieza por limpiador y valor crudo"""
+
+    def __init__(self, ruta_db, max_entradas=1_000_000):
+        self.ruta_db = ruta_db
+        self.max_entradas = max_entradas
+        # Espera generosa: varios procesos de limpieza pueden compartir la misma caché
+        self.conexion = sqlite3.connect(str(ruta_db), timeout=60)
+        self.estadisticas = {}
+        # Número de entradas de la tabla, llevado en memoria tras contarlas una vez (ver _expulsar)
+        self.entradas = None
+        self._crear_tablas()
+
+    def _crear_tablas(self):
+        """Crea las tablas de la caché si no existen"""
+        with self.conexion:
+            self.conexion.execute("""
+                CREATE TABLE IF NOT EXISTS cache_valores (
+                    limpiador TEXT NOT NULL,
+                    valor_crudo TEXT NOT NULL,
+                    valor_limpio TEXT,
+                    ultimo_uso REAL NOT NULL,
+                    PRIMARY KEY (limpiador, valor_crudo)
+                )
+            """)
+            self.conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_valores_uso ON cache_valores (ultimo_uso)"
+            )
+            self.conexion.execute("""
+                CREATE TABLE IF NOT EXISTS cache_versiones (
+                    limpiador TEXT PRIMARY KEY,
+                    version TEXT NOT NULL
+                )
+            """)
+
+    def _validar_version(self, limpiador, version):
+        """Descarta las entradas de un limpiador si sus reglas cambiaron"""
+        fila = self.conexion.execute(
+            "SELECT version FROM cache_versiones WHERE limpiador = ?", (limpiador,)
+        ).fetchone()
+        if fila is not None and fila[0] == version:
+            return
+
+        with self.conexion:
+            borradas = self.conexion.execute("DELETE FROM cache_valores WHERE limpiador = ?", (limpiador,)).rowcount
+            if self.entradas is not None:
+                self.entradas -= borradas
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO cache_versiones (limpiador, version) VALUES (?, ?)",
+                (limpiador, version)
+            )
+
+    def _consultar(self, limpiador, valores):
+        """Devuelve un dict valor_crudo → valor_limpio con los valores presentes en la caché"""
+        encontrados = {}
+        for inicio in range(0, len(valores), TAMANO_LOTE_CONSULTA):
+            lote = valores[inicio:inicio + TAMANO_LOTE_CONSULTA]
+            marcadores = ','.join('?' * len(lote))
+            filas = self.conexion.execute(
+                f"SELECT valor_crudo, valor_limpio FROM cache_valores "
+                f"WHERE limpiador = ? AND valor_crudo IN ({marcadores})",
+                [limpiador, *lote]
+            )
+            encontrados.update(filas)
+        return encontrados
+
+    def _guardar(self, limpiador, aciertos, nuevos):
+        """Registra los valores nuevos, refresca el uso de los aciertos y aplica la expulsión"""
+        ahora = time.time()
+        with self.conexion:
+            self.conexion.executemany(
+                "UPDATE cache_valores SET ultimo_uso = ? WHERE limpiador = ? AND valor_crudo = ?",
+                ((ahora, limpiador, valor) for valor in aciertos)
+            )
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO cache_valores (limpiador, valor_crudo, valor_limpio, ultimo_uso) "
+                "VALUES (?, ?, ?, ?)",
+                ((limpiador, crudo, limpio, ahora) for crudo, limpio in nuevos.items())
+            )
+            self._expulsar(len(nuevos))
+
+    def _expulsar(self, insertadas):
+        """Elimina las entradas usadas hace más tiempo si se supera el tamaño máximo.
+
+        La tabla solo se cuenta la primera vez; después el total se actualiza
+        con las entradas insertadas y borradas por esta conexión. Las que
+        insertan otros procesos que comparten la caché las cuenta cada uno.
+        """
+        if self.entradas is None:
+            self.entradas = self.conexion.execute("SELECT COUNT(*) FROM cache_valores").fetchone()[0]
+        else:
+            self.entradas += insertadas
+        exceso = self.entradas - self.max_entradas
+        if exceso > 0:
+            self.entradas -= self.conexion.execute(
+                "DELETE FROM cache_valores WHERE rowid IN "
+                "(SELECT rowid FROM cache_valores ORDER BY ultimo_uso LIMIT ?)",
+                (exceso,)
+            ).rowcount
+
+    def aplicar(self, serie, limpiador, funcion, version):
+        """Aplica un limpiador a una columna usando la caché para los valores distintos.
+
+        El resultado es idéntico a serie.apply(funcion) para limpiadores cuyo
+        resultado depende únicamente de str(valor).
+        """
+        mascara = serie.notna()
+        if not mascara.any():
+            return serie.apply(funcion)
+
+        self._validar_version(limpiador, version)
+
+        codigos, unicos = pd.factorize(serie[mascara].map(str))
+        unicos = list(unicos)
+
+        en_cache = self._consultar(limpiador, unicos)
+        nuevos = {}
+        for valor in unicos:
+            if valor not in en_cache:
+                limpio = funcion(valor)
+                nuevos[valor] = None if pd.isna(limpio) else limpio
+
+        self._guardar(limpiador, list(en_cache), nuevos)
+
+        limpios = np.array(
+            [en_cache[valor] if valor in en_cache else nuevos[valor] for valor in unicos],
+            dtype=object
+        )
+        limpios[pd.isna(limpios)] = np.nan
+
+        resultado = serie.astype(object, copy=True)
+        resultado[mascara] = limpios[codigos]
+        if not mascara.all():
+            resultado[~mascara] = serie[~mascara].apply(funcion)
+
+        estadisticas = self.estadisticas.setdefault(limpiador, {'aciertos': 0, 'calculados': 0})
+        estadisticas['aciertos'] += len(en_cache)
+        estadisticas['calculados'] += len(nuevos)
+
+        return resultado.infer_objects()
+
+    def sumar_estadisticas(self, estadisticas):
+        """Suma a las de esta caché las estadísticas de otra conexión (por ejemplo, de un proceso trabajador)"""
+        for limpiador, datos in estadisticas.items():
+            propias = self.estadisticas.setdefault(limpiador, {'aciertos': 0, 'calculados': 0})
+            propias['aciertos'] += datos['aciertos']
+            propias['calculados'] += datos['calculados']
+
+    def resumen(self):
+        """Imprime aciertos y valores calculados por limpiador"""
+        for limpiador, datos in self.estadisticas.items():
+            total = datos['aciertos'] + datos['calculados']
+            porcentaje = datos['aciertos'] / total * 100 if total else 0
+            print(f"  - {limpiador}: {datos['aciertos']} en caché, {datos['calculados']} calculados ({porcentaje:.1f}% aciertos)")
+
+    def cerrar(self):
+        """Cierra la conexión con la base de datos de la caché"""
+        self.conexion.close()
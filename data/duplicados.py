@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Detección de casi duplicados (Fase 1)
+Dos registros solo se consideran la misma empresa si, dentro del mismo bloque
+(ciudad y código DANE), el nombre del gerente general es casi igual y además
+comparten evidencia: uno de los teléfonos o el gerente financiero. Un nombre
+parecido por sí solo no basta (Hernando y Fernando Jaramillo son personas
+distintas en la misma ciudad).
+
+Los pares candidatos se generan agrupando por clave de evidencia (bloque +
+teléfono o bloque + gerente financiero), de modo que solo se comparan nombres
+de registros que ya comparten un dato. Dentro de cada clave se usa un
+vecindario ordenado: cada nombre se compara solo con los VENTANA_VECINDARIO
+nombres más cercanos en orden alfabético y en orden de los nombres invertidos
+(para los errores al principio del nombre), y cada clave recuerda como máximo
+MAXIMO_NOMBRES_POR_CLAVE nombres distintos. El trabajo por registro es así
+acotado aunque un teléfono lo compartan miles de empresas.
+
+La detección es secuencial (un registro es casi duplicado si se parece a uno
+anterior) y recuerda los registros ya vistos, por lo que da el mismo resultado
+sobre el conjunto completo que bloque a bloque en la limpieza en streaming.
+"""
+
+import time
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+# Similitud mínima (1 - distancia / longitud) para considerar dos nombres iguales
+UMBRAL_SIMILITUD = 0.9
+
+# Columnas que agrupan los registros comparables
+COLUMNAS_BLOQUE = ('Ciudad_Act', 'CodDANE')
+
+# Nombre del gerente general que se compara
+COLUMNAS_NOMBRE = ('NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act')
+
+# Evidencia que corrobora que dos nombres parecidos son la misma empresa:
+# un teléfono en común (en cualquiera de las dos columnas) o el mismo gerente financiero
+COLUMNAS_TELEFONO = ('Telefono_Act1', 'Telefono_Act2')
+COLUMNAS_GERENTE_FINANCIERO = ('NombresGerenteFinanciero_Act', 'ApellidosGerenteFinanciero_Act')
+
+# Nombres vecinos comparados a cada lado, en cada uno de los dos órdenes, dentro de una clave de evidencia
+VENTANA_VECINDARIO = 4
+
+# Nombres distintos recordados por clave de evidencia (un conmutador compartido por muchas empresas no crece sin límite)
+MAXIMO_NOMBRES_POR_CLAVE = 64
+
+def distancia_acotada(a, b, maximo):
+    """Distancia de edición limitada a una banda diagonal; devuelve maximo + 1 si la supera"""
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    if len(a) < len(b):
+        a, b = b, a
+
+    fuera = maximo + 1
+    anterior = [j if j <= maximo else fuera for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        desde, hasta = max(1, i - maximo), min(len(b), i + maximo)
+        actual = [fuera] * (len(b) + 1)
+        actual[0] = i if i <= maximo else fuera
+        minimo_fila = actual[0]
+        for j in range(desde, hasta + 1):
+            valor = min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + (a[i - 1] != b[j - 1])
+            )
+            actual[j] = valor if valor <= maximo else fuera
+            minimo_fila = min(minimo_fila, actual[j])
+        # Ninguna celda de la fila está dentro del límite: la distancia final tampoco
+        if minimo_fila > maximo:
+            return fuera
+        anterior = actual
+    return anterior[len(b)]
+
+def son_similares(a, b, umbral=UMBRAL_SIMILITUD):
+    """Indica si la similitud normalizada (1 - distancia / longitud) alcanza el umbral"""
+    if a == b:
+        return True
+    longitud = max(len(a), len(b))
+    maximo = int((1 - umbral) * longitud + 1e-9)
+    return distancia_acotada(a, b, maximo) <= maximo
+
+def _texto(df, columnas):
+    """Une las columnas como texto en mayúsculas ('' si todas están vacías)"""
+    texto = df[columnas[0]].astype(object).fillna('').astype(str)
+    for col in columnas[1:]:
+        texto = texto + ' ' + df[col].astype(object).fillna('').astype(str)
+    return texto.str.strip().str.upper()
+
+class VecindarioClave:
+    """Nombres distintos de una clave de evidencia, ordenados directamente y por el nombre invertido"""
+
+    __slots__ = ('directos', 'invertidos')
+
+    def __init__(self, nombre):
+        self.directos = [nombre]
+        self.invertidos = [nombre[::-1]]
+
+    def vecinos(self, nombre, ventana):
+        """Los nombres más cercanos a nombre en cada orden (como mucho 4 * ventana)"""
+        posicion = bisect_left(self.directos, nombre)
+        encontrados = set(self.directos[max(0, posicion - ventana):posicion + ventana])
+        invertido = nombre[::-1]
+        posicion = bisect_left(self.invertidos, invertido)
+        encontrados.update(texto[::-1] for texto in self.invertidos[max(0, posicion - ventana):posicion + ventana])
+        return sorted(encontrados)
+
+    def agregar(self, nombre, maximo):
+        """Recuerda el nombre si es nuevo y la clave no alcanzó el máximo de nombres"""
+        if len(self.directos) >= maximo:
+            return
+        posicion = bisect_left(self.directos, nombre)
+        if posicion < len(self.directos) and self.directos[posicion] == nombre:
+            return
+        self.directos.insert(posicion, nombre)
+        insort(self.invertidos, nombre[::-1])
+
+class DetectorCasiDuplicados:
+    """Detector incremental de casi duplicados: recuerda los nombres vistos por clave de evidencia.
+
+    Procesar un dataframe completo o sus bloques en orden marca exactamente los mismos registros.
+    ventana: nombres vecinos comparados a cada lado en cada orden; maximo_nombres:
+    nombres distintos recordados por clave.
+    """
+
+    def __init__(self, umbral=UMBRAL_SIMILITUD, columnas_bloque=COLUMNAS_BLOQUE, columnas_nombre=COLUMNAS_NOMBRE,
+                 ventana=VENTANA_VECINDARIO, maximo_nombres=MAXIMO_NOMBRES_POR_CLAVE):
+        self.umbral = umbral
+        self.columnas_bloque = columnas_bloque
+        self.columnas_nombre = columnas_nombre
+        self.ventana = ventana
+        self.maximo_nombres = maximo_nombres
+        # Hash de 64 bits de la clave de evidencia -> nombre del único registro anterior que la tiene,
+        # o VecindarioClave cuando la tienen varios (la mayoría de las claves no se repite)
+        self.vistos = {}
+
+    def _anteriores(self, clave, nombre):
+        """Nombres anteriores de la clave con los que se compara nombre"""
+        vistos = self.vistos.get(clave)
+        if vistos is None:
+            return ()
+        if isinstance(vistos, str):
+            return (vistos,)
+        return vistos.vecinos(nombre, self.ventana)
+
+    def _recordar(self, clave, nombre):
+        """Añade nombre a los nombres recordados de la clave"""
+        vistos = self.vistos.get(clave)
+        if vistos is None:
+            self.vistos[clave] = nombre
+        elif isinstance(vistos, str):
+            if vistos != nombre:
+                vecindario = self.vistos[clave] = VecindarioClave(vistos)
+                vecindario.agregar(nombre, self.maximo_nombres)
+        else:
+            vistos.agregar(nombre, self.maximo_nombres)
+
+    def claves_evidencia(self, df):
+        """Claves de evidencia de cada registro en formato largo: DataFrame (posicion, clave)"""
+        bloque = _texto(df, list(self.columnas_bloque))
+        evidencias = [('TEL', _texto(df, [col])) for col in COLUMNAS_TELEFONO if col in df.columns]
+        if all(col in df.columns for col in COLUMNAS_GERENTE_FINANCIERO):
+            evidencias.append(('GF', _texto(df, list(COLUMNAS_GERENTE_FINANCIERO))))
+
+        partes = []
+        for tipo, valores in evidencias:
+            con_valor = (valores != '').to_numpy()
+            partes.append(pd.DataFrame({
+                'posicion': np.flatnonzero(con_valor),
+                'clave': (bloque[con_valor] + '|' + tipo + '|' + valores[con_valor]).to_numpy(),
+                'bloque': bloque[con_valor].to_numpy(),
+            }))
+        if not partes:
+            return pd.DataFrame({'posicion': [], 'clave': [], 'bloque': []})
+        # Un registro con el mismo teléfono en las dos columnas aporta una sola clave
+        claves = pd.concat(partes, ignore_index=True).drop_duplicates(['posicion', 'clave'])
+        # Las claves se recuerdan como hash de 64 bits en lugar del texto completo
+        claves['clave'] = pd.util.hash_pandas_object(claves['clave'], index=False).to_numpy()
+        return claves
+
+    def procesar(self, df):
+        """Marca los casi duplicados de df respecto a sus registros anteriores y a los ya vistos.
+
+        Devuelve una máscara booleana alineada con df (True = duplicado a eliminar)
+        y un DataFrame con registros, pares candidatos, pares similares y tiempo por bloque.
+        """
+        duplicado = np.zeros(len(df), dtype=bool)
+        nombres = _texto(df, list(self.columnas_nombre)).to_numpy()
+        claves = self.claves_evidencia(df)
+        # Sin nombre no hay con qué comparar
+        claves = claves[nombres[claves['posicion'].to_numpy(dtype=np.intp)] != '']
+
+        # Solo hay pares si la clave se repite en el bloque o ya se vio antes
+        repetida = claves['clave'].duplicated(keep=False).to_numpy()
+        repetida |= np.fromiter((clave in self.vistos for clave in claves['clave']), dtype=bool, count=len(claves))
+        candidatas = claves[repetida].sort_values('posicion', kind='stable')
+
+        registros_por_bloque = _texto(df, list(self.columnas_bloque))[nombres != ''].value_counts(sort=False)
+        estadisticas = {bloque: {'bloque': bloque, 'registros': int(registros), 'pares_candidatos': 0,
+                                 'pares_similares': 0, 'segundos': 0.0}
+                        for bloque, registros in registros_por_bloque.items()}
+
+        for bloque, grupo in candidatas.groupby('bloque', sort=False):
+            inicio = time.perf_counter()
+            candidatos = similares = 0
+            for posicion, claves_registro in grupo.groupby('posicion', sort=True)['clave']:
+                nombre = nombres[posicion]
+                comparados = set()
+                for clave in claves_registro:
+                    for anterior in self._anteriores(clave, nombre):
+                        if anterior in comparados:
+                            continue
+                        comparados.add(anterior)
+                        candidatos += 1
+                        if son_similares(nombre, anterior, self.umbral):
+                            similares += 1
+                            duplicado[posicion] = True
+                for clave in claves_registro:
+                    self._recordar(clave, nombre)
+            estadisticas[bloque]['pares_candidatos'] += candidatos
+            estadisticas[bloque]['pares_similares'] += similares
+            estadisticas[bloque]['segundos'] += time.perf_counter() - inicio
+
+        # Las claves que aparecen por primera vez también se recuerdan para los bloques siguientes
+        for posicion, clave in claves[~repetida][['posicion', 'clave']].itertuples(index=False):
+            self._recordar(clave, nombres[posicion])
+
+        return pd.Series(duplicado, index=df.index), pd.DataFrame(
+            list(estadisticas.values()), columns=['bloque', 'registros', 'pares_candidatos', 'pares_similares', 'segundos'])
+
+def detectar_casi_duplicados(df, columnas_bloque=COLUMNAS_BLOQUE, columnas_nombre=COLUMNAS_NOMBRE,
+                             umbral=UMBRAL_SIMILITUD):
+    """Marca los registros que son casi duplicados de un registro anterior del mismo bloque.
+
+    Un registro es casi duplicado si el nombre del gerente general es similar al
+    de un registro anterior con el que comparte un teléfono o el gerente
+    financiero. Devuelve la máscara (True = duplicado a eliminar, se conserva
+    siempre el primer registro) y las estadísticas por bloque.
+    """
+    return DetectorCasiDuplicados(umbral, columnas_bloque, columnas_nombre).procesar(df)
@@ -10,35 +10,169 @@ Entregables:
 import pandas as pd
 import numpy as np
 import re
+import sys
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Módulos compartidos entre fases (raíz del proyecto)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from exportaciones import (FORMATOS_EXPORTACION, NOMBRES_FORMATOS, EscritorExportaciones,
+                           exportar_dataframe, parsear_formatos)
+from esquema_datos import ESQUEMA_LIMPIOS, clave_identidad, compactar, hash_identidad, guardar_intercambio, EscritorIntercambio
+from resolucion_ciudades import ResolutorCiudades
+from cache_limpieza import CacheLimpieza
+from duplicados import DetectorCasiDuplicados, detectar_casi_duplicados, UMBRAL_SIMILITUD
+from perfilado import Perfilador, desactivar_en_trabajador, etapa, perfilar
+
+# Patrones compilados una sola vez y compartidos por la versión por celda y la vectorizada
+PATRON_CARACTERES_ESPECIALES = re.compile(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑ0-9\s]')
+PATRON_ESPACIOS = re.compile(r'\s+')
+
+# Diccionario de correcciones de ciudades
+CORRECCIONES_CIUDADES = {
+    "VOGOTÁ": "BOGOTÁ",
+    "BOGOTA%%": "BOGOTÁ",
+    "BOGOTAAA": "BOGOTÁ",
+    "BOGO)))T2": "BOGOTÁ",
+    "BOGOTAAÁ": "BOGOTÁ",
+    "SANTIAGHO DE CALY": "SANTIAGO DE CALI",
+    "SANTIAGGOPOOO": "SANTIAGO DE CALI",
+    "CALY": "CALI",
+    "ZANTIAGO DE CALLI": "SANTIAGO DE CALI",
+    "POPAYÁNOPO": "POPAYÁN",
+    "SAN JUAN DE PPASTO": "SAN JUAN DE PASTO",
+    "SAN JOSÉ DEL": "SAN JOSÉ DEL GUAVIARE",
+    "SAN JOSÉ DE QÚCUTA": "SAN JOSÉ DE CÚCUTA",
+    "LETICIHA": "LETICIA",
+    "MANIZALESS": "MANIZALES",
+    "P)=STO": "PASTO",
+    "PAZT0": "PASTO",
+    "TUNJAASSAS": "TUNJA",
+    "LICA": "VILLAVICENCIO",
+    "FLORENCIATRT": "FLORENCIA",
+    "CARTAGENA DE INDIASZZ": "CARTAGENA",
+    "YOPAL?)=": "YOPAL",
+    "MEDELLÍNN": "MEDELLÍN",
+    "BOGOTA": "BOGOTÁ",
+    "CALI": "SANTIAGO DE CALI",
+    "SANTIAGO DE CALI": "SANTIAGO DE CALI"
+}
+
+# Filas por bloque en la lectura y limpieza por bloques
+TAMANO_BLOQUE = 50_000
+
+# Textos que read_excel interpreta como nulos por defecto
+VALORES_NULOS_EXCEL = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null'
+]
+
+# Resolutor de ciudades compartido (ver obtener_resolutor_ciudades)
+_resolutor_ciudades = None
+
+# Caché de limpieza propia de cada proceso trabajador (ver limpiar_en_paralelo)
+_cache_proceso = None
+
 def configurar_entorno():
     """Configura las rutas y crea directorios necesarios"""
     base_dir = Path.cwd()
     data_dir = base_dir / "data"
     raw_data_dir = data_dir / "raw"
     output_data_dir = data_dir / "output"
+    database_dir = base_dir / "database"
     
     # Crear directorios si no existen
     output_data_dir.mkdir(parents=True, exist_ok=True)
+    database_dir.mkdir(parents=True, exist_ok=True)
     
     return {
         'base_dir': base_dir,
         'raw_data_dir': raw_data_dir,
-        'output_data_dir': output_data_dir
+        'output_data_dir': output_data_dir,
+        'database_dir': database_dir
     }
 
+@perfilar()
 def cargar_datos(ruta_archivo):
     """Carga los datos desde el archivo Excel"""
     try:
         print("Cargando datos...")
-        df = pd.read_excel(ruta_archivo)
+        df = enteros_anulables(pd.read_excel(ruta_archivo))
         print(f"Datos cargados correctamente. Filas: {len(df)}, Columnas: {len(df.columns)}")
         return df
     except Exception as e:
         print(f"Error al cargar los datos: {e}")
         return None
 
+def enteros_anulables(df):
+    """Convierte a Int64 las columnas numéricas cuyos valores son enteros, también las float64 con vacíos.
+    
+    read_excel lee como float64 los teléfonos y códigos DANE de una columna con
+    celdas vacías: como texto serían '3001234567.0' y los limpiadores los
+    descartarían. Con Int64 el tipo tampoco depende de si hay vacíos, de modo
+    que la lectura completa y la lectura por bloques producen los mismos valores.
+    """
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_bool_dtype(serie) or not pd.api.types.is_numeric_dtype(serie):
+            continue
+        if pd.api.types.is_float_dtype(serie):
+            valores = serie.to_numpy(dtype=np.float64)
+            valores = valores[~np.isnan(valores)]
+            # Solo si todos son enteros representables exactamente
+            if not len(valores) or np.abs(valores).max() >= 2**53 or not np.array_equal(valores, np.trunc(valores)):
+                continue
+        df[col] = serie.astype('Int64')
+    return df
+
+def construir_bloque(filas, columnas):
+    """Convierte filas crudas de openpyxl en un DataFrame con tipos estables entre bloques"""
+    df = pd.DataFrame.from_records(filas, columns=columnas)
+    
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            # Celdas vacías y textos nulos como NaN, igual que read_excel
+            df[col] = df[col].where(df[col].notna() & ~df[col].isin(VALORES_NULOS_EXCEL), np.nan)
+            if df[col].isna().all():
+                df[col] = df[col].astype(float)
+    
+    return enteros_anulables(df)
+
+def leer_excel_por_bloques(ruta_archivo, tamano_bloque=TAMANO_BLOQUE):
+    """Lee la primera hoja del Excel en modo de solo lectura y produce DataFrames de tamaño fijo"""
+    from openpyxl import load_workbook
+    
+    libro = load_workbook(ruta_archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            return
+        
+        columnas = [
+            str(col) if col is not None else f"Unnamed: {i}"
+            for i, col in enumerate(encabezados)
+        ]
+        
+        bloque = []
+        for fila in filas:
+            # read_excel descarta las filas en blanco
+            if all(valor is None for valor in fila):
+                continue
+            fila = tuple(fila[:len(columnas)]) + (None,) * (len(columnas) - len(fila))
+            bloque.append(fila)
+            if len(bloque) == tamano_bloque:
+                yield construir_bloque(bloque, columnas)
+                bloque = []
+        
+        if bloque:
+            yield construir_bloque(bloque, columnas)
+    finally:
+        libro.close()
+
 def normalizar_texto(texto):
     """Normaliza texto: convierte a mayúsculas, elimina espacios extras y caracteres especiales"""
     if pd.isna(texto):
@@ -47,58 +181,46 @@ def normalizar_texto(texto):
     texto = str(texto)
     
     # Eliminar caracteres especiales excepto letras, números, espacios y ñ/Ñ
-    texto = re.sub(r'[^a-zA-ZáéíóúÁÉÍÓÚñÑ0-9\s]', '', texto)
+    texto = PATRON_CARACTERES_ESPECIALES.sub('', texto)
     
     # Convertir a mayúsculas y eliminar espacios extras
     texto = texto.upper().strip()
-    texto = re.sub(r'\s+', ' ', texto)
+    texto = PATRON_ESPACIOS.sub(' ', texto)
     
     return texto
 
+def normalizar_columna_texto(serie):
+    """Versión vectorizada de normalizar_texto: aplica las operaciones .str solo sobre los valores distintos de la columna"""
+    mascara = serie.notna()
+    
+    # Sin valores que normalizar: conservar el comportamiento exacto de apply
+    if not mascara.any():
+        return serie.apply(normalizar_texto)
+    
+    # Convertir a str antes de factorizar (1, 1.0 y True tienen el mismo hash pero distinto texto)
+    textos = serie[mascara].map(str)
+    codigos, unicos = pd.factorize(textos)
+    
+    unicos = pd.Series(unicos, dtype=object)
+    unicos = unicos.str.replace(PATRON_CARACTERES_ESPECIALES, '', regex=True)
+    unicos = unicos.str.upper().str.strip()
+    unicos = unicos.str.replace(PATRON_ESPACIOS, ' ', regex=True)
+    
+    resultado = serie.astype(object, copy=True)
+    resultado[mascara] = unicos.to_numpy()[codigos]
+    return resultado
+
+def obtener_resolutor_ciudades():
+    """Devuelve el resolutor de ciudades, construyéndolo una única vez por proceso"""
+    global _resolutor_ciudades
+    if _resolutor_ciudades is None:
+        ciudades_canonicas = generar_ciudades_normalizadas()['Ciudad_Normalizada']
+        _resolutor_ciudades = ResolutorCiudades(CORRECCIONES_CIUDADES, ciudades_canonicas, normalizar_texto)
+    return _resolutor_ciudades
+
 def normalizar_ciudad(ciudad):
-    """Normaliza los nombres de ciudades usando un diccionario de correcciones"""
-    if pd.isna(ciudad):
-        return ciudad
-    
-    ciudad = str(ciudad).strip()
-    
-    # Diccionario de correcciones de ciudades
-    city_corrections = {
-        "VOGOTÁ": "BOGOTÁ",
-        "BOGOTA%%": "BOGOTÁ",
-        "BOGOTAAA": "BOGOTÁ",
-        "BOGO)))T2": "BOGOTÁ",
-        "BOGOTAAÁ": "BOGOTÁ",
-        "SANTIAGHO DE CALY": "SANTIAGO DE CALI",
-        "SANTIAGGOPOOO": "SANTIAGO DE CALI",
-        "CALY": "CALI",
-        "ZANTIAGO DE CALLI": "SANTIAGO DE CALI",
-        "POPAYÁNOPO": "POPAYÁN",
-        "SAN JUAN DE PPASTO": "SAN JUAN DE PASTO",
-        "SAN JOSÉ DEL": "SAN JOSÉ DEL GUAVIARE",
-        "SAN JOSÉ DE QÚCUTA": "SAN JOSÉ DE CÚCUTA",
-        "LETICIHA": "LETICIA",
-        "MANIZALESS": "MANIZALES",
-        "P)=STO": "PASTO",
-        "PAZT0": "PASTO",
-        "TUNJAASSAS": "TUNJA",
-        "LICA": "VILLAVICENCIO",
-        "FLORENCIATRT": "FLORENCIA",
-        "CARTAGENA DE INDIASZZ": "CARTAGENA",
-        "YOPAL?)=": "YOPAL",
-        "MEDELLÍNN": "MEDELLÍN",
-        "BOGOTA": "BOGOTÁ",
-        "CALI": "SANTIAGO DE CALI",
-        "SANTIAGO DE CALI": "SANTIAGO DE CALI"
-    }
-    
-    # Buscar corrección en el diccionario
-    for patron, correccion in city_corrections.items():
-        if patron in ciudad.upper():
-            return correccion
-    
-    # Si no encuentra corrección, normalizar el texto
-    return normalizar_texto(ciudad)
+    """Normaliza los nombres de ciudades usando un diccionario de correcciones y el catálogo de ciudades"""
+    return obtener_resolutor_ciudades().resolver(ciudad)
 
 def normalizar_telefono(telefono):
     """Normaliza números de teléfono"""
@@ -164,17 +286,33 @@ def corregir_nombres_propios(texto):
     
     return ' '.join(palabras_corregidas)
 
-def eliminar_duplicados_avanzado(df):
-    """Elimina duplicados de manera más inteligente, considerando similitudes"""
+def version_reglas(funcion, *dependencias):
+    """Huella de las reglas de un limpiador: cambia al modificar su código o los catálogos que usa"""
+    huella = hashlib.sha256(inspect.getsource(funcion).encode('utf-8'))
+    for dependencia in dependencias:
+        if inspect.isfunction(dependencia) or inspect.isclass(dependencia) or inspect.ismodule(dependencia):
+            dependencia = inspect.getsource(dependencia)
+        huella.update(repr(dependencia).encode('utf-8'))
+    return huella.hexdigest()[:16]
+
+def aplicar_limpiador(serie, funcion, cache=None, *dependencias):
+    """Aplica un limpiador por valor a una columna, pasando por la caché persistente si se proporciona"""
+    if cache is None:
+        return serie.apply(funcion)
+    return cache.aplicar(serie, funcion.__name__, funcion, version_reglas(funcion, *dependencias))
+
+def eliminar_duplicados_avanzado(df, umbral_similitud=UMBRAL_SIMILITUD):
+    """Elimina duplicados de manera más inteligente, considerando similitudes.
+    
+    umbral_similitud: similitud mínima entre nombres del gerente general, dentro
+    de la misma ciudad y código DANE, para considerar dos registros la misma
+    empresa cuando además comparten un teléfono o el gerente financiero (None
+    desactiva la detección de casi duplicados).
+    """
     print("Buscando y eliminando duplicados...")
     
     # Crear una columna de hash para identificar duplicados potenciales
-    df['hash_identidad'] = (
-        df['NombresGerenteGeneral_Act'].fillna('') + '|' +
-        df['ApellidosGerenteGeneral_Act'].fillna('') + '|' +
-        df['Ciudad_Act'].fillna('') + '|' +
-        df['CodDANE'].fillna('')
-    )
+    df['hash_identidad'] = clave_identidad(df)
     
     # Encontrar duplicados exactos
     duplicados_exactos = df.duplicated(keep='first')
@@ -197,59 +335,189 @@ def eliminar_duplicados_avanzado(df):
     # Eliminar la columna temporal
     df_sin_duplicados = df_sin_duplicados.drop('hash_identidad', axis=1)
     
+    # Eliminar casi duplicados (nombres con errores de digitación en la misma ciudad y código DANE)
+    if umbral_similitud is not None:
+        casi_duplicados, estadisticas = detectar_casi_duplicados(df_sin_duplicados, umbral=umbral_similitud)
+        total_registros = len(df_sin_duplicados)
+        print(f"Casi duplicados encontrados (similitud >= {umbral_similitud} "
+              f"y teléfono o gerente financiero en común): {casi_duplicados.sum()}")
+        print(f"Pares candidatos evaluados: {estadisticas['pares_candidatos'].sum()} "
+              f"(frente a {total_registros * (total_registros - 1) // 2} en comparación exhaustiva) "
+              f"en {len(estadisticas)} bloques, {estadisticas['segundos'].sum():.3f}s")
+        
+        if len(estadisticas) > 0:
+            print("Bloques con más pares candidatos:")
+            for _, bloque in estadisticas.nlargest(5, 'pares_candidatos').iterrows():
+                print(f"  - {bloque['bloque']}: {bloque['registros']} registros, "
+                      f"{bloque['pares_candidatos']} candidatos, {bloque['pares_similares']} similares, "
+                      f"{bloque['segundos']:.3f}s")
+        
+        if casi_duplicados.sum() > 0:
+            print("Ejemplos de casi duplicados:")
+            for _, row in df_sin_duplicados[casi_duplicados].head(3).iterrows():
+                print(f"  - {row['NombresGerenteGeneral_Act']} {row['ApellidosGerenteGeneral_Act']} en {row['Ciudad_Act']}")
+        
+        df_sin_duplicados = df_sin_duplicados[~casi_duplicados]
+    
     print(f"Registros después de eliminar duplicados: {len(df_sin_duplicados)}")
     
     return df_sin_duplicados
 
-def limpiar_datos(df):
-    """Función principal para limpiar el dataframe"""
-    print("Iniciando limpieza de datos...")
-    
+def limpiar_bloque(df, cache=None):
+    """Aplica los pasos de limpieza por fila (1 a 8) a un dataframe o a un bloque"""
     # Hacer una copia para no modificar el original
     df_clean = df.copy()
     
     # 1. Normalizar nombres de columnas
-    df_clean.columns = [col.strip() for col in df_clean.columns]
+    with etapa('1_normalizar_columnas', len(df_clean)) as medicion:
+        df_clean.columns = [col.strip() for col in df_clean.columns]
+        medicion.filas_salida = len(df_clean)
     
     # 2. Eliminar filas completamente vacías
-    filas_antes = len(df_clean)
-    df_clean = df_clean.dropna(how='all')
-    filas_despues = len(df_clean)
-    print(f"Eliminadas {filas_antes - filas_despues} filas completamente vacías")
+    with etapa('2_eliminar_filas_vacias', len(df_clean)) as medicion:
+        df_clean = df_clean.dropna(how='all')
+        medicion.filas_salida = len(df_clean)
     
     # 3. Normalizar texto en todas las columnas de texto
-    text_columns = [col for col in df_clean.columns if df_clean[col].dtype == 'object']
-    for col in text_columns:
-        df_clean[col] = df_clean[col].apply(normalizar_texto)
+    with etapa('3_normalizar_texto', len(df_clean)) as medicion:
+        text_columns = [col for col in df_clean.columns if df_clean[col].dtype == 'object']
+        for col in text_columns:
+            df_clean[col] = normalizar_columna_texto(df_clean[col])
+        medicion.filas_salida = len(df_clean)
     
     # 4. Corregir nombres propios en columnas de nombres
-    name_columns = [col for col in df_clean.columns if 'nombre' in col.lower() or 'apellido' in col.lower()]
-    for col in name_columns:
-        df_clean[col] = df_clean[col].apply(corregir_nombres_propios)
+    with etapa('4_corregir_nombres', len(df_clean)) as medicion:
+        name_columns = [col for col in df_clean.columns if 'nombre' in col.lower() or 'apellido' in col.lower()]
+        for col in name_columns:
+            df_clean[col] = aplicar_limpiador(df_clean[col], corregir_nombres_propios, cache)
+        medicion.filas_salida = len(df_clean)
     
     # 5. Normalizar ciudades
-    if 'Ciudad_Act' in df_clean.columns:
-        df_clean['Ciudad_Act'] = df_clean['Ciudad_Act'].apply(normalizar_ciudad)
+    with etapa('5_normalizar_ciudades', len(df_clean)) as medicion:
+        if 'Ciudad_Act' in df_clean.columns:
+            if cache is None:
+                df_clean['Ciudad_Act'] = obtener_resolutor_ciudades().resolver_columna(df_clean['Ciudad_Act'])
+            else:
+                df_clean['Ciudad_Act'] = aplicar_limpiador(
+                    df_clean['Ciudad_Act'], normalizar_ciudad, cache,
+                    CORRECCIONES_CIUDADES, generar_ciudades_normalizadas, inspect.getmodule(ResolutorCiudades),
+                    obtener_resolutor_ciudades, normalizar_texto, PATRON_CARACTERES_ESPECIALES, PATRON_ESPACIOS
+                )
+        medicion.filas_salida = len(df_clean)
     
     # 6. Validar y normalizar código DANE
-    if 'CodDANE' in df_clean.columns:
-        df_clean['CodDANE'] = df_clean['CodDANE'].apply(validar_codigo_dane)
+    with etapa('6_validar_codigo_dane', len(df_clean)) as medicion:
+        if 'CodDANE' in df_clean.columns:
+            df_clean['CodDANE'] = aplicar_limpiador(df_clean['CodDANE'], validar_codigo_dane, cache)
+        medicion.filas_salida = len(df_clean)
     
     # 7. Normalizar teléfonos
-    phone_columns = [col for col in df_clean.columns if 'telefono' in col.lower() or 'Telefono' in col]
-    for col in phone_columns:
-        df_clean[col] = df_clean[col].apply(normalizar_telefono)
+    with etapa('7_normalizar_telefonos', len(df_clean)) as medicion:
+        phone_columns = [col for col in df_clean.columns if 'telefono' in col.lower() or 'Telefono' in col]
+        for col in phone_columns:
+            df_clean[col] = aplicar_limpiador(df_clean[col], normalizar_telefono, cache)
+        medicion.filas_salida = len(df_clean)
     
     # 8. Manejar valores NULL/NaN
-    # Para nombres, reemplazar NULL por NaN
-    for col in name_columns:
-        df_clean[col] = df_clean[col].replace(['NULL', 'NAN', ''], np.nan)
+    with etapa('8_valores_nulos', len(df_clean)) as medicion:
+        # Para nombres, reemplazar NULL por NaN
+        for col in name_columns:
+            df_clean[col] = df_clean[col].replace(['NULL', 'NAN', ''], np.nan)
+        medicion.filas_salida = len(df_clean)
+    
+    return df_clean
+
+def _iniciar_proceso_limpieza(ruta_cache):
+    """Inicializa un proceso trabajador abriendo su propia conexión a la caché"""
+    global _cache_proceso
+    desactivar_en_trabajador()
+    _cache_proceso = CacheLimpieza(ruta_cache) if ruta_cache is not None else None
+
+def _limpiar_particion(particion):
+    """Limpia una partición dentro de un proceso trabajador; devuelve también el uso de la caché en ella"""
+    if _cache_proceso is None:
+        return limpiar_bloque(particion), {}
+    _cache_proceso.estadisticas = {}
+    return limpiar_bloque(particion, _cache_proceso), _cache_proceso.estadisticas
+
+def limpiar_en_paralelo(df, procesos, cache=None, particiones=None):
+    """Aplica los pasos 1 a 8 sobre particiones del dataframe en un ProcessPoolExecutor y las reensambla en orden.
+    
+    Cada proceso abre su propia conexión a la caché; sus aciertos y valores
+    calculados se suman a las estadísticas de cache.
+    """
+    particiones = particiones or procesos * 4
+    limites = np.linspace(0, len(df), particiones + 1, dtype=int)
+    partes = [df.iloc[inicio:fin] for inicio, fin in zip(limites[:-1], limites[1:]) if fin > inicio]
+    
+    if not partes:
+        return limpiar_bloque(df)
+    
+    with ProcessPoolExecutor(
+        max_workers=procesos,
+        initializer=_iniciar_proceso_limpieza,
+        initargs=(cache.ruta_db if cache is not None else None,)
+    ) as executor:
+        # map conserva el orden de las particiones
+        resultados, estadisticas = zip(*executor.map(_limpiar_particion, partes))
+    
+    if cache is not None:
+        for estadisticas_particion in estadisticas:
+            cache.sumar_estadisticas(estadisticas_particion)
+    return pd.concat(resultados)
+
+@perfilar()
+def limpiar_datos(df, cache=None, procesos=1):
+    """Función principal para limpiar el dataframe.
+    
+    cache: CacheLimpieza opcional para los pasos 4 a 7.
+    procesos: con más de uno, los pasos por fila se reparten entre procesos y
+    la eliminación de duplicados se hace después sobre el resultado unido.
+    """
+    print("Iniciando limpieza de datos...")
+    
+    # Pasos 1 a 8: limpieza por fila
+    if procesos > 1:
+        print(f"Limpieza en paralelo con {procesos} procesos...")
+        df_clean = limpiar_en_paralelo(df, procesos, cache)
+    else:
+        df_clean = limpiar_bloque(df, cache)
+    print(f"Eliminadas {len(df) - len(df_clean)} filas completamente vacías")
     
     # 9. Eliminar duplicados de manera avanzada
-    df_clean = eliminar_duplicados_avanzado(df_clean)
+    with etapa('9_eliminar_duplicados', len(df_clean)) as medicion:
+        df_clean = eliminar_duplicados_avanzado(df_clean)
+        medicion.filas_salida = len(df_clean)
     
-    return df_clean
+    return compactar(df_clean, ESQUEMA_LIMPIOS)
+
+def limpiar_datos_por_bloques(bloques, cache=None, umbral_similitud=UMBRAL_SIMILITUD):
+    """Limpia un flujo de bloques y produce los bloques limpios sin materializar el conjunto completo.
+    
+    Los duplicados por identidad se eliminan entre bloques recordando solo una
+    huella de 64 bits de cada identidad ya vista; los casi duplicados, con el
+    mismo detector incremental que la limpieza completa, de modo que ambos
+    modos conservan las mismas filas.
+    """
+    vistos = set()
+    detector = DetectorCasiDuplicados(umbral_similitud) if umbral_similitud is not None else None
+    
+    for bloque in bloques:
+        bloque_limpio = limpiar_bloque(bloque, cache)
+        
+        huellas = hash_identidad(bloque_limpio)
+        repetidos = np.fromiter((h in vistos for h in huellas.tolist()), dtype=bool, count=len(huellas))
+        repetidos |= huellas.duplicated(keep='first').to_numpy()
+        vistos.update(huellas[~repetidos].tolist())
+        bloque_limpio = bloque_limpio[~repetidos]
+        
+        if detector is not None:
+            casi_duplicados, _ = detector.procesar(bloque_limpio)
+            bloque_limpio = bloque_limpio[~casi_duplicados.to_numpy()]
+        
+        yield bloque_limpio
 
+@perfilar()
 def generar_diccionario_datos(df):
     """Genera un diccionario de datos a partir del dataframe limpio"""
     print("Generando diccionario de datos...")
@@ -304,8 +572,72 @@ def generar_ciudades_normalizadas():
         'Ciudad_Normalizada': sorted(ciudades)
     })
 
-def main():
-    """Función principal"""
+@perfilar()
+def procesar_por_bloques(config, cache=None, tamano_bloque=TAMANO_BLOQUE, formatos=FORMATOS_EXPORTACION):
+    """Lee, limpia y escribe datos_limpios.arrow (y las exportaciones pedidas) bloque a bloque con memoria acotada"""
+    ruta_archivo = config['raw_data_dir'] / "BD.xlsx"
+    ruta_arrow = config['output_data_dir'] / "datos_limpios.arrow"
+    ruta_diccionario = config['output_data_dir'] / "diccionario_datos.csv"
+    ruta_ciudades = config['output_data_dir'] / "ciudades_normalizadas.csv"
+    
+    print(f"Procesando por bloques de {tamano_bloque} filas...")
+    
+    registros_originales = 0
+    
+    def contar_originales(bloques):
+        nonlocal registros_originales
+        for bloque in bloques:
+            registros_originales += len(bloque)
+            yield bloque
+    
+    total_registros = 0
+    nulos_por_columna = None
+    primer_bloque = None
+    
+    bloques = contar_originales(leer_excel_por_bloques(ruta_archivo, tamano_bloque))
+    with EscritorIntercambio(ruta_arrow, ESQUEMA_LIMPIOS) as escritor, \
+            EscritorExportaciones(config['output_data_dir'] / "datos_limpios", formatos) as exportaciones:
+        for i, bloque_limpio in enumerate(limpiar_datos_por_bloques(bloques, cache)):
+            escritor.escribir(bloque_limpio)
+            exportaciones.escribir(bloque_limpio)
+            
+            total_registros += len(bloque_limpio)
+            nulos_bloque = bloque_limpio.isnull().sum()
+            nulos_por_columna = nulos_bloque if nulos_por_columna is None else nulos_por_columna + nulos_bloque
+            if primer_bloque is None:
+                primer_bloque = bloque_limpio.head(1)
+            print(f"  - Bloque {i + 1}: {registros_originales} filas leídas, {total_registros} filas limpias")
+    
+    if primer_bloque is None:
+        print("El archivo no contiene datos.")
+        return
+    
+    generar_diccionario_datos(primer_bloque).to_csv(ruta_diccionario, index=False, encoding='utf-8')
+    generar_ciudades_normalizadas().to_csv(ruta_ciudades, index=False, encoding='utf-8')
+    
+    print("\n" + "=" * 60)
+    print("RESULTADOS DE LA LIMPIEZA")
+    print("=" * 60)
+    print(f"Registros originales: {registros_originales}")
+    print(f"Registros después de limpieza: {total_registros}")
+    print("\nArchivos generados:")
+    print(f"- Datos limpios (Arrow): {ruta_arrow}")
+    for formato, ruta in exportaciones.rutas.items():
+        print(f"- Datos limpios ({NOMBRES_FORMATOS[formato]}): {ruta}")
+    print(f"- Diccionario de datos: {ruta_diccionario}")
+    print(f"- Ciudades normalizadas: {ruta_ciudades}")
+    
+    print("\nPorcentaje de valores nulos por columna:")
+    for columna, nulos in nulos_por_columna.items():
+        print(f"- {columna}: {round(nulos / total_registros * 100, 2) if total_registros else 0.0}%")
+
+def main(por_bloques=False, procesos=1, formatos=FORMATOS_EXPORTACION):
+    """Función principal.
+    
+    por_bloques: lectura en streaming con memoria acotada.
+    procesos: número de procesos para la limpieza por fila.
+    formatos: exportaciones a generar además del archivo de intercambio Arrow ('csv', 'xlsx').
+    """
     print("=" * 60)
     print("FASE 1 - LIMPIEZA Y TRANSFORMACIÓN DE DATOS (SPRINT 1)")
     print("=" * 60)
@@ -313,6 +645,15 @@ def main():
     # Configurar entorno
     config = configurar_entorno()
     
+    if por_bloques:
+        cache = CacheLimpieza(config['database_dir'] / "cache_limpieza.db")
+        try:
+            procesar_por_bloques(config, cache, formatos=formatos)
+        finally:
+            cache.cerrar()
+        print("\n¡Proceso completado exitosamente!")
+        return
+    
     # Cargar datos
     ruta_archivo = config['raw_data_dir'] / "BD.xlsx"
     df = cargar_datos(ruta_archivo)
@@ -321,8 +662,14 @@ def main():
         print("No se pudo cargar el archivo. Verifique la ruta y el formato.")
         return
     
-    # Limpiar datos
-    df_clean = limpiar_datos(df)
+    # Limpiar datos usando la caché persistente de valores ya limpiados
+    cache = CacheLimpieza(config['database_dir'] / "cache_limpieza.db")
+    try:
+        df_clean = limpiar_datos(df, cache, procesos)
+        print("Uso de la caché de limpieza:")
+        cache.resumen()
+    finally:
+        cache.cerrar()
     
     # Generar diccionario de datos
     diccionario_datos = generar_diccionario_datos(df_clean)
@@ -331,13 +678,15 @@ def main():
     ciudades_normalizadas = generar_ciudades_normalizadas()
     
     # Guardar resultados
-    ruta_csv = config['output_data_dir'] / "datos_limpios.csv"
-    ruta_excel = config['output_data_dir'] / "datos_limpios.xlsx"
+    ruta_arrow = config['output_data_dir'] / "datos_limpios.arrow"
     ruta_diccionario = config['output_data_dir'] / "diccionario_datos.csv"
     ruta_ciudades = config['output_data_dir'] / "ciudades_normalizadas.csv"
     
-    df_clean.to_csv(ruta_csv, index=False, encoding='utf-8')
-    df_clean.to_excel(ruta_excel, index=False)
+    # Formato de intercambio con la Fase 2
+    guardar_intercambio(df_clean, ruta_arrow, ESQUEMA_LIMPIOS)
+    
+    # Formatos de exportación
+    exportaciones = exportar_dataframe(df_clean, config['output_data_dir'] / "datos_limpios", formatos)
     diccionario_datos.to_csv(ruta_diccionario, index=False, encoding='utf-8')
     ciudades_normalizadas.to_csv(ruta_ciudades, index=False, encoding='utf-8')
     
@@ -348,8 +697,9 @@ def main():
     print(f"Registros después de limpieza: {len(df_clean)}")
     print(f"Columnas procesadas: {len(df_clean.columns)}")
     print("\nArchivos generados:")
-    print(f"- Datos limpios (CSV): {ruta_csv}")
-    print(f"- Datos limpios (Excel): {ruta_excel}")
+    print(f"- Datos limpios (Arrow): {ruta_arrow}")
+    for formato, ruta in exportaciones.items():
+        print(f"- Datos limpios ({NOMBRES_FORMATOS[formato]}): {ruta}")
     print(f"- Diccionario de datos: {ruta_diccionario}")
     print(f"- Ciudades normalizadas: {ruta_ciudades}")
     
@@ -385,4 +735,22 @@ def main():
     print("\n¡Proceso completado exitosamente!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Fase 1 - Limpieza y transformación de datos")
+    parser.add_argument('--por-bloques', action='store_true',
+                        help="leer y limpiar BD.xlsx por bloques con memoria acotada")
+    parser.add_argument('--procesos', type=int, default=1,
+                        help="número de procesos para los pasos de limpieza por fila")
+    parser.add_argument('--formatos', type=parsear_formatos, default=FORMATOS_EXPORTACION,
+                        help="exportaciones a generar: csv, xlsx, csv,xlsx (por defecto) o ninguno")
+    parser.add_argument('--sin-exportaciones', dest='formatos', action='store_const', const=(),
+                        help="escribir solo el archivo de intercambio Arrow, sin CSV ni XLSX")
+    parser.add_argument('--perfilar-memoria', action='store_true',
+                        help="medir el pico de memoria de Python de cada etapa con tracemalloc (más lento)")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="guardar un perfil de cProfile por etapa en reports/perfiles/")
+    args = parser.parse_args()
+    
+    with Perfilador('fase1', memoria=args.perfilar_memoria, cprofile=args.cprofile):
+        main(por_bloques=args.por_bloques, procesos=args.procesos, formatos=args.formatos)
\ No newline at end of file
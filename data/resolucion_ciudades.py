@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Motor de resolución de nombres de ciudades (Fase 1)
+Combina un autómata Aho-Corasick para los patrones de corrección conocidos,
+un árbol BK sobre el catálogo de ciudades normalizadas para errores de
+digitación no vistos y una memoización por valor crudo distinto.
+"""
+
+from collections import deque
+
+import pandas as pd
+
+def distancia_levenshtein(a, b):
+    """Calcula la distancia de edición entre dos cadenas"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        actual = [i]
+        for j, cb in enumerate(b, start=1):
+            actual.append(min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + (ca != cb)
+            ))
+        anterior = actual
+    return anterior[-1]
+
+class AutomataAhoCorasick:
+    """Autómata de búsqueda simultánea de múltiples patrones en una sola pasada"""
+
+    def __init__(self, patrones):
+        self.transiciones = [{}]
+        self.fallos = [0]
+        self.salidas = [[]]
+
+        for indice, patron in enumerate(patrones):
+            self._agregar(patron, indice)
+        self._construir_fallos()
+
+    def _agregar(self, patron, indice):
+        """Inserta un patrón en el trie"""
+        estado = 0
+        for caracter in patron:
+            siguiente = self.transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self.transiciones)
+                self.transiciones[estado][caracter] = siguiente
+                self.transiciones.append({})
+                self.fallos.append(0)
+                self.salidas.append([])
+            estado = siguiente
+        self.salidas[estado].append(indice)
+
+    def _construir_fallos(self):
+        """Calcula los enlaces de fallo con un recorrido en anchura"""
+        cola = deque(self.transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self.transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self.fallos[estado]
+                while fallo and caracter not in self.transiciones[fallo]:
+                    fallo = self.fallos[fallo]
+                self.fallos[siguiente] = self.transiciones[fallo].get(caracter, 0)
+                self.salidas[siguiente] = self.salidas[siguiente] + self.salidas[self.fallos[siguiente]]
+
+    def buscar(self, texto):
+        """Devuelve los índices de todos los patrones contenidos en el texto"""
+        encontrados = set()
+        estado = 0
+        for caracter in texto:
+            while estado and caracter not in self.transiciones[estado]:
+                estado = self.fallos[estado]
+            estado = self.transiciones[estado].get(caracter, 0)
+            encontrados.update(self.salidas[estado])
+        return encontrados
+
+class ArbolBK:
+    """Árbol BK para búsqueda del término más cercano por distancia de edición"""
+
+    def __init__(self, terminos, distancia=distancia_levenshtein):
+        self.distancia = distancia
+        self.raiz = None
+        for termino in terminos:
+            self._agregar(termino)
+
+    def _agregar(self, termino):
+        """Inserta un término en el árbol"""
+        if self.raiz is None:
+            self.raiz = (termino, {})
+            return
+        nodo = self.raiz
+        while True:
+            d = self.distancia(termino, nodo[0])
+            if d == 0:
+                return
+            hijo = nodo[1].get(d)
+            if hijo is None:
+                nodo[1][d] = (termino, {})
+                return
+            nodo = hijo
+
+    def buscar_mas_cercano(self, consulta, distancia_maxima):
+        """Devuelve (término, distancia) más cercano dentro del umbral, o (None, None)"""
+        if self.raiz is None:
+            return None, None
+
+        mejor, mejor_distancia = None, None
+        pendientes = [self.raiz]
+        while pendientes:
+            termino, hijos = pendientes.pop()
+            d = self.distancia(consulta, termino)
+            if d <= distancia_maxima and (
+                mejor is None or d < mejor_distancia or (d == mejor_distancia and termino < mejor)
+            ):
+                mejor, mejor_distancia = termino, d
+            limite = distancia_maxima if mejor is None else min(distancia_maxima, mejor_distancia)
+            for distancia_hijo, hijo in hijos.items():
+                if d - limite <= distancia_hijo <= d + limite:
+                    pendientes.append(hijo)
+        return mejor, mejor_distancia
+
+class ResolutorCiudades:
+    """Resuelve nombres de ciudades crudos a su forma normalizada.
+
+    Orden de resolución:
+    1. Patrones de corrección conocidos (gana el patrón más largo contenido en el valor)
+    2. Normalización de texto
+    3. Ciudad del catálogo más cercana por distancia de edición, si está dentro del umbral
+    """
+
+    def __init__(self, correcciones, ciudades_canonicas, normalizador):
+        self.patrones = list(correcciones.keys())
+        self.correcciones = [correcciones[patron] for patron in self.patrones]
+        self.automata = AutomataAhoCorasick(self.patrones)
+        # Las correcciones se encadenan hasta un valor estable ("CALY" → "CALI" → "SANTIAGO DE CALI")
+        self.correcciones = [self._estable(correccion) for correccion in self.correcciones]
+        self.normalizador = normalizador
+        self.canonicas = set(ciudades_canonicas) | set(self.correcciones)
+        self.arbol = ArbolBK(sorted(self.canonicas))
+        self.memo = {}
+
+    @staticmethod
+    def distancia_maxima(texto):
+        """Umbral de distancia aceptado para la búsqueda aproximada"""
+        return max(1, len(texto) // 5)
+
+    def resolver(self, ciudad):
+        """Resuelve un único valor crudo"""
+        if pd.isna(ciudad):
+            return ciudad
+
+        clave = str(ciudad).strip()
+        if clave in self.memo:
+            return self.memo[clave]
+
+        resultado = self._resolver_sin_memo(clave)
+        self.memo[clave] = resultado
+        return resultado
+
+    def _corregir(self, texto):
+        """Corrección del patrón conocido contenido en el texto, o None si no contiene ninguno"""
+        coincidencias = self.automata.buscar(texto.upper())
+        if not coincidencias:
+            return None
+        # El patrón más largo es el más específico; en empate, el primero declarado
+        indice = max(coincidencias, key=lambda i: (len(self.patrones[i]), -i))
+        return self.correcciones[indice]
+
+    def _estable(self, texto):
+        """Aplica las correcciones al texto hasta que no cambie (o hasta volver a un valor ya visto)"""
+        vistos = {texto}
+        while True:
+            corregido = self._corregir(texto)
+            if corregido is None or corregido in vistos:
+                return texto
+            vistos.add(corregido)
+            texto = corregido
+
+    def _resolver_sin_memo(self, ciudad):
+        """Aplica las reglas de resolución sin consultar la memoización"""
+        corregida = self._corregir(ciudad)
+        if corregida is not None:
+            return corregida
+
+        normalizada = self.normalizador(ciudad)
+        if not normalizada:
+            return normalizada
+        if normalizada not in self.canonicas:
+            cercana, _ = self.arbol.buscar_mas_cercano(normalizada, self.distancia_maxima(normalizada))
+            if cercana is None:
+                return normalizada
+            normalizada = cercana
+
+        # La ciudad del catálogo pasa por las mismas correcciones que un valor escrito sin errores
+        # ("CALLI" → "CALI" → "SANTIAGO DE CALI", igual que "CALI")
+        corregida = self._corregir(normalizada)
+        return corregida if corregida is not None else normalizada
+
+    def resolver_columna(self, serie):
+        """Resuelve una columna completa trabajando solo sobre sus valores distintos"""
+        mascara = serie.notna()
+        if not mascara.any():
+            return serie.apply(self.resolver)
+
+        codigos, unicos = pd.factorize(serie[mascara].map(str))
+        resueltos = pd.Series([self.resolver(valor) for valor in unicos], dtype=object)
+
+        resultado = serie.astype(object, copy=True)
+        resultado[mascara] = resueltos.to_numpy()[codigos]
+        return resultado
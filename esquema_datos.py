@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Esquema y formato de intercambio entre fases
+Las fases se pasan los datos en archivos Arrow IPC (.arrow) sin comprimir con
+un esquema explícito, de modo que los tipos se conservan (los teléfonos siguen
+siendo texto, el nivel de riesgo sigue siendo categórico) y la lectura se hace
+con memoria mapeada en lugar de volver a interpretar un CSV. La conversión a
+pandas sí copia los números y las categorías; los textos se quedan en el
+archivo mapeado como string[pyarrow]. CSV y XLSX quedan como formatos de
+exportación.
+
+El mismo esquema es el registro de tipos en memoria: cada campo declara su
+representación compacta (category, string[pyarrow] o número reducido) y todos
+los cargadores (Arrow y CSV) y las fases la aplican con compactar().
+
+También define la máscara de validez por registro (un bit por campo con valor)
+de la que se derivan la completitud, las alertas y la monitorización de calidad.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from perfilado import perfilar
+
+# Campos con un bit en la máscara de validez (bit i = campo i con valor no vacío)
+CAMPOS_VALIDEZ = [
+    'NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act',
+    'NombresGerenteFinanciero_Act', 'ApellidosGerenteFinanciero_Act',
+    'Ciudad_Act', 'CodDANE', 'Telefono_Act1', 'Telefono_Act2'
+]
+BITS_VALIDEZ = {campo: 1 << i for i, campo in enumerate(CAMPOS_VALIDEZ)}
+
+# Campos que cuentan para el porcentaje de completitud
+CAMPOS_COMPLETITUD = CAMPOS_VALIDEZ[:7]
+MASCARA_COMPLETITUD = sum(BITS_VALIDEZ[campo] for campo in CAMPOS_COMPLETITUD)
+
+# Representación en memoria de cada columna, guardada en los metadatos de su campo:
+#   categoria: pocos valores distintos -> category
+#   texto: texto libre -> cadenas respaldadas por Arrow (string[pyarrow])
+#   numero: el tipo numérico más pequeño que conserva todos los valores
+CATEGORIA, TEXTO, NUMERO = 'categoria', 'texto', 'numero'
+TIPO_TEXTO = pd.StringDtype('pyarrow')
+
+def campo(nombre, tipo, representacion):
+    """Campo del esquema con su representación compacta en memoria"""
+    return pa.field(nombre, tipo, metadata={'representacion': representacion})
+
+# Columnas producidas por la Fase 1
+CAMPOS_LIMPIOS = [
+    campo('NombresGerenteGeneral_Act', pa.string(), TEXTO),
+    campo('ApellidosGerenteGeneral_Act', pa.string(), TEXTO),
+    campo('NombresGerenteFinanciero_Act', pa.string(), TEXTO),
+    campo('ApellidosGerenteFinanciero_Act', pa.string(), TEXTO),
+    campo('Ciudad_Act', pa.string(), CATEGORIA),
+    campo('CodDANE', pa.string(), TEXTO),
+    campo('Telefono_Act1', pa.string(), TEXTO),
+    campo('Telefono_Act2', pa.string(), TEXTO),
+]
+
+# Columnas añadidas por la Fase 2
+CAMPOS_ENRIQUECIDOS = CAMPOS_LIMPIOS + [
+    campo('Region', pa.string(), CATEGORIA),
+    campo('Tamaño_Empresa', pa.string(), CATEGORIA),
+    campo('ID_Empresa', pa.string(), TEXTO),
+    campo('Fecha_Procesamiento', pa.string(), CATEGORIA),
+    campo('Porcentaje_Completitud', pa.float64(), NUMERO),
+    campo('Mascara_Validez', pa.uint8(), NUMERO),
+]
+
+# Columnas añadidas por la Fase 3
+CAMPOS_INTEGRADOS = CAMPOS_ENRIQUECIDOS + [
+    campo('PIB_Per_Capita', pa.float64(), NUMERO),
+    campo('Tasa_Desempleo', pa.float64(), NUMERO),
+    campo('Crecimiento_Economico', pa.float64(), NUMERO),
+    campo('Poblacion', pa.float64(), NUMERO),
+    campo('Densidad_Poblacion', pa.float64(), NUMERO),
+    campo('Clima_Empresarial', pa.string(), CATEGORIA),
+    campo('Puntuacion_Riesgo', pa.int64(), NUMERO),
+    campo('Nivel_Riesgo', pa.dictionary(pa.int8(), pa.string(), ordered=True), CATEGORIA),
+]
+
+ESQUEMA_LIMPIOS = pa.schema(CAMPOS_LIMPIOS)
+ESQUEMA_ENRIQUECIDOS = pa.schema(CAMPOS_ENRIQUECIDOS)
+ESQUEMA_INTEGRADOS = pa.schema(CAMPOS_INTEGRADOS)
+
+def representacion(esquema, columna):
+    """Representación en memoria declarada para la columna (None si el esquema no la declara)"""
+    if columna not in esquema.names:
+        return None
+    metadatos = esquema.field(columna).metadata or {}
+    valor = metadatos.get(b'representacion')
+    return valor.decode() if valor is not None else None
+
+def reducir_numero(serie, sin_signo=False):
+    """Reduce una columna numérica al tipo más pequeño que conserva todos sus valores.
+    
+    sin_signo: la columna es un entero sin signo (se reduce a uintN si no tiene negativos).
+    """
+    if pd.api.types.is_bool_dtype(serie) or not pd.api.types.is_numeric_dtype(serie):
+        return serie
+    if pd.api.types.is_integer_dtype(serie):
+        sin_signo = pd.api.types.is_unsigned_integer_dtype(serie) or (sin_signo and not (serie < 0).any())
+        return pd.to_numeric(serie, downcast='unsigned' if sin_signo else 'integer')
+    # float32 solo si todos los valores vuelven exactos a float64
+    valores = serie.to_numpy(dtype=np.float64)
+    if np.array_equal(valores.astype(np.float32).astype(np.float64), valores, equal_nan=True):
+        return serie.astype(np.float32)
+    return serie
+
+def compactar(df, esquema=ESQUEMA_INTEGRADOS):
+    """Convierte las columnas declaradas en el esquema a su representación compacta (las demás no cambian)"""
+    df = df.copy(deep=False)
+    for columna in df.columns:
+        tipo = representacion(esquema, columna)
+        serie = df[columna]
+        if tipo == CATEGORIA and not isinstance(serie.dtype, pd.CategoricalDtype):
+            df[columna] = serie.astype(object).where(serie.notna(), None).astype('category')
+        elif tipo == TEXTO and serie.dtype != TIPO_TEXTO:
+            df[columna] = serie.astype(TIPO_TEXTO)
+        elif tipo == NUMERO:
+            df[columna] = reducir_numero(serie, pa.types.is_unsigned_integer(esquema.field(columna).type))
+    return df
+
+def memoria_mb(df):
+    """Memoria del dataframe en MB (incluye el contenido de los textos)"""
+    return df.memory_usage(index=False, deep=True).sum() / 2**20
+
+def informe_memoria(antes, despues):
+    """Memoria y tipo de cada columna antes y después de compactar (MB)"""
+    informe = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'mb_antes': antes.memory_usage(index=False, deep=True) / 2**20,
+        'tipo_despues': despues.dtypes.astype(str),
+        'mb_despues': despues.memory_usage(index=False, deep=True) / 2**20,
+    })
+    informe.loc['TOTAL'] = ['', informe['mb_antes'].sum(), '', informe['mb_despues'].sum()]
+    informe['reduccion'] = 1 - informe['mb_despues'] / informe['mb_antes']
+    return informe
+
+def compactar_con_informe(df, esquema=ESQUEMA_INTEGRADOS):
+    """Compacta el dataframe e imprime la memoria antes y después"""
+    compacto = compactar(df, esquema)
+    antes, despues = memoria_mb(df), memoria_mb(compacto)
+    reduccion = 1 - despues / antes if antes else 0
+    print(f"Memoria en pandas: {antes:.1f} MB → {despues:.1f} MB con tipos compactos ({reduccion:.0%} menos)")
+    return compacto
+
+def clave_identidad(df):
+    """Clave de identidad de una empresa: gerente general, ciudad y código DANE"""
+    columnas = ['NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act', 'Ciudad_Act', 'CodDANE']
+    # Como object: fillna('') no es válido en columnas categóricas y la clave debe ser igual con cualquier representación
+    partes = [df[col].astype(object).fillna('') for col in columnas]
+    clave = partes[0]
+    for parte in partes[1:]:
+        clave = clave + '|' + parte
+    return clave
+
+def hash_identidad(df):
+    """Hash de 64 bits (uint64) de la clave de identidad, estable entre ejecuciones"""
+    return pd.util.hash_pandas_object(clave_identidad(df), index=False)
+
+def texto_no_vacio(serie):
+    """Indica por fila si un texto no es nulo ni está formado solo por espacios, sin convertirlo a object"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se recortan solo las categorías y el resultado se reparte por los códigos
+        categorias = serie.cat.categories.astype(str).str.strip().to_numpy() != ''
+        codigos = serie.cat.codes.to_numpy()
+        return (codigos >= 0) & np.append(categorias, False)[codigos]
+    if isinstance(serie.dtype, pd.StringDtype):
+        return serie.str.strip().ne('').to_numpy(dtype=bool, na_value=False)
+    return serie.notna().to_numpy() & serie.astype(str).str.strip().ne('').to_numpy()
+
+def calcular_mascara_validez(df):
+    """Calcula en una sola pasada la máscara de validez por registro (uint8, un bit por campo)"""
+    mascara = np.zeros(len(df), dtype=np.uint8)
+    for campo, bit in BITS_VALIDEZ.items():
+        if campo not in df.columns:
+            continue
+        serie = df[campo]
+        if pd.api.types.is_numeric_dtype(serie):
+            valido = serie.notna().to_numpy()
+        else:
+            # Un texto solo con espacios cuenta como vacío
+            valido = texto_no_vacio(serie)
+        mascara[valido] |= np.uint8(bit)
+    return mascara
+
+def obtener_mascara_validez(df):
+    """Devuelve la columna Mascara_Validez, calculándola si el dataframe no la trae"""
+    if 'Mascara_Validez' in df.columns:
+        return df['Mascara_Validez'].to_numpy(dtype=np.uint8)
+    return calcular_mascara_validez(df)
+
+def contar_bits(mascara, filtro=0xFF):
+    """Cuenta los bits activos de cada máscara (popcount), opcionalmente solo los de filtro"""
+    mascara = np.asarray(mascara, dtype=np.uint8) & np.uint8(filtro)
+    return np.unpackbits(mascara[:, None], axis=1).sum(axis=1)
+
+def tiene_campo(mascara, campo):
+    """Indica por registro si el campo tiene un valor válido según la máscara"""
+    return (np.asarray(mascara, dtype=np.uint8) & np.uint8(BITS_VALIDEZ[campo])) != 0
+
+def esquema_para(df, esquema):
+    """Ajusta el esquema a las columnas del dataframe; las columnas no declaradas usan el tipo inferido"""
+    campos = []
+    for col in df.columns:
+        if col in esquema.names:
+            campos.append(esquema.field(col))
+        else:
+            campos.append(pa.Table.from_pandas(df[[col]], preserve_index=False).schema.field(col))
+    return pa.schema(campos)
+
+def preparar_tabla(df, esquema):
+    """Convierte un dataframe en una tabla Arrow con el esquema indicado"""
+    esquema = esquema_para(df, esquema)
+    columnas = {}
+    for campo in esquema:
+        serie = df[campo.name]
+        if pa.types.is_string(campo.type):
+            # Texto explícito: los valores no nulos se guardan como str, los nulos como null
+            serie = serie.astype(object).where(serie.notna(), None)
+            serie = serie.map(lambda valor: valor if valor is None or isinstance(valor, str) else str(valor))
+        columnas[campo.name] = serie
+    return pa.Table.from_pandas(pd.DataFrame(columnas), schema=esquema, preserve_index=False)
+
+@perfilar()
+def guardar_intercambio(df, ruta, esquema):
+    """Guarda un dataframe en formato Arrow IPC sin comprimir"""
+    tabla = preparar_tabla(df, esquema)
+    with pa.OSFile(str(ruta), 'wb') as destino:
+        with pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+
+class EscritorIntercambio:
+    """Escribe un archivo Arrow IPC bloque a bloque (para la limpieza por bloques)"""
+
+    def __init__(self, ruta, esquema):
+        self.ruta = ruta
+        self.esquema = esquema
+        self.destino = None
+        self.escritor = None
+        self.esquema_archivo = None
+
+    def escribir(self, df):
+        """Añade un bloque al archivo, abriéndolo con el esquema del primer bloque"""
+        tabla = preparar_tabla(df, self.esquema)
+        if self.escritor is None:
+            self.esquema_archivo = tabla.schema
+            self.destino = pa.OSFile(str(self.ruta), 'wb')
+            self.escritor = pa.ipc.new_file(self.destino, self.esquema_archivo)
+        self.escritor.write_table(tabla.cast(self.esquema_archivo))
+
+    def cerrar(self):
+        """Cierra el archivo"""
+        if self.escritor is not None:
+            self.escritor.close()
+            self.destino.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+def _codificar_categoria(columna):
+    """Codifica una columna de texto Arrow como diccionario con las categorías ordenadas (igual que astype('category'))"""
+    categorias = pc.drop_null(pc.unique(columna))
+    categorias = categorias.take(pc.sort_indices(categorias))
+    indices = pc.index_in(columna, value_set=categorias).cast(pa.int32())
+    return pa.chunked_array(
+        [pa.DictionaryArray.from_arrays(bloque, categorias) for bloque in indices.chunks],
+        type=pa.dictionary(pa.int32(), categorias.type))
+
+def _tipo_pandas(tipo):
+    """types_mapper de to_pandas: el texto Arrow pasa a string[pyarrow] sin crear objetos str"""
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return TIPO_TEXTO
+    return None
+
+@perfilar()
+def leer_intercambio(ruta, columnas=None, esquema=ESQUEMA_INTEGRADOS):
+    """Lee un archivo Arrow IPC con memoria mapeada y lo devuelve como dataframe con tipos compactos.
+
+    Solo la lectura es sin copia: los textos siguen apuntando al archivo mapeado
+    (string[pyarrow]), pero los números se copian a bloques de NumPy y las
+    categorías se codifican de nuevo. Con columnas se leen solo esas (las que
+    existan en el archivo) y el resto nunca llega a pandas.
+    """
+    with pa.memory_map(str(ruta), 'r') as fuente:
+        tabla = pa.ipc.open_file(fuente).read_all()
+    if columnas is not None:
+        tabla = tabla.select([columna for columna in columnas if columna in tabla.schema.names])
+    for indice, campo in enumerate(tabla.schema):
+        if representacion(esquema, campo.name) == CATEGORIA and pa.types.is_string(campo.type):
+            tabla = tabla.set_column(indice, campo.name, _codificar_categoria(tabla.column(indice)))
+    # Cada columna en su propio bloque y liberada en cuanto se convierte: el pico no duplica la tabla
+    df = tabla.to_pandas(split_blocks=True, self_destruct=True, types_mapper=_tipo_pandas)
+    del tabla
+    return compactar_con_informe(df, esquema)
+
+def tipos_csv(esquema):
+    """dtype de read_csv para cada columna del esquema: los textos no se infieren como números"""
+    tipos = {}
+    for campo_esquema in esquema:
+        tipo = representacion(esquema, campo_esquema.name)
+        if tipo == CATEGORIA:
+            tipos[campo_esquema.name] = 'category'
+        elif tipo == TEXTO:
+            tipos[campo_esquema.name] = TIPO_TEXTO
+        elif pa.types.is_floating(campo_esquema.type):
+            tipos[campo_esquema.name] = campo_esquema.type.to_pandas_dtype()
+    return tipos
+
+@perfilar()
+def leer_csv(ruta, esquema):
+    """Lee una exportación CSV con las columnas y los tipos del esquema (sin inferir tipos)"""
+    df = pd.read_csv(ruta, usecols=lambda columna: columna in esquema.names, dtype=tipos_csv(esquema))
+    return compactar_con_informe(df, esquema)
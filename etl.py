@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Línea de comandos por etapas del pipeline
+Objetivo: Ejecutar una sola etapa (limpiar, enriquecer, integrar, cargar,
+graficas, dashboard) leyendo y escribiendo los archivos de intercambio Arrow,
+de modo que un trabajo programado solo importe los módulos y bibliotecas que
+usa esa etapa: matplotlib y seaborn se cargan solo al dibujar las gráficas y
+plotly solo al generar los dashboards. Cada etapa registra su perfilado en
+reports/perfilado_etapas.json (perfilado.py).
+
+El subcomando importaciones mide el tiempo de importación de los módulos de
+las fases con python -X importtime y falla si alguno vuelve a cargar una
+biblioteca pesada al importarse (control de regresiones).
+
+Uso: python etl.py <etapa> [opciones]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR / "data"))
+
+# Bibliotecas que ninguna fase debe importar al cargarse (solo dentro de las etapas que las usan)
+BIBLIOTECAS_PESADAS = ('matplotlib', 'seaborn', 'plotly', 'streamlit', 'requests', 'sqlalchemy', 'openpyxl')
+
+# Módulos cuyo tiempo de importación se controla
+MODULOS_ETAPAS = ('etl', 'limpieza_datos', 'fase2_analisis', 'fase3_integracion', 'pipeline', 'pipeline_incremental')
+
+def formatos_exportacion(texto):
+    """Tipo del argumento --formatos (importa el módulo de exportaciones solo al usarse)"""
+    from exportaciones import parsear_formatos
+
+    return parsear_formatos(texto)
+
+def configurar_entorno():
+    """Configura las rutas de los archivos de intercambio entre etapas"""
+    base_dir = Path.cwd()
+    data_dir = base_dir / "data"
+    config = {
+        'base_dir': base_dir,
+        'output_data_dir': data_dir / "output",
+        'processed_data_dir': data_dir / "processed",
+        'reports_dir': base_dir / "reports",
+        'dashboards_dir': base_dir / "dashboards",
+        'database_dir': base_dir / "database",
+    }
+    config['ruta_limpios'] = config['output_data_dir'] / "datos_limpios.arrow"
+    config['ruta_enriquecidos'] = config['processed_data_dir'] / "datos_enriquecidos.arrow"
+    config['ruta_integrados'] = config['processed_data_dir'] / "datos_integrados.arrow"
+
+    # Crear directorios si no existen
+    for clave in ('processed_data_dir', 'reports_dir', 'dashboards_dir', 'database_dir'):
+        config[clave].mkdir(parents=True, exist_ok=True)
+
+    return config
+
+def leer_entrada(ruta, etapa_previa, columnas=None):
+    """Lee el archivo de intercambio de la etapa anterior (solo las columnas indicadas, si se dan)"""
+    from esquema_datos import leer_intercambio
+
+    if not ruta.exists():
+        raise SystemExit(f"No existe {ruta}. Ejecute primero: python etl.py {etapa_previa}")
+    df = leer_intercambio(ruta, columnas)
+    print(f"Leídas {len(df)} filas de {ruta}")
+    return df
+
+# ---------------------------------------------------------------------------
+# Etapas: cada una importa solo los módulos que necesita
+# ---------------------------------------------------------------------------
+
+def etapa_limpiar(config, args):
+    """Fase 1: BD.xlsx -> datos_limpios.arrow"""
+    import limpieza_datos
+
+    limpieza_datos.main(por_bloques=args.por_bloques, procesos=args.procesos, formatos=args.formatos)
+
+def etapa_enriquecer(config, args):
+    """Fase 2: análisis exploratorio, reporte y datos_enriquecidos.arrow (sin gráficas)"""
+    import fase2_analisis
+    from agregados import obtener_agregados
+    from esquema_datos import ESQUEMA_ENRIQUECIDOS, guardar_intercambio
+    from exportaciones import exportar_dataframe
+
+    df_limpio = leer_entrada(config['ruta_limpios'], 'limpiar')
+    df_enriquecido = fase2_analisis.enriquecer_datos(df_limpio)
+    resultados = fase2_analisis.analisis_exploratorio(
+        df_limpio, obtener_agregados(df_enriquecido), aproximado=args.aproximado, procesos=args.procesos)
+    fase2_analisis.generar_reporte(resultados, config['reports_dir'])
+    guardar_intercambio(df_enriquecido, config['ruta_enriquecidos'], ESQUEMA_ENRIQUECIDOS)
+    exportar_dataframe(df_enriquecido, config['processed_data_dir'] / "datos_enriquecidos", args.formatos)
+
+def etapa_graficas(config, args):
+    """Fase 2: gráficas PNG del reporte a partir de datos_enriquecidos.arrow y reporte_analisis.json"""
+    import json
+
+    import fase2_analisis
+
+    ruta_reporte = config['reports_dir'] / "reporte_analisis.json"
+    if not ruta_reporte.exists():
+        raise SystemExit(f"No existe {ruta_reporte}. Ejecute primero: python etl.py enriquecer")
+    resultados = json.loads(ruta_reporte.read_text(encoding='utf-8'))
+    df_enriquecido = leer_entrada(config['ruta_enriquecidos'], 'enriquecer', fase2_analisis.COLUMNAS_GRAFICAS)
+    fase2_analisis.generar_visualizaciones(df_enriquecido, resultados, config['reports_dir'], procesos=args.procesos)
+
+def etapa_integrar(config, args):
+    """Fase 3: fuentes externas y puntuación de riesgo -> datos_integrados.arrow"""
+    import fase3_integracion
+    from esquema_datos import ESQUEMA_INTEGRADOS, guardar_intercambio
+    from exportaciones import exportar_dataframe
+
+    df_integrado = fase3_integracion.integrar_datos_externos(leer_entrada(config['ruta_enriquecidos'], 'enriquecer'))
+    guardar_intercambio(df_integrado, config['ruta_integrados'], ESQUEMA_INTEGRADOS)
+    exportar_dataframe(df_integrado, config['processed_data_dir'] / "datos_integrados", args.formatos)
+
+def etapa_cargar(config, args):
+    """Fase 3: base de datos SQLite y monitorización de calidad"""
+    import fase3_integracion
+
+    df_integrado = leer_entrada(config['ruta_integrados'], 'integrar')
+    if not fase3_integracion.crear_base_datos(df_integrado, config['database_dir']):
+        raise SystemExit("No se pudo crear la base de datos")
+    fase3_integracion.crear_sistema_monitorizacion(df_integrado, config['database_dir'])
+
+def etapa_dashboard(config, args):
+    """Fase 3: dashboards HTML y aplicación Streamlit"""
+    import fase3_integracion
+
+    df_integrado = leer_entrada(config['ruta_integrados'], 'integrar')
+    fase3_integracion.crear_dashboard_interactivo(df_integrado, config['dashboards_dir'])
+    fase3_integracion.crear_app_streamlit(df_integrado, config['dashboards_dir'])
+
+ETAPAS = {
+    'limpiar': etapa_limpiar,
+    'enriquecer': etapa_enriquecer,
+    'graficas': etapa_graficas,
+    'integrar': etapa_integrar,
+    'cargar': etapa_cargar,
+    'dashboard': etapa_dashboard,
+}
+
+# ---------------------------------------------------------------------------
+# Informe de tiempos de importación
+# ---------------------------------------------------------------------------
+
+PATRON_IMPORTTIME = re.compile(r'^import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)$')
+
+def medir_importacion(modulo):
+    """Importa un módulo en un proceso nuevo con -X importtime.
+
+    Devuelve el tiempo acumulado en milisegundos y las bibliotecas pesadas que cargó.
+    """
+    codigo = f"import sys; sys.path[:0] = [{str(BASE_DIR)!r}, {str(BASE_DIR / 'data')!r}]; import {modulo}"
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo],
+                             capture_output=True, text=True, cwd=BASE_DIR)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+
+    acumulado, pesadas = 0, set()
+    for linea in proceso.stderr.splitlines():
+        coincidencia = PATRON_IMPORTTIME.match(linea)
+        if coincidencia is None:
+            continue
+        _, microsegundos, sangria, nombre = coincidencia.groups()
+        raiz = nombre.split('.')[0]
+        if raiz in BIBLIOTECAS_PESADAS:
+            pesadas.add(raiz)
+        if not sangria and nombre == modulo:
+            acumulado = int(microsegundos) / 1000
+    return acumulado, sorted(pesadas)
+
+def informe_importaciones(modulos=MODULOS_ETAPAS, limite_ms=None):
+    """Muestra el tiempo de importación de cada módulo y devuelve False si hay regresiones"""
+    print("=" * 60)
+    print("TIEMPOS DE IMPORTACIÓN (python -X importtime)")
+    print("=" * 60)
+
+    correcto = True
+    for modulo in modulos:
+        acumulado, pesadas = medir_importacion(modulo)
+        problemas = []
+        if pesadas:
+            problemas.append(f"importa {', '.join(pesadas)}")
+        if limite_ms is not None and acumulado > limite_ms:
+            problemas.append(f"supera {limite_ms:.0f} ms")
+        estado = "✗ " + "; ".join(problemas) if problemas else "✓"
+        print(f"{modulo:<22} {acumulado:8.1f} ms  {estado}")
+        correcto = correcto and not problemas
+    return correcto
+
+def main():
+    """Función principal de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Ejecuta una etapa del pipeline importando solo lo que usa")
+    subparsers = parser.add_subparsers(dest='etapa', required=True)
+
+    for nombre, funcion in ETAPAS.items():
+        subparser = subparsers.add_parser(nombre, help=funcion.__doc__)
+        subparser.add_argument('--procesos', type=int, default=1,
+                               help="número de procesos (limpieza por fila, resúmenes y gráficas)")
+        subparser.add_argument('--formatos', type=formatos_exportacion, default='csv,xlsx',
+                               help="exportaciones a generar: csv, xlsx, csv,xlsx (por defecto) o ninguno")
+        subparser.add_argument('--sin-exportaciones', dest='formatos', action='store_const', const=(),
+                               help="escribir solo los archivos de intercambio Arrow, sin CSV ni XLSX")
+        subparser.add_argument('--perfilar-memoria', action='store_true',
+                               help="medir el pico de memoria de Python de cada etapa con tracemalloc (más lento)")
+        subparser.add_argument('--cprofile', action='store_true',
+                               help="guardar un perfil de cProfile por etapa en reports/perfiles/")
+        if nombre == 'limpiar':
+            subparser.add_argument('--por-bloques', action='store_true',
+                                   help="leer y limpiar BD.xlsx por bloques con memoria acotada")
+        if nombre == 'enriquecer':
+            subparser.add_argument('--aproximado', action='store_true',
+                                   help="análisis exploratorio con resúmenes aproximados")
+
+    subparser = subparsers.add_parser('importaciones', help="informe de tiempos de importación de las fases")
+    subparser.add_argument('--limite-ms', type=float, default=None,
+                           help="fallar si un módulo tarda más que este límite en importarse")
+    subparser.add_argument('modulos', nargs='*', default=list(MODULOS_ETAPAS),
+                           help="módulos a medir (por defecto, los de todas las etapas)")
+
+    args = parser.parse_args()
+    if args.etapa == 'importaciones':
+        sys.exit(0 if informe_importaciones(args.modulos, args.limite_ms) else 1)
+
+    from perfilado import Perfilador
+
+    config = configurar_entorno()
+    with Perfilador(f"etl_{args.etapa}", config['reports_dir'], memoria=args.perfilar_memoria, cprofile=args.cprofile):
+        ETAPAS[args.etapa](config, args)
+    print(f"\n¡Etapa '{args.etapa}' completada exitosamente!")
+
+if __name__ == "__main__":
+    main()
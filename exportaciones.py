@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Exportaciones de los datos de cada fase (CSV y XLSX)
+El XLSX se escribe en streaming: cada bloque de filas se convierte a XML de
+SpreadsheetML y se comprime directamente dentro del archivo, sin construir el
+libro en memoria como DataFrame.to_excel con openpyxl. La memoria no depende
+del número de filas y el tiempo de escritura es proporcional a ellas.
+
+Los formatos a generar se eligen por ejecución (--formatos csv,xlsx, o
+ninguno); el archivo de intercambio Arrow entre fases se escribe siempre.
+"""
+
+import re
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from perfilado import perfilar
+
+# Formatos de exportación disponibles (por defecto se generan todos)
+FORMATOS_EXPORTACION = ('csv', 'xlsx')
+
+# Nombre de cada formato en los resúmenes de archivos generados
+NOMBRES_FORMATOS = {'csv': 'CSV', 'xlsx': 'Excel'}
+
+# Filas por bloque al exportar un dataframe completo
+TAMANO_BLOQUE_EXPORTACION = 10_000
+
+# Límite de filas de una hoja de Excel (incluye el encabezado)
+MAXIMO_FILAS_XLSX = 1_048_576
+
+# Caracteres de control que XML 1.0 no admite
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_PARTES_FIJAS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 0: normal; estilo 1: encabezado en negrita
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+def parsear_formatos(texto):
+    """Convierte 'csv,xlsx' (o 'ninguno') en la tupla de formatos a exportar"""
+    if texto.strip().lower() in ('', 'ninguno'):
+        return ()
+    formatos = tuple(dict.fromkeys(parte.strip().lower() for parte in texto.split(',') if parte.strip()))
+    desconocidos = [formato for formato in formatos if formato not in FORMATOS_EXPORTACION]
+    if desconocidos:
+        raise ValueError(f"Formatos de exportación no soportados: {desconocidos} "
+                         f"(disponibles: {', '.join(FORMATOS_EXPORTACION)} o ninguno)")
+    return formatos
+
+def _escapar_texto(valores):
+    """Escapa una Series de texto para XML"""
+    valores = valores.str.replace('&', '&amp;', regex=False)
+    valores = valores.str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False)
+    return valores.str.replace(_CARACTERES_INVALIDOS, '', regex=True)
+
+def _celdas_columna(columna):
+    """Convierte una columna en el XML de sus celdas (celda vacía <c/> para los nulos)"""
+    nulos = columna.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(columna):
+        celdas = np.where(columna.fillna(False).to_numpy(dtype=bool), '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>')
+        celdas = celdas.astype(object)
+    elif pd.api.types.is_numeric_dtype(columna):
+        numeros = columna.to_numpy(dtype=float, na_value=np.nan)
+        # Los infinitos no existen en Excel: se dejan vacíos
+        nulos = nulos | ~np.isfinite(numeros)
+        if pd.api.types.is_integer_dtype(columna):
+            texto = columna.astype(str)
+        else:
+            texto = pd.Series(numeros, index=columna.index).map(repr)
+        celdas = ('<c><v>' + texto + '</v></c>').to_numpy(dtype=object)
+    else:
+        # Fechas como texto ISO: evita definir formatos de número en la hoja de estilos
+        if pd.api.types.is_datetime64_any_dtype(columna):
+            texto = columna.dt.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            texto = columna.astype(str)
+        celdas = ('<c t="inlineStr"><is><t xml:space="preserve">' + _escapar_texto(texto)
+                  + '</t></is></c>').to_numpy(dtype=object)
+    celdas[nulos] = '<c/>'
+    return celdas
+
+class EscritorXlsx:
+    """Escritor XLSX de solo escritura: escribe bloques de filas sin mantener el libro en memoria"""
+
+    def __init__(self, ruta, columnas, nombre_hoja='Sheet1', nivel_compresion=1):
+        self.ruta = Path(ruta)
+        self.columnas = [str(col) for col in columnas]
+        self.filas = 0
+        self.ruta_temporal = self.ruta.with_name(self.ruta.name + '.tmp')
+        self.archivo = zipfile.ZipFile(self.ruta_temporal, 'w', zipfile.ZIP_DEFLATED, compresslevel=nivel_compresion)
+        for nombre, contenido in _PARTES_FIJAS.items():
+            self.archivo.writestr(nombre, contenido)
+        nombre_hoja = _escapar_texto(pd.Series([nombre_hoja])).iloc[0].replace('"', '&quot;')
+        self.archivo.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{nombre_hoja}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        # La hoja se comprime a medida que se escribe: solo un bloque está en memoria a la vez
+        self.hoja = self.archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._escribir('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                       '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+        encabezado = _escapar_texto(pd.Series(self.columnas, dtype=object))
+        self._escribir('<row>' + ''.join(
+            f'<c t="inlineStr" s="1"><is><t xml:space="preserve">{col}</t></is></c>' for col in encabezado
+        ) + '</row>')
+
+    def _escribir(self, texto):
+        self.hoja.write(texto.encode('utf-8'))
+
+    def escribir(self, df):
+        """Añade las filas de un bloque (mismas columnas y orden que el encabezado)"""
+        if len(df) == 0:
+            return
+        if self.filas + len(df) >= MAXIMO_FILAS_XLSX:
+            raise ValueError(f"Una hoja de Excel admite como máximo {MAXIMO_FILAS_XLSX - 1} filas de datos")
+        filas = '<row>'
+        for col in df.columns:
+            filas = filas + _celdas_columna(df[col])
+        self._escribir('</row>'.join(filas.tolist()) + '</row>')
+        self.filas += len(df)
+
+    def cerrar(self):
+        """Termina la hoja, cierra el archivo y lo mueve a su ruta definitiva"""
+        if self.archivo is None:
+            return
+        self._escribir('</sheetData></worksheet>')
+        self.hoja.close()
+        self.archivo.close()
+        self.archivo = None
+        self.ruta_temporal.replace(self.ruta)
+
+    def descartar(self):
+        """Cierra y elimina un archivo a medio escribir"""
+        if self.archivo is not None:
+            self.hoja.close()
+            self.archivo.close()
+            self.archivo = None
+        self.ruta_temporal.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
+        return False
+
+class EscritorExportaciones:
+    """Escribe bloques de un dataframe en todos los formatos de exportación pedidos (ruta_base sin extensión)"""
+
+    def __init__(self, ruta_base, formatos=FORMATOS_EXPORTACION):
+        self.rutas = {formato: Path(ruta_base).with_suffix(f'.{formato}') for formato in formatos}
+        self.xlsx = None
+        self.primer_bloque = True
+
+    def escribir(self, bloque):
+        """Añade un bloque de filas a cada formato"""
+        if 'csv' in self.rutas:
+            bloque.to_csv(self.rutas['csv'], mode='w' if self.primer_bloque else 'a',
+                          header=self.primer_bloque, index=False, encoding='utf-8')
+        if 'xlsx' in self.rutas:
+            if self.xlsx is None:
+                self.xlsx = EscritorXlsx(self.rutas['xlsx'], bloque.columns)
+            self.xlsx.escribir(bloque)
+        self.primer_bloque = False
+
+    def cerrar(self):
+        """Cierra los archivos abiertos"""
+        if self.xlsx is not None:
+            self.xlsx.cerrar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+        elif self.xlsx is not None:
+            self.xlsx.descartar()
+        return False
+
+@perfilar()
+def exportar_dataframe(df, ruta_base, formatos=FORMATOS_EXPORTACION, tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    """Exporta un dataframe en los formatos pedidos por bloques y devuelve {formato: ruta}"""
+    with EscritorExportaciones(ruta_base, formatos) as escritor:
+        for inicio in range(0, max(len(df), 1), tamano_bloque):
+            escritor.escribir(df.iloc[inicio:inicio + tamano_bloque])
+    return escritor.rutas
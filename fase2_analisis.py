@@ -10,11 +10,23 @@ Entregables:
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import json
+import hashlib
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import reduce
+
+from agregados import COLUMNAS_GRUPO, COLUMNAS_MEDIA, obtener_agregados
+from exportaciones import FORMATOS_EXPORTACION, NOMBRES_FORMATOS, exportar_dataframe, parsear_formatos
+from resumenes_aproximados import HyperLogLog, SpaceSaving
+from esquema_datos import (ESQUEMA_LIMPIOS, ESQUEMA_ENRIQUECIDOS, CAMPOS_COMPLETITUD, MASCARA_COMPLETITUD,
+                           clave_identidad, hash_identidad, calcular_mascara_validez, contar_bits,
+                           compactar, guardar_intercambio, leer_intercambio, leer_csv)
+from perfilado import Perfilador, desactivar_en_trabajador, perfilar
 
 def configurar_entorno():
     """Configura las rutas y crea directorios necesarios"""
@@ -35,11 +47,15 @@ def configurar_entorno():
         'reports_dir': reports_dir
     }
 
+@perfilar()
 def cargar_datos_limpios(ruta_archivo):
-    """Carga los datos limpios desde el archivo CSV"""
+    """Carga los datos limpios desde el archivo de intercambio Arrow (o desde un CSV exportado)"""
     try:
         print("Cargando datos limpios...")
-        df = pd.read_csv(ruta_archivo)
+        if Path(ruta_archivo).suffix == '.arrow':
+            df = leer_intercambio(ruta_archivo)
+        else:
+            df = leer_csv(ruta_archivo, ESQUEMA_LIMPIOS)
         print(f"Datos limpios cargados correctamente. Filas: {len(df)}, Columnas: {len(df.columns)}")
         return df
     except Exception as e:
@@ -65,12 +81,28 @@ def convertir_a_serializable(obj):
     else:
         return obj
 
-def analisis_exploratorio(df):
-    """Realiza análisis exploratorio de los datos"""
+# Columnas que identifican a un gerente general
+COLUMNAS_GERENTE = ['NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act']
+
+# Filas por bloque en el modo aproximado del análisis exploratorio
+TAMANO_BLOQUE_RESUMENES = 100_000
+
+@perfilar()
+def analisis_exploratorio(df, agregados=None, aproximado=False, tamano_bloque=TAMANO_BLOQUE_RESUMENES, procesos=1):
+    """Realiza análisis exploratorio de los datos.
+    
+    agregados: agregados compartidos de df o de un dataframe con las mismas filas
+    y columnas adicionales (por ejemplo, los datos enriquecidos).
+    aproximado: estimar valores distintos y rankings con resúmenes combinables
+    (HyperLogLog y Space-Saving) calculados por bloques, con las cotas de error
+    en resultados['errores_aproximacion'].
+    """
     print("\n" + "="*60)
     print("ANÁLISIS EXPLORATORIO DE DATOS")
     print("="*60)
     
+    if agregados is None:
+        agregados = obtener_agregados(df)
     resultados = {}
     
     # 1. Estadísticas básicas
@@ -84,7 +116,7 @@ def analisis_exploratorio(df):
     print(f"Total de columnas: {len(df.columns)}")
     
     # 2. Análisis de valores nulos
-    nulos_por_columna = df.isnull().sum()
+    nulos_por_columna = agregados.nulos[df.columns]
     porcentaje_nulos = (nulos_por_columna / len(df) * 100).round(2)
     
     resultados['valores_nulos'] = {
@@ -100,38 +132,44 @@ def analisis_exploratorio(df):
             print(f"  - {columna}: {nulos} ({porcentaje_nulos[columna]}%)")
     
     # 3. Análisis de ciudades
-    resultados['analisis_ciudades'] = {
-        'total_ciudades_unicas': int(df['Ciudad_Act'].nunique()),
-        'top_10_ciudades': df['Ciudad_Act'].value_counts().head(10).to_dict(),
-        'distribucion_ciudades': df['Ciudad_Act'].value_counts(normalize=True).head(10).to_dict()
-    }
+    if aproximado:
+        resultados.update(analisis_aproximado(df, agregados, tamano_bloque, procesos))
+    else:
+        resultados['analisis_ciudades'] = {
+            'total_ciudades_unicas': agregados.unicos('Ciudad_Act'),
+            'top_10_ciudades': agregados.conteo('Ciudad_Act', top=10).to_dict(),
+            'distribucion_ciudades': agregados.proporcion('Ciudad_Act', top=10).to_dict()
+        }
     
-    print(f"\nTotal de ciudades únicas: {df['Ciudad_Act'].nunique()}")
+    print(f"\nTotal de ciudades únicas: {resultados['analisis_ciudades']['total_ciudades_unicas']}")
     print("\nTop 10 ciudades por cantidad de empresas:")
     for ciudad, count in resultados['analisis_ciudades']['top_10_ciudades'].items():
         print(f"  - {ciudad}: {count} empresas")
     
     # 4. Análisis de gerentes
-    gerentes_unicos = df[['NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act']].drop_duplicates()
-    resultados['analisis_gerentes'] = {
-        'total_gerentes_unicos': len(gerentes_unicos),
-        'gerentes_multiple_empresas': analizar_gerentes_multiple_empresas(df)
-    }
+    if not aproximado:
+        resultados['analisis_gerentes'] = {
+            'total_gerentes_unicos': len(df[COLUMNAS_GERENTE].drop_duplicates()),
+            'gerentes_multiple_empresas': analizar_gerentes_multiple_empresas(df)
+        }
     
-    print(f"\nTotal de gerentes únicos: {len(gerentes_unicos)}")
+    print(f"\nTotal de gerentes únicos: {resultados['analisis_gerentes']['total_gerentes_unicos']}")
     
     # 5. Análisis de códigos DANE
-    resultados['analisis_dane'] = {
-        'codigos_dane_unicos': int(df['CodDANE'].nunique()),
-        'codigos_dane_invalidos': int(df['CodDANE'].isnull().sum())
-    }
+    if not aproximado:
+        resultados['analisis_dane'] = {
+            'codigos_dane_unicos': agregados.unicos('CodDANE'),
+            'codigos_dane_invalidos': int(agregados.nulos['CodDANE'])
+        }
     
     # 6. Análisis de teléfonos
+    telefonos_1 = agregados.no_nulos('Telefono_Act1')
+    telefonos_2 = agregados.no_nulos('Telefono_Act2')
     resultados['analisis_telefonos'] = {
-        'telefonos_1_validos': int(df['Telefono_Act1'].notnull().sum()),
-        'telefonos_2_validos': int(df['Telefono_Act2'].notnull().sum()),
-        'porcentaje_telefonos_1': float((df['Telefono_Act1'].notnull().sum() / len(df) * 100).round(2)),
-        'porcentaje_telefonos_2': float((df['Telefono_Act2'].notnull().sum() / len(df) * 100).round(2))
+        'telefonos_1_validos': telefonos_1,
+        'telefonos_2_validos': telefonos_2,
+        'porcentaje_telefonos_1': float(np.round(telefonos_1 / len(df) * 100, 2)),
+        'porcentaje_telefonos_2': float(np.round(telefonos_2 / len(df) * 100, 2))
     }
     
     # Convertir todos los valores a serializables
@@ -139,11 +177,87 @@ def analisis_exploratorio(df):
     
     return resultados
 
+def _resumir_bloque(bloque):
+    """Resume un bloque de filas: valores distintos (HyperLogLog) y más frecuentes (Space-Saving)"""
+    return {
+        'ciudades': HyperLogLog().actualizar(bloque['Ciudad_Act'].dropna()),
+        # Como drop_duplicates, los gerentes con nombre o apellido nulo también cuentan
+        'gerentes': HyperLogLog().actualizar(bloque[COLUMNAS_GERENTE]),
+        'codigos_dane': HyperLogLog().actualizar(bloque['CodDANE'].dropna()),
+        'top_ciudades': SpaceSaving().actualizar(bloque['Ciudad_Act'].value_counts()),
+        'top_gerentes': SpaceSaving().actualizar(bloque.groupby(COLUMNAS_GERENTE).size()),
+    }
+
+def _combinar_resumenes(resumen, otro):
+    """Combina dos resúmenes de bloques"""
+    for nombre, sketch in otro.items():
+        resumen[nombre].combinar(sketch)
+    return resumen
+
+def calcular_resumenes(df, tamano_bloque=TAMANO_BLOQUE_RESUMENES, procesos=1):
+    """Resume df por bloques (en paralelo si procesos > 1) y combina los resúmenes parciales"""
+    columnas = ['Ciudad_Act', 'CodDANE'] + COLUMNAS_GERENTE
+    bloques = (df[columnas].iloc[inicio:inicio + tamano_bloque] for inicio in range(0, max(len(df), 1), tamano_bloque))
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=desactivar_en_trabajador) as executor:
+            return reduce(_combinar_resumenes, executor.map(_resumir_bloque, bloques))
+    return reduce(_combinar_resumenes, map(_resumir_bloque, bloques))
+
+def analisis_aproximado(df, agregados, tamano_bloque=TAMANO_BLOQUE_RESUMENES, procesos=1):
+    """Análisis de ciudades, gerentes y códigos DANE con resúmenes aproximados y sus cotas de error"""
+    resumenes = calcular_resumenes(df, tamano_bloque, procesos)
+    top_ciudades = resumenes['top_ciudades'].top(10)
+    top_gerentes = [fila for fila in resumenes['top_gerentes'].top(10) if fila[1] > 1]
+    ciudades_con_valor = agregados.no_nulos('Ciudad_Act')
+    
+    def errores_hll(sketch):
+        return {'metodo': 'HyperLogLog', 'registros': len(sketch.registros),
+                'error_relativo_estandar': round(sketch.error_relativo(), 6)}
+    
+    def errores_top(sketch, top):
+        return {'metodo': 'Space-Saving', 'contadores': sketch.capacidad,
+                'cota_error_conteo': round(sketch.cota_error(), 2),
+                'error_maximo_top': max((error for _, _, error in top), default=0)}
+    
+    return {
+        'analisis_ciudades': {
+            'total_ciudades_unicas': resumenes['ciudades'].estimar(),
+            'top_10_ciudades': {ciudad: conteo for ciudad, conteo, _ in top_ciudades},
+            'distribucion_ciudades': {ciudad: conteo / ciudades_con_valor for ciudad, conteo, _ in top_ciudades}
+        },
+        'analisis_gerentes': {
+            'total_gerentes_unicos': resumenes['gerentes'].estimar(),
+            'gerentes_multiple_empresas': {
+                # Cota inferior: gerentes cuyo conteo garantizado (conteo - error) supera 1
+                'total_gerentes_multiple_empresas': sum(
+                    conteo - error > 1 for conteo, error in resumenes['top_gerentes'].contadores.values()),
+                'gerentes_con_mas_empresas': {gerente: conteo for gerente, conteo, _ in top_gerentes}
+            }
+        },
+        'analisis_dane': {
+            'codigos_dane_unicos': resumenes['codigos_dane'].estimar(),
+            'codigos_dane_invalidos': int(agregados.nulos['CodDANE'])
+        },
+        'errores_aproximacion': {
+            'filas_por_bloque': tamano_bloque,
+            'total_ciudades_unicas': errores_hll(resumenes['ciudades']),
+            'total_gerentes_unicos': errores_hll(resumenes['gerentes']),
+            'codigos_dane_unicos': errores_hll(resumenes['codigos_dane']),
+            'top_10_ciudades': errores_top(resumenes['top_ciudades'], top_ciudades),
+            'gerentes_con_mas_empresas': errores_top(resumenes['top_gerentes'], top_gerentes),
+            'total_gerentes_multiple_empresas': 'cota inferior'
+        }
+    }
+
 def convertir_resultados_serializables(resultados):
     """Convierte todos los valores en el diccionario de resultados a serializables"""
+    def _convertir_clave(clave):
+        # Claves compuestas (nombre, apellido) como texto para que el reporte JSON sea válido
+        return ' '.join(map(str, clave)) if isinstance(clave, tuple) else clave
+    
     def _convertir_valores(obj):
         if isinstance(obj, dict):
-            return {k: _convertir_valores(v) for k, v in obj.items()}
+            return {_convertir_clave(k): _convertir_valores(v) for k, v in obj.items()}
         elif isinstance(obj, (list, tuple)):
             return [_convertir_valores(v) for v in obj]
         else:
@@ -153,7 +267,7 @@ def convertir_resultados_serializables(resultados):
 
 def analizar_gerentes_multiple_empresas(df):
     """Identifica gerentes que están en múltiples empresas"""
-    gerentes_empresas = df.groupby(['NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act']).size()
+    gerentes_empresas = df.groupby(COLUMNAS_GERENTE).size()
     gerentes_multiple = gerentes_empresas[gerentes_empresas > 1]
     
     return {
@@ -161,6 +275,7 @@ def analizar_gerentes_multiple_empresas(df):
         'gerentes_con_mas_empresas': gerentes_multiple.sort_values(ascending=False).head(10).to_dict()
     }
 
+@perfilar()
 def enriquecer_datos(df):
     """Enriquece los datos con información adicional"""
     print("\n" + "="*60)
@@ -175,23 +290,26 @@ def enriquecer_datos(df):
     # 2. Agregar categoría de tamaño de empresa (basado en ciudad)
     df_enriquecido['Tamaño_Empresa'] = df_enriquecido['Ciudad_Act'].apply(categorizar_tamaño_empresa)
     
-    # 3. Crear identificador único para cada empresa
+    # 3. Crear identificador estable para cada empresa
     df_enriquecido['ID_Empresa'] = crear_ids_empresas(df_enriquecido)
     
     # 4. Agregar fecha de procesamiento
     df_enriquecido['Fecha_Procesamiento'] = datetime.now().strftime('%Y-%m-%d')
     
-    # 5. Calcular completitud de datos por registro
-    df_enriquecido['Porcentaje_Completitud'] = calcular_completitud(df_enriquecido)
+    # 5. Calcular la máscara de validez y la completitud de datos por registro
+    mascara = calcular_mascara_validez(df_enriquecido)
+    df_enriquecido['Porcentaje_Completitud'] = calcular_completitud(df_enriquecido, mascara)
+    df_enriquecido['Mascara_Validez'] = mascara
     
     print("Datos enriquecidos con:")
     print("  - Región basada en código DANE")
     print("  - Categoría de tamaño de empresa")
-    print("  - ID único para cada empresa")
+    print("  - ID estable para cada empresa (hash de su identidad)")
     print("  - Fecha de procesamiento")
     print("  - Porcentaje de completitud de datos")
+    print("  - Máscara de validez por campo")
     
-    return df_enriquecido
+    return compactar(df_enriquecido)
 
 def obtener_region_dane(codigo_dane):
     """Obtiene la región basada en el código DANE"""
@@ -227,48 +345,59 @@ def categorizar_tamaño_empresa(ciudad):
         return 'PEQUEÑA'
 
 def crear_ids_empresas(df):
-    """Crea IDs únicos para cada empresa"""
-    from datetime import datetime
-    import hashlib
-    
-    base_time = datetime.now().strftime('%Y%m%d%H%M%S')
-    base_hash = int(hashlib.sha256(base_time.encode()).hexdigest(), 16) % (10 ** 8)
-    ids = []
-    
-    for i in range(len(df)):
-        ids.append(f"EMP{base_hash + i:08d}")
-    
-    return ids
+    """Crea IDs estables para cada empresa a partir del hash de su clave de identidad.
+    
+    La misma empresa recibe el mismo ID en todas las ejecuciones; si dos claves
+    distintas producen el mismo hash se lanza ValueError.
+    """
+    claves = clave_identidad(df)
+    hashes = hash_identidad(df).to_numpy()
+    
+    # Detección de colisiones: un mismo hash no puede corresponder a dos claves distintas
+    pares = pd.DataFrame({'hash': hashes, 'clave': claves.to_numpy()}).drop_duplicates()
+    colisiones = pares['hash'].duplicated(keep=False)
+    if colisiones.any():
+        ejemplos = pares.loc[colisiones, 'clave'].head(4).tolist()
+        raise ValueError(f"Colisión de hash entre claves de identidad distintas: {ejemplos}")
+    
+    # EMP + 16 dígitos hexadecimales del hash, formateados sin iterar en Python
+    hexadecimal = hashes.astype('>u8').tobytes().hex().upper().encode('ascii')
+    return np.char.add('EMP', np.frombuffer(hexadecimal, dtype='S16').astype('U16'))
 
-def calcular_completitud(df):
-    """Calcula el porcentaje de completitud de datos por registro"""
-    columnas_relevantes = [
-        'NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act',
-        'NombresGerenteFinanciero_Act', 'ApellidosGerenteFinanciero_Act',
-        'Ciudad_Act', 'CodDANE', 'Telefono_Act1'
-    ]
-    
-    completitud = []
-    for _, row in df.iterrows():
-        campos_llenos = sum(1 for col in columnas_relevantes if not pd.isna(row[col]) and str(row[col]).strip() != '')
-        porcentaje = (campos_llenos / len(columnas_relevantes) * 100)
-        completitud.append(round(porcentaje, 2))
-    
-    return completitud
+def calcular_completitud(df, mascara=None):
+    """Calcula el porcentaje de completitud de datos por registro a partir de la máscara de validez"""
+    if mascara is None:
+        mascara = calcular_mascara_validez(df)
+    campos_llenos = contar_bits(mascara, MASCARA_COMPLETITUD)
+    return np.round(campos_llenos / len(CAMPOS_COMPLETITUD) * 100, 2)
 
-def generar_visualizaciones(df, resultados, reports_dir):
-    """Genera visualizaciones para el dashboard"""
-    print("\n" + "="*60)
-    print("GENERANDO VISUALIZACIONES")
-    print("="*60)
-    
-    # Configurar estilo de las gráficas
+# Huellas de los datos agregados de cada gráfica en la última ejecución
+ARCHIVO_HUELLAS_GRAFICAS = 'huellas_graficas.json'
+
+# Columnas que usan las gráficas (las de los agregados): la etapa de gráficas lee solo estas
+COLUMNAS_GRAFICAS = list(dict.fromkeys(COLUMNAS_GRUPO + COLUMNAS_MEDIA))
+
+def _configurar_graficas():
+    """Configura el backend Agg y el estilo de las gráficas en el proceso actual"""
+    # matplotlib y seaborn se importan solo en los procesos que dibujan
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.style.use('default')
     sns.set_palette("husl")
+
+def _iniciar_proceso_graficas():
+    """Inicializa un proceso trabajador del pool de gráficas (sin el perfilador heredado)"""
+    desactivar_en_trabajador()
+    _configurar_graficas()
+
+def _graficar_ciudades(datos, ruta):
+    """1. Distribución de empresas por ciudad (Top 10)"""
+    import matplotlib.pyplot as plt
     
-    # 1. Distribución de empresas por ciudad (Top 10)
     plt.figure(figsize=(12, 8))
-    top_ciudades = df['Ciudad_Act'].value_counts().head(10)
+    top_ciudades = pd.Series(datos['conteos'], index=datos['ciudades'])
     ax = top_ciudades.plot(kind='bar', color='skyblue')
     plt.title('Top 10 Ciudades por Cantidad de Empresas', fontsize=16, fontweight='bold')
     plt.xlabel('Ciudad', fontsize=12)
@@ -280,49 +409,134 @@ def generar_visualizaciones(df, resultados, reports_dir):
         ax.text(i, v + 0.5, str(v), ha='center', va='bottom')
     
     plt.tight_layout()
-    plt.savefig(reports_dir / 'distribucion_ciudades.png', dpi=300, bbox_inches='tight')
+    plt.savefig(ruta, dpi=300, bbox_inches='tight')
+    plt.close()
+
+def _graficar_regiones(datos, ruta):
+    """2. Distribución por región"""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(10, 8))
+    plt.pie(datos['conteos'], labels=datos['regiones'], autopct='%1.1f%%')
+    plt.title('Distribución de Empresas por Región', fontsize=16, fontweight='bold')
+    plt.savefig(ruta, dpi=300, bbox_inches='tight')
     plt.close()
+
+def _graficar_completitud(datos, ruta):
+    """3. Completitud de datos (histograma ya agrupado en 20 intervalos)"""
+    import matplotlib.pyplot as plt
     
-    # 2. Distribución por región (si existe la columna)
-    if 'Region' in df.columns:
-        plt.figure(figsize=(10, 8))
-        region_counts = df['Region'].value_counts()
-        plt.pie(region_counts.values, labels=region_counts.index, autopct='%1.1f%%')
-        plt.title('Distribución de Empresas por Región', fontsize=16, fontweight='bold')
-        plt.savefig(reports_dir / 'distribucion_regiones.png', dpi=300, bbox_inches='tight')
-        plt.close()
-    
-    # 3. Completitud de datos
     plt.figure(figsize=(10, 6))
-    if 'Porcentaje_Completitud' in df.columns:
-        plt.hist(df['Porcentaje_Completitud'], bins=20, color='lightgreen', edgecolor='black')
-        plt.title('Distribución de Completitud de Datos', fontsize=16, fontweight='bold')
-        plt.xlabel('Porcentaje de Completitud', fontsize=12)
-        plt.ylabel('Cantidad de Empresas', fontsize=12)
-        plt.grid(axis='y', alpha=0.3)
-        plt.savefig(reports_dir / 'completitud_datos.png', dpi=300, bbox_inches='tight')
-        plt.close()
-    
-    # 4. Teléfonos válidos
-    telefonos_data = {
-        'Teléfono Principal': resultados['analisis_telefonos']['porcentaje_telefonos_1'],
-        'Teléfono Secundario': resultados['analisis_telefonos']['porcentaje_telefonos_2']
-    }
+    plt.hist(datos['bordes'][:-1], bins=datos['bordes'], weights=datos['conteos'],
+             color='lightgreen', edgecolor='black')
+    plt.title('Distribución de Completitud de Datos', fontsize=16, fontweight='bold')
+    plt.xlabel('Porcentaje de Completitud', fontsize=12)
+    plt.ylabel('Cantidad de Empresas', fontsize=12)
+    plt.grid(axis='y', alpha=0.3)
+    plt.savefig(ruta, dpi=300, bbox_inches='tight')
+    plt.close()
+
+def _graficar_telefonos(datos, ruta):
+    """4. Teléfonos válidos"""
+    import matplotlib.pyplot as plt
     
     plt.figure(figsize=(8, 6))
-    plt.bar(telefonos_data.keys(), telefonos_data.values(), color=['blue', 'orange'])
+    plt.bar(datos.keys(), datos.values(), color=['blue', 'orange'])
     plt.title('Porcentaje de Teléfonos Válidos', fontsize=16, fontweight='bold')
     plt.ylabel('Porcentaje (%)', fontsize=12)
     plt.ylim(0, 100)
     
-    for i, v in enumerate(telefonos_data.values()):
+    for i, v in enumerate(datos.values()):
         plt.text(i, v + 1, f'{v}%', ha='center', va='bottom')
     
-    plt.savefig(reports_dir / 'telefonos_validos.png', dpi=300, bbox_inches='tight')
+    plt.savefig(ruta, dpi=300, bbox_inches='tight')
     plt.close()
+
+def _renderizar_grafica(funcion, datos, ruta):
+    """Dibuja una gráfica en un proceso trabajador y devuelve el tiempo empleado"""
+    inicio = time.perf_counter()
+    funcion(datos, ruta)
+    return time.perf_counter() - inicio
+
+def preparar_datos_graficas(df, resultados):
+    """Agrega los datos de cada gráfica: archivo -> (función de dibujo, datos agregados)"""
+    agregados = obtener_agregados(df)
+    graficas = {}
+    
+    top_ciudades = agregados.conteo('Ciudad_Act', top=10)
+    graficas['distribucion_ciudades.png'] = (
+        _graficar_ciudades, {'ciudades': top_ciudades.index.tolist(), 'conteos': top_ciudades.tolist()})
+    
+    if 'Region' in df.columns:
+        region_counts = agregados.conteo('Region')
+        graficas['distribucion_regiones.png'] = (
+            _graficar_regiones, {'regiones': region_counts.index.tolist(), 'conteos': region_counts.tolist()})
+    
+    if 'Porcentaje_Completitud' in df.columns:
+        completitud = df['Porcentaje_Completitud'].dropna().to_numpy(dtype=float)
+        conteos, bordes = np.histogram(completitud, bins=20)
+        graficas['completitud_datos.png'] = (
+            _graficar_completitud, {'conteos': conteos.tolist(), 'bordes': bordes.tolist()})
+    
+    graficas['telefonos_validos.png'] = (_graficar_telefonos, {
+        'Teléfono Principal': resultados['analisis_telefonos']['porcentaje_telefonos_1'],
+        'Teléfono Secundario': resultados['analisis_telefonos']['porcentaje_telefonos_2']
+    })
+    return graficas
+
+def huella_grafica(funcion, datos):
+    """Huella de una gráfica: datos agregados y código de la función que la dibuja"""
+    contenido = json.dumps(datos, sort_keys=True, default=str) + inspect.getsource(funcion)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]
+
+@perfilar()
+def generar_visualizaciones(df, resultados, reports_dir, procesos=None):
+    """Genera visualizaciones para el dashboard.
+    
+    Las gráficas se dibujan en paralelo (backend Agg) y se omiten las que ya
+    existen con la misma huella de datos agregados que en la ejecución anterior.
+    """
+    print("\n" + "="*60)
+    print("GENERANDO VISUALIZACIONES")
+    print("="*60)
+    
+    graficas = preparar_datos_graficas(df, resultados)
+    
+    ruta_huellas = reports_dir / ARCHIVO_HUELLAS_GRAFICAS
+    try:
+        huellas_previas = json.loads(ruta_huellas.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        huellas_previas = {}
+    
+    huellas = {archivo: huella_grafica(funcion, datos) for archivo, (funcion, datos) in graficas.items()}
+    pendientes = [
+        archivo for archivo in graficas
+        if huellas_previas.get(archivo) != huellas[archivo] or not (reports_dir / archivo).exists()
+    ]
+    for archivo in graficas:
+        if archivo not in pendientes:
+            print(f"  - {archivo}: sin cambios, se omite")
+    
+    trabajadores = min(len(pendientes), procesos or os.cpu_count() or 1)
+    if trabajadores > 1:
+        with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_proceso_graficas) as executor:
+            futuros = {
+                archivo: executor.submit(_renderizar_grafica, *graficas[archivo], reports_dir / archivo)
+                for archivo in pendientes
+            }
+            for archivo, futuro in futuros.items():
+                print(f"  - {archivo}: {futuro.result():.2f}s")
+    elif pendientes:
+        # Con un solo trabajador no compensa crear el pool
+        _configurar_graficas()
+        for archivo in pendientes:
+            print(f"  - {archivo}: {_renderizar_grafica(*graficas[archivo], reports_dir / archivo):.2f}s")
+    
+    ruta_huellas.write_text(json.dumps(huellas, indent=2), encoding='utf-8')
     
     print("Visualizaciones generadas y guardadas en la carpeta reports/")
 
+@perfilar()
 def generar_reporte(resultados, reports_dir):
     """Genera un reporte completo en formato JSON y TXT"""
     print("\n" + "="*60)
@@ -365,13 +579,22 @@ def generar_reporte(resultados, reports_dir):
             
             f.write("\nCALIDAD DE DATOS:\n")
             f.write(f"- Porcentaje total de valores nulos: {resultados['valores_nulos']['porcentaje_total_nulos']}%\n")
+            
+            if 'errores_aproximacion' in resultados:
+                errores = resultados['errores_aproximacion']
+                f.write("\nMODO APROXIMADO (HyperLogLog y Space-Saving):\n")
+                f.write(f"- Error relativo estándar de los valores únicos: "
+                        f"{errores['total_ciudades_unicas']['error_relativo_estandar'] * 100:.2f}%\n")
+                f.write(f"- Cota de error de los conteos del top 10 de ciudades: "
+                        f"{errores['top_10_ciudades']['cota_error_conteo']} empresas\n")
         
         print("✓ Reporte TXT generado exitosamente")
     except Exception as e:
         print(f"✗ Error al generar reporte TXT: {e}")
 
-def main():
-    """Función principal de la Fase 2"""
+def main(formatos=FORMATOS_EXPORTACION, aproximado=False):
+    """Función principal de la Fase 2 (formatos: exportaciones a generar además del archivo Arrow;
+    aproximado: análisis exploratorio con resúmenes aproximados)"""
     print("=" * 60)
     print("FASE 2 - ANÁLISIS Y ENRIQUECIMIENTO DE DATOS (SPRINT 2)")
     print("=" * 60)
@@ -379,20 +602,23 @@ def main():
     # Configurar entorno
     config = configurar_entorno()
     
-    # Cargar datos limpios
-    ruta_datos_limpios = config['output_data_dir'] / "datos_limpios.csv"
+    # Cargar datos limpios (CSV solo si no existe el archivo de intercambio de una ejecución anterior)
+    ruta_datos_limpios = config['output_data_dir'] / "datos_limpios.arrow"
+    if not ruta_datos_limpios.exists():
+        ruta_datos_limpios = config['output_data_dir'] / "datos_limpios.csv"
     df = cargar_datos_limpios(ruta_datos_limpios)
     
     if df is None:
         print("No se pudieron cargar los datos limpios. Ejecute primero la Fase 1.")
         return
     
-    # Realizar análisis exploratorio
-    resultados_analisis = analisis_exploratorio(df)
-    
     # Enriquecer datos
     df_enriquecido = enriquecer_datos(df)
     
+    # Realizar análisis exploratorio (con los agregados de los datos enriquecidos,
+    # que conservan las filas y columnas de los limpios y se reutilizan en las gráficas)
+    resultados_analisis = analisis_exploratorio(df, obtener_agregados(df_enriquecido), aproximado=aproximado)
+    
     # Generar visualizaciones
     generar_visualizaciones(df_enriquecido, resultados_analisis, config['reports_dir'])
     
@@ -400,18 +626,18 @@ def main():
     generar_reporte(resultados_analisis, config['reports_dir'])
     
     # Guardar datos enriquecidos
-    ruta_enriquecido_csv = config['processed_data_dir'] / "datos_enriquecidos.csv"
-    ruta_enriquecido_excel = config['processed_data_dir'] / "datos_enriquecidos.xlsx"
+    ruta_enriquecido_arrow = config['processed_data_dir'] / "datos_enriquecidos.arrow"
     
-    df_enriquecido.to_csv(ruta_enriquecido_csv, index=False, encoding='utf-8')
-    df_enriquecido.to_excel(ruta_enriquecido_excel, index=False)
+    guardar_intercambio(df_enriquecido, ruta_enriquecido_arrow, ESQUEMA_ENRIQUECIDOS)
+    exportaciones = exportar_dataframe(df_enriquecido, config['processed_data_dir'] / "datos_enriquecidos", formatos)
     
     print("\n" + "=" * 60)
     print("RESULTADOS DE LA FASE 2")
     print("=" * 60)
     print("Archivos generados:")
-    print(f"- Datos enriquecidos (CSV): {ruta_enriquecido_csv}")
-    print(f"- Datos enriquecidos (Excel): {ruta_enriquecido_excel}")
+    print(f"- Datos enriquecidos (Arrow): {ruta_enriquecido_arrow}")
+    for formato, ruta in exportaciones.items():
+        print(f"- Datos enriquecidos ({NOMBRES_FORMATOS[formato]}): {ruta}")
     print(f"- Reporte de análisis (JSON): {config['reports_dir'] / 'reporte_analisis.json'}")
     print(f"- Reporte de análisis (TXT): {config['reports_dir'] / 'reporte_analisis.txt'}")
     print(f"- Visualizaciones: {config['reports_dir']}/*.png")
@@ -427,4 +653,20 @@ def main():
     print("\n¡Fase 2 completada exitosamente!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Fase 2 - Análisis y enriquecimiento de datos")
+    parser.add_argument('--formatos', type=parsear_formatos, default=FORMATOS_EXPORTACION,
+                        help="exportaciones a generar: csv, xlsx, csv,xlsx (por defecto) o ninguno")
+    parser.add_argument('--sin-exportaciones', dest='formatos', action='store_const', const=(),
+                        help="escribir solo el archivo de intercambio Arrow, sin CSV ni XLSX")
+    parser.add_argument('--aproximado', action='store_true',
+                        help="análisis exploratorio con resúmenes aproximados (HyperLogLog y Space-Saving)")
+    parser.add_argument('--perfilar-memoria', action='store_true',
+                        help="medir el pico de memoria de Python de cada etapa con tracemalloc (más lento)")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="guardar un perfil de cProfile por etapa en reports/perfiles/")
+    args = parser.parse_args()
+    
+    with Perfilador('fase2', memoria=args.perfilar_memoria, cprofile=args.cprofile):
+        main(formatos=args.formatos, aproximado=args.aproximado)
\ No newline at end of file
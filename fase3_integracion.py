@@ -10,21 +10,20 @@ Entregables:
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import streamlit as st
 from pathlib import Path
 import json
-from datetime import datetime, timedelta
-import requests
-from sqlalchemy import create_engine
-import sqlite3
+from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from agregados import obtener_agregados
+from exportaciones import FORMATOS_EXPORTACION, NOMBRES_FORMATOS, exportar_dataframe, parsear_formatos
+from carga_sqlite import abrir_conexion, cargar_tabla, columnas_tabla, imprimir_estadisticas_carga
+from esquema_datos import (ESQUEMA_ENRIQUECIDOS, ESQUEMA_INTEGRADOS, CAMPOS_COMPLETITUD, MASCARA_COMPLETITUD,
+                           obtener_mascara_validez, contar_bits, tiene_campo,
+                           compactar, guardar_intercambio, leer_intercambio, leer_csv)
+from perfilado import Perfilador, perfilar
+
 def configurar_entorno():
     """Configura las rutas y crea directorios necesarios"""
     base_dir = Path.cwd()
@@ -48,17 +47,22 @@ def configurar_entorno():
         'database_dir': database_dir
     }
 
+@perfilar()
 def cargar_datos_enriquecidos(ruta_archivo):
-    """Carga los datos enriquecidos desde el archivo CSV"""
+    """Carga los datos enriquecidos desde el archivo de intercambio Arrow (o desde un CSV exportado)"""
     try:
         print("Cargando datos enriquecidos...")
-        df = pd.read_csv(ruta_archivo)
+        if Path(ruta_archivo).suffix == '.arrow':
+            df = leer_intercambio(ruta_archivo)
+        else:
+            df = leer_csv(ruta_archivo, ESQUEMA_ENRIQUECIDOS)
         print(f"Datos enriquecidos cargados correctamente. Filas: {len(df)}, Columnas: {len(df.columns)}")
         return df
     except Exception as e:
         print(f"Error al cargar los datos enriquecidos: {e}")
         return None
 
+@perfilar()
 def integrar_datos_externos(df):
     """Integra datos de fuentes externas"""
     print("\n" + "="*60)
@@ -86,16 +90,12 @@ def integrar_datos_externos(df):
     df_integrado['Puntuacion_Riesgo'] = calcular_puntuacion_riesgo(df_integrado)
     
     # 5. Categorizar por nivel de riesgo
-    df_integrado['Nivel_Riesgo'] = pd.cut(
-        df_integrado['Puntuacion_Riesgo'],
-        bins=[0, 3, 6, 9, 10],
-        labels=['BAJO', 'MEDIO', 'ALTO', 'CRÍTICO']
-    )
+    df_integrado['Nivel_Riesgo'] = clasificar_nivel_riesgo(df_integrado['Puntuacion_Riesgo'])
     
     print("✓ Integración con fuentes externas completada")
     print(f"Columnas añadidas: {set(df_integrado.columns) - set(df.columns)}")
     
-    return df_integrado
+    return compactar(df_integrado)
 
 def obtener_datos_economicos():
     """Obtiene datos económicos por región (simulados)"""
@@ -141,41 +141,69 @@ def calcular_clima_empresarial(region):
     }
     return clima_por_region.get(region, 'MODERADO')
 
-def calcular_puntuacion_riesgo(df):
+# Reglas de riesgo: factor -> (columna, valor si falta la columna, [(operador, valor, peso), ...]).
+# Dentro de cada factor se aplica el peso de la primera condición que se cumple;
+# los valores nulos no cumplen ninguna condición.
+PUNTUACION_BASE_RIESGO = 5
+PUNTUACION_MAXIMA_RIESGO = 10
+REGLAS_RIESGO = {
+    'completitud': ('Porcentaje_Completitud', 50, [('<', 60, 2), ('<', 80, 1)]),
+    'region': ('Region', 'OTRA', [('en', ['CAUCA', 'NARIÑO'], 2), ('==', 'OTRA', 1)]),
+    'tamaño': ('Tamaño_Empresa', 'PEQUEÑA', [('==', 'PEQUEÑA', 1)]),
+}
+
+# Niveles de riesgo por límite superior (intervalos cerrados por la derecha, desde 0)
+NIVELES_RIESGO = [(3, 'BAJO'), (6, 'MEDIO'), (9, 'ALTO'), (10, 'CRÍTICO')]
+
+OPERADORES_RIESGO = {
+    '<': lambda serie, valor: serie.lt(valor),
+    '==': lambda serie, valor: serie.eq(valor),
+    'en': lambda serie, valor: serie.isin(valor),
+}
+
+def compilar_reglas_riesgo(df, reglas=REGLAS_RIESGO):
+    """Compila cada factor de riesgo en máscaras booleanas sobre columnas completas y devuelve sus pesos"""
+    ajustes = {}
+    for factor, (columna, valor_defecto, condiciones) in reglas.items():
+        if columna in df.columns:
+            serie = df[columna]
+        else:
+            serie = pd.Series(valor_defecto, index=df.index)
+        mascaras = [OPERADORES_RIESGO[operador](serie, valor).to_numpy(dtype=bool)
+                    for operador, valor, _ in condiciones]
+        pesos = [peso for _, _, peso in condiciones]
+        ajustes[factor] = np.select(mascaras, pesos, default=0)
+    return ajustes
+
+def calcular_puntuacion_riesgo(df, reglas=REGLAS_RIESGO):
     """Calcula puntuación de riesgo basada en múltiples factores"""
-    puntuaciones = []
+    puntuacion = np.full(len(df), PUNTUACION_BASE_RIESGO, dtype=np.int64)
+    for ajuste in compilar_reglas_riesgo(df, reglas).values():
+        puntuacion += ajuste
     
-    for _, row in df.iterrows():
-        puntuacion = 5  # Puntuación base
-        
-        # Ajustar basado en completitud de datos
-        completitud = row.get('Porcentaje_Completitud', 50)
-        if completitud < 60:
-            puntuacion += 2
-        elif completitud < 80:
-            puntuacion += 1
-        
-        # Ajustar basado en región
-        region = row.get('Region', 'OTRA')
-        if region in ['CAUCA', 'NARIÑO']:
-            puntuacion += 2
-        elif region == 'OTRA':
-            puntuacion += 1
-        
-        # Ajustar basado en tamaño de empresa
-        tamaño = row.get('Tamaño_Empresa', 'PEQUEÑA')
-        if tamaño == 'PEQUEÑA':
-            puntuacion += 1
-        
-        # Limitar a máximo 10
-        puntuacion = min(puntuacion, 10)
-        
-        puntuaciones.append(puntuacion)
-    
-    return puntuaciones
+    # Limitar a máximo 10
+    return np.clip(puntuacion, None, PUNTUACION_MAXIMA_RIESGO)
+
+def clasificar_nivel_riesgo(puntuaciones, niveles=NIVELES_RIESGO):
+    """Asigna el nivel de riesgo (categórico ordenado); fuera de (0, 10] queda nulo"""
+    puntuaciones = pd.Series(puntuaciones)
+    limites = np.array([limite for limite, _ in niveles])
+    codigos = np.searchsorted(limites, puntuaciones.to_numpy(dtype=float), side='left')
+    codigos[(codigos == len(limites)) | ~(puntuaciones.to_numpy(dtype=float) > 0)] = -1
+    categorias = [nivel for _, nivel in niveles]
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, categories=categorias, ordered=True),
+        index=puntuaciones.index
+    )
 
+@perfilar()
 def crear_base_datos(df, database_dir):
-    """Crea una base de datos SQLite con los datos integrados"""
+    """Crea la base de datos SQLite con los datos integrados o la actualiza en sitio.
+    
+    La tabla empresas se carga por lotes con upsert sobre ID_Empresa: se
+    actualizan las empresas existentes, se insertan las nuevas y se borran las
+    que ya no están, en lugar de reescribir la tabla.
+    """
     print("\n" + "="*60)
     print("CREANDO BASE DE DATOS")
     print("="*60)
@@ -183,13 +211,24 @@ def crear_base_datos(df, database_dir):
     try:
         # Crear conexión a la base de datos
         ruta_db = database_dir / "empresas_colombia.db"
-        engine = create_engine(f'sqlite:///{ruta_db}')
-        
-        # Guardar datos en la base de datos
-        df.to_sql('empresas', engine, if_exists='replace', index=False)
+        conexion = abrir_conexion(ruta_db)
         
-        # Crear tablas adicionales para análisis
-        crear_tablas_analiticas(engine, df)
+        try:
+            conexion.execute("BEGIN")
+            try:
+                estadisticas = cargar_tabla(conexion, df, 'empresas', clave='ID_Empresa')
+                # Una carga completa invalida el estado de la ejecución incremental
+                conexion.execute("DROP TABLE IF EXISTS estado_filas")
+                
+                # Tablas analíticas dentro de la base de datos
+                crear_tablas_analiticas(conexion)
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+        finally:
+            conexion.close()
+        imprimir_estadisticas_carga(estadisticas)
         
         print(f"✓ Base de datos creada exitosamente: {ruta_db}")
         return True
@@ -198,35 +237,273 @@ def crear_base_datos(df, database_dir):
         print(f"✗ Error al crear base de datos: {e}")
         return False
 
-def crear_tablas_analiticas(engine, df):
-    """Crea tablas analíticas adicionales en la base de datos"""
-    
-    # Tabla de resumen por región
-    resumen_region = df.groupby('Region').agg({
-        'ID_Empresa': 'count',
-        'Puntuacion_Riesgo': 'mean',
-        'Porcentaje_Completitud': 'mean',
-        'PIB_Per_Capita': 'mean'
-    }).round(2).reset_index()
-    resumen_region.rename(columns={'ID_Empresa': 'Total_Empresas'}, inplace=True)
-    resumen_region.to_sql('resumen_region', engine, if_exists='replace', index=False)
-    
-    # Tabla de resumen por ciudad
-    resumen_ciudad = df.groupby('Ciudad_Act').agg({
-        'ID_Empresa': 'count',
-        'Puntuacion_Riesgo': 'mean',
-        'Porcentaje_Completitud': 'mean'
-    }).round(2).reset_index()
-    resumen_ciudad.rename(columns={'ID_Empresa': 'Total_Empresas'}, inplace=True)
-    resumen_ciudad.to_sql('resumen_ciudad', engine, if_exists='replace', index=False)
-    
-    # Tabla de distribución de riesgo
-    distribucion_riesgo = df['Nivel_Riesgo'].value_counts().reset_index()
-    distribucion_riesgo.columns = ['Nivel_Riesgo', 'Cantidad']
-    distribucion_riesgo.to_sql('distribucion_riesgo', engine, if_exists='replace', index=False)
-
-def crear_dashboard_interactivo(df, dashboards_dir):
+def aplicar_delta_base_datos(df_delta, hashes_insertados, hashes_eliminados, database_dir, completa=False):
+    """Aplica un delta de filas a la base de datos en lugar de reemplazarla.
+    
+    Borra las empresas cuyas filas de origen se eliminaron o modificaron,
+    descarta del delta las identidades que ya existen en la tabla, inserta el
+    resto y actualiza la tabla estado_filas con los hashes de contenido ya
+    procesados. Con completa=True reconstruye la tabla desde cero; sin ella, si
+    las columnas de la tabla no coinciden con las del delta no se modifica nada
+    y se devuelve False.
+    """
+    print("\n" + "="*60)
+    print("APLICANDO DELTA A LA BASE DE DATOS")
+    print("="*60)
+    
+    ruta_db = database_dir / "empresas_colombia.db"
+    conexion = abrir_conexion(ruta_db)
+    
+    try:
+        conexion.execute("BEGIN")
+        try:
+            if completa:
+                conexion.execute("DROP TABLE IF EXISTS empresas")
+                conexion.execute("DROP TABLE IF EXISTS estado_filas")
+            conexion.execute("CREATE TABLE IF NOT EXISTS estado_filas (hash_fila INTEGER PRIMARY KEY)")
+            
+            columnas_existentes = columnas_tabla(conexion, 'empresas')
+            existe_empresas = bool(columnas_existentes)
+            if existe_empresas and len(df_delta) > 0 and set(columnas_existentes) != set(df_delta.columns):
+                # Nunca se borra la tabla en una carga parcial: el delta no trae las demás empresas
+                raise ValueError("las columnas de la tabla empresas cambiaron; "
+                                 "ejecute pipeline_incremental.py --completa para recargarla")
+            
+            # 1. Eliminar las filas que ya no están (o cambiaron) en origen
+            if existe_empresas and hashes_eliminados:
+                conexion.executemany(
+                    "DELETE FROM empresas WHERE Hash_Fila = ?",
+                    ((int(h),) for h in hashes_eliminados)
+                )
+            conexion.executemany(
+                "DELETE FROM estado_filas WHERE hash_fila = ?",
+                ((int(h),) for h in hashes_eliminados)
+            )
+            
+            # 2. Descartar empresas (por ID estable) que ya existen en la base de datos
+            if existe_empresas and len(df_delta) > 0:
+                identidades = df_delta['ID_Empresa'].unique().tolist()
+                existentes = set()
+                for inicio in range(0, len(identidades), 500):
+                    lote = identidades[inicio:inicio + 500]
+                    marcadores = ','.join('?' * len(lote))
+                    existentes.update(fila[0] for fila in conexion.execute(
+                        f"SELECT ID_Empresa FROM empresas WHERE ID_Empresa IN ({marcadores})", lote
+                    ))
+                repetidas = df_delta['ID_Empresa'].isin(existentes)
+                print(f"Empresas del delta que ya existen en la base de datos: {repetidas.sum()}")
+                df_delta = df_delta[~repetidas]
+            
+            # 3. Insertar las filas nuevas (los índices solo se reconstruyen en una carga completa)
+            if len(df_delta) > 0 or not existe_empresas:
+                estadisticas = cargar_tabla(conexion, df_delta, 'empresas', clave='ID_Empresa',
+                                            sincronizar=False, reconstruir_indices=completa)
+                imprimir_estadisticas_carga(estadisticas)
+            conexion.executemany(
+                "INSERT OR IGNORE INTO estado_filas (hash_fila) VALUES (?)",
+                ((int(h),) for h in hashes_insertados)
+            )
+            
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_empresas_hash_fila ON empresas (Hash_Fila)")
+            
+            # Los disparadores ya ajustaron las tablas analíticas con las filas del delta
+            crear_tablas_analiticas(conexion)
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+        
+        print(f"Filas eliminadas: {len(hashes_eliminados)}")
+        print(f"Filas insertadas: {len(df_delta)}")
+        
+        print(f"✓ Delta aplicado exitosamente: {ruta_db}")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Error al aplicar delta en la base de datos: {e}")
+        return False
+    finally:
+        conexion.close()
+
+# Tablas analíticas mantenidas dentro de SQLite: nombre -> (columna de agrupación, columnas promediadas).
+# Cada una guarda conteo, suma y cantidad de valores no nulos por grupo en agregados_<nombre>;
+# la vista resumen_<nombre> calcula los promedios redondeados a 2 decimales.
+AGREGADOS_ANALITICOS = {
+    'region': ('Region', ['Puntuacion_Riesgo', 'Porcentaje_Completitud', 'PIB_Per_Capita']),
+    'ciudad': ('Ciudad_Act', ['Puntuacion_Riesgo', 'Porcentaje_Completitud']),
+}
+
+def _sql_tablas_analiticas():
+    """Genera el SQL de las tablas de agregados, sus disparadores y las vistas de resumen"""
+    sentencias = []
+    for nombre, (grupo, medidas) in AGREGADOS_ANALITICOS.items():
+        tabla = f"agregados_{nombre}"
+        columnas = ''.join(f', "Suma_{m}" REAL NOT NULL DEFAULT 0, "Cuenta_{m}" INTEGER NOT NULL DEFAULT 0' for m in medidas)
+        sentencias.append(
+            f'CREATE TABLE IF NOT EXISTS {tabla} ("{grupo}" TEXT PRIMARY KEY, '
+            f'Total_Empresas INTEGER NOT NULL DEFAULT 0{columnas})'
+        )
+        
+        # Sumar una fila (NEW) o restarla (OLD) de los agregados de su grupo
+        nombres = ', '.join([f'"{grupo}"', 'Total_Empresas'] + [f'"Suma_{m}", "Cuenta_{m}"' for m in medidas])
+        valores = ', '.join([f'NEW."{grupo}"', '1'] + [f'COALESCE(NEW."{m}", 0), NEW."{m}" IS NOT NULL' for m in medidas])
+        sumas = ', '.join(['Total_Empresas = Total_Empresas + excluded.Total_Empresas'] + [
+            f'"Suma_{m}" = "Suma_{m}" + excluded."Suma_{m}", "Cuenta_{m}" = "Cuenta_{m}" + excluded."Cuenta_{m}"'
+            for m in medidas
+        ])
+        sumar = (f'INSERT INTO {tabla} ({nombres}) SELECT {valores} WHERE NEW."{grupo}" IS NOT NULL '
+                 f'ON CONFLICT ("{grupo}") DO UPDATE SET {sumas};')
+        restas = ', '.join(['Total_Empresas = Total_Empresas - 1'] + [
+            f'"Suma_{m}" = "Suma_{m}" - COALESCE(OLD."{m}", 0), "Cuenta_{m}" = "Cuenta_{m}" - (OLD."{m}" IS NOT NULL)'
+            for m in medidas
+        ])
+        restar = f'UPDATE {tabla} SET {restas} WHERE "{grupo}" = OLD."{grupo}";'
+        cambios = ' OR '.join(f'OLD."{col}" IS NOT NEW."{col}"' for col in [grupo] + medidas)
+        
+        sentencias += [
+            f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_insertar AFTER INSERT ON empresas BEGIN {sumar} END',
+            f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_eliminar AFTER DELETE ON empresas BEGIN {restar} END',
+            f'CREATE TRIGGER IF NOT EXISTS trg_{tabla}_actualizar AFTER UPDATE ON empresas WHEN {cambios} '
+            f'BEGIN {restar} {sumar} END',
+        ]
+        
+        promedios = ''.join(f', ROUND("Suma_{m}" / NULLIF("Cuenta_{m}", 0), 2) AS "{m}"' for m in medidas)
+        sentencias.append(
+            f'CREATE VIEW IF NOT EXISTS resumen_{nombre} AS SELECT "{grupo}", Total_Empresas{promedios} '
+            f'FROM {tabla} WHERE Total_Empresas > 0 ORDER BY "{grupo}"'
+        )
+    
+    # Distribución de riesgo: un contador por nivel (los niveles sin empresas aparecen con 0)
+    sentencias += [
+        'CREATE TABLE IF NOT EXISTS agregados_riesgo (Nivel_Riesgo TEXT PRIMARY KEY, Cantidad INTEGER NOT NULL DEFAULT 0)',
+        'CREATE TRIGGER IF NOT EXISTS trg_agregados_riesgo_insertar AFTER INSERT ON empresas BEGIN '
+        'INSERT INTO agregados_riesgo (Nivel_Riesgo, Cantidad) SELECT NEW.Nivel_Riesgo, 1 WHERE NEW.Nivel_Riesgo IS NOT NULL '
+        'ON CONFLICT (Nivel_Riesgo) DO UPDATE SET Cantidad = Cantidad + 1; END',
+        'CREATE TRIGGER IF NOT EXISTS trg_agregados_riesgo_eliminar AFTER DELETE ON empresas BEGIN '
+        'UPDATE agregados_riesgo SET Cantidad = Cantidad - 1 WHERE Nivel_Riesgo = OLD.Nivel_Riesgo; END',
+        'CREATE TRIGGER IF NOT EXISTS trg_agregados_riesgo_actualizar AFTER UPDATE OF Nivel_Riesgo ON empresas '
+        'WHEN OLD.Nivel_Riesgo IS NOT NEW.Nivel_Riesgo BEGIN '
+        'UPDATE agregados_riesgo SET Cantidad = Cantidad - 1 WHERE Nivel_Riesgo = OLD.Nivel_Riesgo; '
+        'INSERT INTO agregados_riesgo (Nivel_Riesgo, Cantidad) SELECT NEW.Nivel_Riesgo, 1 WHERE NEW.Nivel_Riesgo IS NOT NULL '
+        'ON CONFLICT (Nivel_Riesgo) DO UPDATE SET Cantidad = Cantidad + 1; END',
+        'CREATE VIEW IF NOT EXISTS distribucion_riesgo AS SELECT Nivel_Riesgo, Cantidad '
+        'FROM agregados_riesgo ORDER BY Cantidad DESC',
+    ]
+    return sentencias
+
+def _reconstruir_agregados(conexion):
+    """Recalcula los agregados desde la tabla empresas con INSERT ... SELECT ... GROUP BY"""
+    for nombre, (grupo, medidas) in AGREGADOS_ANALITICOS.items():
+        tabla = f"agregados_{nombre}"
+        expresiones = ''.join(f', TOTAL("{m}"), COUNT("{m}")' for m in medidas)
+        conexion.execute(f"DELETE FROM {tabla}")
+        conexion.execute(
+            f'INSERT INTO {tabla} SELECT "{grupo}", COUNT(*){expresiones} '
+            f'FROM empresas WHERE "{grupo}" IS NOT NULL GROUP BY "{grupo}"'
+        )
+    
+    conexion.execute("DELETE FROM agregados_riesgo")
+    conexion.executemany(
+        "INSERT INTO agregados_riesgo (Nivel_Riesgo, Cantidad) VALUES (?, 0)",
+        ((nivel,) for _, nivel in NIVELES_RIESGO)
+    )
+    conexion.execute(
+        "INSERT INTO agregados_riesgo (Nivel_Riesgo, Cantidad) "
+        "SELECT Nivel_Riesgo, COUNT(*) FROM empresas WHERE Nivel_Riesgo IS NOT NULL GROUP BY Nivel_Riesgo "
+        "ON CONFLICT (Nivel_Riesgo) DO UPDATE SET Cantidad = excluded.Cantidad"
+    )
+
+def crear_tablas_analiticas(conexion):
+    """Crea (si faltan) las tablas analíticas dentro de SQLite y las deja mantenidas por disparadores.
+    
+    Los disparadores sobre empresas ajustan conteos y sumas con cada fila
+    insertada, actualizada o eliminada, de modo que una carga solo toca los
+    grupos de las empresas que cambiaron. Los agregados solo se recalculan
+    por completo cuando faltan los disparadores (tabla empresas recién creada).
+    """
+    existentes = {
+        nombre: tipo for nombre, tipo in conexion.execute("SELECT name, type FROM sqlite_master")
+    }
+    disparadores_completos = all(
+        f"trg_agregados_{nombre}_insertar" in existentes for nombre in list(AGREGADOS_ANALITICOS) + ['riesgo']
+    )
+    
+    # Las versiones anteriores guardaban los resúmenes como tablas; ahora son vistas
+    for vista in [f"resumen_{nombre}" for nombre in AGREGADOS_ANALITICOS] + ['distribucion_riesgo']:
+        if existentes.get(vista) == 'table':
+            conexion.execute(f'DROP TABLE "{vista}"')
+    
+    for sentencia in _sql_tablas_analiticas():
+        conexion.execute(sentencia)
+    
+    if not disparadores_completos:
+        _reconstruir_agregados(conexion)
+        print("Tablas analíticas recalculadas desde la tabla empresas")
+
+# Filas a partir de las cuales el gráfico de dispersión usa WebGL (Scattergl)
+# y a partir de las cuales se reemplaza por un histograma 2D pre-agrupado
+UMBRAL_DISPERSION_WEBGL = 5_000
+UMBRAL_DISPERSION_DENSIDAD = 100_000
+CELDAS_DENSIDAD = 50
+
+# plotly.js se escribe una sola vez como plotly.min.js junto a los HTML y estos lo referencian
+INCLUIR_PLOTLYJS = 'directory'
+
+def elegir_modo_dispersion(filas, modo='auto', umbral_webgl=UMBRAL_DISPERSION_WEBGL,
+                           umbral_densidad=UMBRAL_DISPERSION_DENSIDAD):
+    """Elige cómo dibujar la dispersión: 'svg', 'webgl' o 'densidad' ('auto' decide por número de filas)"""
+    if modo != 'auto':
+        return modo
+    if filas > umbral_densidad:
+        return 'densidad'
+    if filas > umbral_webgl:
+        return 'webgl'
+    return 'svg'
+
+def traza_dispersion(df, modo):
+    """Crea la traza Completitud vs Puntuación de Riesgo en el modo indicado"""
+    import plotly.graph_objects as go
+    
+    x = df['Porcentaje_Completitud']
+    y = df['Puntuacion_Riesgo']
+    
+    if modo == 'densidad':
+        # Los conteos se agrupan aquí: el HTML guarda la matriz, no un punto por empresa
+        validos = x.notna() & y.notna()
+        conteos, bordes_x, bordes_y = np.histogram2d(
+            x[validos].to_numpy(dtype=float), y[validos].to_numpy(dtype=float), bins=CELDAS_DENSIDAD
+        )
+        conteos = np.where(conteos > 0, conteos, np.nan)
+        return go.Heatmap(
+            x=(bordes_x[:-1] + bordes_x[1:]) / 2,
+            y=(bordes_y[:-1] + bordes_y[1:]) / 2,
+            z=conteos.T,
+            colorscale='YlOrRd',
+            colorbar=dict(title='Empresas'),
+            name="Completitud vs Riesgo"
+        )
+    
+    clase = go.Scattergl if modo == 'webgl' else go.Scatter
+    return clase(
+        x=x,
+        y=y,
+        mode='markers',
+        marker=dict(
+            size=8,
+            color=y,
+            colorscale='RdYlGn_r',
+            showscale=True
+        ),
+        name="Completitud vs Riesgo"
+    )
+
+@perfilar()
+def crear_dashboard_interactivo(df, dashboards_dir, modo_dispersion='auto'):
     """Crea un dashboard interactivo con Plotly"""
+    # Plotly se importa solo en las etapas que generan dashboards
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     print("\n" + "="*60)
     print("CREANDO DASHBOARD INTERACTIVO")
     print("="*60)
@@ -246,7 +523,8 @@ def crear_dashboard_interactivo(df, dashboards_dir):
         )
         
         # 1. Gráfico de pie - Distribución por región
-        region_counts = df['Region'].value_counts()
+        agregados = obtener_agregados(df)
+        region_counts = agregados.conteo('Region')
         fig.add_trace(
             go.Pie(
                 labels=region_counts.index,
@@ -257,7 +535,7 @@ def crear_dashboard_interactivo(df, dashboards_dir):
         )
         
         # 2. Gráfico de barras - Niveles de riesgo
-        riesgo_counts = df['Nivel_Riesgo'].value_counts()
+        riesgo_counts = agregados.conteo('Nivel_Riesgo')
         fig.add_trace(
             go.Bar(
                 x=riesgo_counts.index,
@@ -268,25 +546,13 @@ def crear_dashboard_interactivo(df, dashboards_dir):
             row=1, col=2
         )
         
-        # 3. Gráfico de dispersión - Completitud vs Riesgo
-        fig.add_trace(
-            go.Scatter(
-                x=df['Porcentaje_Completitud'],
-                y=df['Puntuacion_Riesgo'],
-                mode='markers',
-                marker=dict(
-                    size=8,
-                    color=df['Puntuacion_Riesgo'],
-                    colorscale='RdYlGn_r',
-                    showscale=True
-                ),
-                name="Completitud vs Riesgo"
-            ),
-            row=2, col=1
-        )
+        # 3. Gráfico de dispersión - Completitud vs Riesgo (SVG, WebGL o densidad según el volumen)
+        modo = elegir_modo_dispersion(len(df), modo_dispersion)
+        print(f"Modo del gráfico de dispersión: {modo} ({len(df)} empresas)")
+        fig.add_trace(traza_dispersion(df, modo), row=2, col=1)
         
         # 4. Gráfico de barras - Top 10 ciudades
-        top_ciudades = df['Ciudad_Act'].value_counts().head(10)
+        top_ciudades = agregados.conteo('Ciudad_Act', top=10)
         fig.add_trace(
             go.Bar(
                 x=top_ciudades.index,
@@ -307,7 +573,7 @@ def crear_dashboard_interactivo(df, dashboards_dir):
         
         # Guardar dashboard
         ruta_dashboard = dashboards_dir / "dashboard_empresas.html"
-        fig.write_html(ruta_dashboard)
+        fig.write_html(ruta_dashboard, include_plotlyjs=INCLUIR_PLOTLYJS)
         print(f"✓ Dashboard interactivo creado: {ruta_dashboard}")
         
         # Crear dashboard adicional de métricas clave
@@ -321,12 +587,14 @@ def crear_dashboard_interactivo(df, dashboards_dir):
 
 def crear_dashboard_metricas(df, dashboards_dir):
     """Crea un dashboard adicional con métricas clave"""
+    import plotly.graph_objects as go
     
     # Calcular métricas clave
-    total_empresas = len(df)
-    promedio_completitud = df['Porcentaje_Completitud'].mean()
-    promedio_riesgo = df['Puntuacion_Riesgo'].mean()
-    empresas_alto_riesgo = len(df[df['Nivel_Riesgo'].isin(['ALTO', 'CRÍTICO'])])
+    agregados = obtener_agregados(df)
+    total_empresas = agregados.total
+    promedio_completitud = agregados.media('Porcentaje_Completitud')
+    promedio_riesgo = agregados.media('Puntuacion_Riesgo')
+    empresas_alto_riesgo = agregados.total_en('Nivel_Riesgo', ['ALTO', 'CRÍTICO'])
     
     # Crear figura con indicadores
     fig = go.Figure()
@@ -369,9 +637,25 @@ def crear_dashboard_metricas(df, dashboards_dir):
     
     # Guardar dashboard de métricas
     ruta_metricas = dashboards_dir / "metricas_clave.html"
-    fig.write_html(ruta_metricas)
+    fig.write_html(ruta_metricas, include_plotlyjs=INCLUIR_PLOTLYJS)
     print(f"✓ Dashboard de métricas creado: {ruta_metricas}")
 
+def calcular_contadores_calidad(df):
+    """Calcula los contadores de calidad con conteos de bits sobre la máscara de validez"""
+    mascara = obtener_mascara_validez(df)
+    campos_llenos = contar_bits(mascara, MASCARA_COMPLETITUD)
+    total = len(df)
+    return {
+        'total_registros': total,
+        'completitud_promedio': round(float(campos_llenos.mean()) / len(CAMPOS_COMPLETITUD) * 100, 2) if total else 0.0,
+        # Completitud menor al 50%: menos de la mitad de los campos relevantes con valor
+        'baja_completitud': int((campos_llenos * 2 < len(CAMPOS_COMPLETITUD)).sum()),
+        'sin_telefono': int((~tiene_campo(mascara, 'Telefono_Act1')).sum()),
+        'sin_gerente_financiero': int((~tiene_campo(mascara, 'NombresGerenteFinanciero_Act')).sum()),
+        'alto_riesgo': obtener_agregados(df).total_en('Nivel_Riesgo', ['ALTO', 'CRÍTICO'])
+    }
+
+@perfilar()
 def crear_sistema_monitorizacion(df, database_dir):
     """Crea un sistema de monitorización de calidad de datos"""
     print("\n" + "="*60)
@@ -379,18 +663,21 @@ def crear_sistema_monitorizacion(df, database_dir):
     print("="*60)
     
     try:
+        contadores = calcular_contadores_calidad(df)
+        total = contadores['total_registros']
+        
         # Crear reporte de monitorización
         reporte_monitorizacion = {
             'fecha_generacion': datetime.now().isoformat(),
-            'total_registros': len(df),
+            'total_registros': total,
             'metricas_calidad': {
-                'completitud_promedio': float(df['Porcentaje_Completitud'].mean().round(2)),
-                'porcentaje_alto_riesgo': float((len(df[df['Nivel_Riesgo'].isin(['ALTO', 'CRÍTICO'])]) / len(df) * 100).round(2)),
-                'empresas_sin_telefono': int(df['Telefono_Act1'].isnull().sum()),
-                'empresas_sin_gerente_financiero': int(df['NombresGerenteFinanciero_Act'].isnull().sum())
+                'completitud_promedio': contadores['completitud_promedio'],
+                'porcentaje_alto_riesgo': round(contadores['alto_riesgo'] / total * 100, 2) if total else 0.0,
+                'empresas_sin_telefono': contadores['sin_telefono'],
+                'empresas_sin_gerente_financiero': contadores['sin_gerente_financiero']
             },
-            'distribucion_riesgo': df['Nivel_Riesgo'].value_counts().to_dict(),
-            'alertas': generar_alertas_calidad(df)
+            'distribucion_riesgo': obtener_agregados(df).conteo('Nivel_Riesgo').to_dict(),
+            'alertas': generar_alertas_calidad(df, contadores)
         }
         
         # Guardar reporte
@@ -405,12 +692,14 @@ def crear_sistema_monitorizacion(df, database_dir):
         print(f"✗ Error al crear sistema de monitorización: {e}")
         return False
 
-def generar_alertas_calidad(df):
+def generar_alertas_calidad(df, contadores=None):
     """Genera alertas de calidad basadas en los datos"""
+    if contadores is None:
+        contadores = calcular_contadores_calidad(df)
     alertas = []
     
     # Alerta por completitud baja
-    empresas_baja_completitud = len(df[df['Porcentaje_Completitud'] < 50])
+    empresas_baja_completitud = contadores['baja_completitud']
     if empresas_baja_completitud > 0:
         alertas.append({
             'tipo': 'COMPLETITUD_BAJA',
@@ -419,7 +708,7 @@ def generar_alertas_calidad(df):
         })
     
     # Alerta por alto riesgo
-    empresas_alto_riesgo = len(df[df['Nivel_Riesgo'].isin(['ALTO', 'CRÍTICO'])])
+    empresas_alto_riesgo = contadores['alto_riesgo']
     if empresas_alto_riesgo > 0:
         alertas.append({
             'tipo': 'ALTO_RIESGO',
@@ -428,7 +717,7 @@ def generar_alertas_calidad(df):
         })
     
     # Alerta por datos de contacto faltantes
-    empresas_sin_telefono = len(df[df['Telefono_Act1'].isnull()])
+    empresas_sin_telefono = contadores['sin_telefono']
     if empresas_sin_telefono > 0:
         alertas.append({
             'tipo': 'CONTACTO_FALTANTE',
@@ -438,6 +727,7 @@ def generar_alertas_calidad(df):
     
     return alertas
 
+@perfilar()
 def crear_app_streamlit(df, dashboards_dir):
     """Crea una aplicación Streamlit para visualización"""
     print("\n" + "="*60)
@@ -453,6 +743,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 
+from consultas_empresas import (PoolConexiones, TAMANO_PAGINA, consultar_opciones_filtros, consultar_metricas,
+                                consultar_conteo_por, consultar_correlacion, consultar_columnas,
+                                consultar_columnas_orden, consultar_pagina)
+
 # Configurar página
 st.set_page_config(page_title="Dashboard Empresas Colombia", layout="wide")
 
@@ -460,60 +754,117 @@ st.set_page_config(page_title="Dashboard Empresas Colombia", layout="wide")
 st.title("📊 Dashboard de Empresas Colombianas")
 st.markdown("Análisis integral de datos empresariales con indicadores de calidad y riesgo")
 
-# Cargar datos
+# Conexiones de solo lectura compartidas por todas las sesiones
+@st.cache_resource
+def obtener_pool():
+    return PoolConexiones('database/empresas_colombia.db')
+
+pool = obtener_pool()
+version = pool.version()
+
+# Resultados en caché por selección de filtros (y versión de la base de datos)
 @st.cache_data
-def load_data():
-    return pd.read_csv('data/processed/datos_integrados.csv')
+def opciones_filtros(version):
+    return consultar_opciones_filtros(pool)
 
-df = load_data()
+@st.cache_data
+def metricas(version, regiones=(), niveles=()):
+    return consultar_metricas(pool, regiones, niveles)
+
+@st.cache_data
+def conteo_por(version, columna, regiones, niveles):
+    return consultar_conteo_por(pool, columna, regiones, niveles)
+
+@st.cache_data
+def correlacion(version, regiones, niveles):
+    return consultar_correlacion(pool, regiones, niveles)
 
 # Métricas principales
+resumen = metricas(version)
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total Empresas", len(df))
+    st.metric("Total Empresas", resumen['total_empresas'])
 with col2:
-    st.metric("Completitud Promedio", f"{df['Porcentaje_Completitud'].mean():.1f}%")
+    st.metric("Completitud Promedio", f"{resumen['completitud_promedio'] or 0:.1f}%")
 with col3:
-    st.metric("Riesgo Promedio", f"{df['Puntuacion_Riesgo'].mean():.1f}/10")
+    st.metric("Riesgo Promedio", f"{resumen['riesgo_promedio'] or 0:.1f}/10")
 with col4:
-    alto_riesgo = len(df[df['Nivel_Riesgo'].isin(['ALTO', 'CRÍTICO'])])
-    st.metric("Empresas Alto Riesgo", alto_riesgo)
+    st.metric("Empresas Alto Riesgo", resumen['empresas_alto_riesgo'])
 
 # Filtros
+opciones_region, opciones_nivel = opciones_filtros(version)
 st.sidebar.header("Filtros")
-region = st.sidebar.multiselect("Región", options=df['Region'].unique())
-nivel_riesgo = st.sidebar.multiselect("Nivel de Riesgo", options=df['Nivel_Riesgo'].unique())
-
-# Aplicar filtros
-if region:
-    df = df[df['Region'].isin(region)]
-if nivel_riesgo:
-    df = df[df['Nivel_Riesgo'].isin(nivel_riesgo)]
+region = tuple(sorted(st.sidebar.multiselect("Región", options=opciones_region)))
+nivel_riesgo = tuple(sorted(st.sidebar.multiselect("Nivel de Riesgo", options=opciones_nivel)))
 
 # Gráficos
 col1, col2 = st.columns(2)
 
 with col1:
-    fig = px.pie(df, names='Region', title='Distribución por Región')
+    por_region = conteo_por(version, 'Region', region, nivel_riesgo)
+    fig = px.pie(por_region, names='Region', values='Cantidad', title='Distribución por Región')
     st.plotly_chart(fig, use_container_width=True)
 
 with col2:
-    fig = px.bar(df['Nivel_Riesgo'].value_counts(), 
+    por_nivel = conteo_por(version, 'Nivel_Riesgo', region, nivel_riesgo)
+    fig = px.bar(por_nivel, x='Nivel_Riesgo', y='Cantidad',
                  title='Distribución por Nivel de Riesgo',
-                 color=df['Nivel_Riesgo'].value_counts().index,
+                 color='Nivel_Riesgo',
                  color_discrete_map={'BAJO': 'green', 'MEDIO': 'yellow', 'ALTO': 'orange', 'CRÍTICO': 'red'})
     st.plotly_chart(fig, use_container_width=True)
 
 # Mapa de calor de correlación
 st.subheader("Mapa de Calor de Correlación")
-corr_matrix = df[['Porcentaje_Completitud', 'Puntuacion_Riesgo', 'PIB_Per_Capita']].corr()
+corr_matrix = correlacion(version, region, nivel_riesgo)
 fig = px.imshow(corr_matrix, text_auto=True, aspect="auto")
 st.plotly_chart(fig, use_container_width=True)
 
-# Datos crudos
+# Datos crudos: una página a la vez, ordenada y proyectada en el servidor
+@st.cache_data
+def pagina_datos(version, columnas, regiones, niveles, orden, descendente, cursor):
+    return consultar_pagina(pool, list(columnas), regiones, niveles, orden, descendente, cursor)
+
 if st.checkbox("Mostrar datos crudos"):
     st.subheader("Datos Crudos")
-    st.dataframe(df)
+    columnas_disponibles = consultar_columnas(pool)
+    columnas_iniciales = [col for col in ['ID_Empresa', 'NombresGerenteGeneral_Act', 'ApellidosGerenteGeneral_Act',
+                                          'Ciudad_Act', 'Region', 'Nivel_Riesgo'] if col in columnas_disponibles]
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        columnas = tuple(st.multiselect("Columnas", options=columnas_disponibles, default=columnas_iniciales))
+    with col2:
+        columnas_orden = consultar_columnas_orden(pool)
+        orden = st.selectbox("Ordenar por", options=columnas_orden, index=columnas_orden.index('ID_Empresa'))
+    with col3:
+        descendente = st.checkbox("Descendente")
+    
+    # Los cursores de las páginas visitadas se reinician al cambiar filtros, columnas u orden
+    vista = (region, nivel_riesgo, columnas, orden, descendente)
+    if st.session_state.get('vista_datos') != vista:
+        st.session_state['vista_datos'] = vista
+        st.session_state['cursores'] = [None]
+        st.session_state['pagina'] = 0
+    cursores = st.session_state['cursores']
+    
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("⬅ Anterior") and st.session_state['pagina'] > 0:
+            st.session_state['pagina'] -= 1
+    with col2:
+        if st.button("Siguiente ➡") and st.session_state['pagina'] + 1 < len(cursores):
+            st.session_state['pagina'] += 1
+    
+    numero_pagina = st.session_state['pagina']
+    pagina, cursor_siguiente = pagina_datos(version, columnas, region, nivel_riesgo, orden, descendente,
+                                            cursores[numero_pagina])
+    if cursor_siguiente is not None and len(cursores) == numero_pagina + 1:
+        cursores.append(cursor_siguiente)
+    
+    total_filas = int(por_nivel['Cantidad'].sum())
+    with col3:
+        st.markdown(f"Página {numero_pagina + 1} de {max(1, -(-total_filas // TAMANO_PAGINA))} "
+                    f"({total_filas} empresas)")
+    st.dataframe(pagina, use_container_width=True)
 
 # Footer
 st.markdown("---")
@@ -533,8 +884,8 @@ st.markdown(f"*Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:
         print(f"✗ Error al crear aplicación Streamlit: {e}")
         return False
 
-def main():
-    """Función principal de la Fase 3"""
+def main(formatos=FORMATOS_EXPORTACION):
+    """Función principal de la Fase 3 (formatos: exportaciones a generar además del archivo Arrow)"""
     print("=" * 60)
     print("FASE 3 - INTEGRACIÓN Y DASHBOARD (SPRINT 3)")
     print("=" * 60)
@@ -542,8 +893,10 @@ def main():
     # Configurar entorno
     config = configurar_entorno()
     
-    # Cargar datos enriquecidos
-    ruta_datos_enriquecidos = config['processed_data_dir'] / "datos_enriquecidos.csv"
+    # Cargar datos enriquecidos (CSV solo si no existe el archivo de intercambio de una ejecución anterior)
+    ruta_datos_enriquecidos = config['processed_data_dir'] / "datos_enriquecidos.arrow"
+    if not ruta_datos_enriquecidos.exists():
+        ruta_datos_enriquecidos = config['processed_data_dir'] / "datos_enriquecidos.csv"
     df = cargar_datos_enriquecidos(ruta_datos_enriquecidos)
     
     if df is None:
@@ -566,18 +919,18 @@ def main():
     crear_app_streamlit(df_integrado, config['dashboards_dir'])
     
     # Guardar datos integrados
-    ruta_integrado_csv = config['processed_data_dir'] / "datos_integrados.csv"
-    ruta_integrado_excel = config['processed_data_dir'] / "datos_integrados.xlsx"
+    ruta_integrado_arrow = config['processed_data_dir'] / "datos_integrados.arrow"
     
-    df_integrado.to_csv(ruta_integrado_csv, index=False, encoding='utf-8')
-    df_integrado.to_excel(ruta_integrado_excel, index=False)
+    guardar_intercambio(df_integrado, ruta_integrado_arrow, ESQUEMA_INTEGRADOS)
+    exportaciones = exportar_dataframe(df_integrado, config['processed_data_dir'] / "datos_integrados", formatos)
     
     print("\n" + "=" * 60)
     print("RESULTADOS DE LA FASE 3")
     print("=" * 60)
     print("Archivos generados:")
-    print(f"- Datos integrados (CSV): {ruta_integrado_csv}")
-    print(f"- Datos integrados (Excel): {ruta_integrado_excel}")
+    print(f"- Datos integrados (Arrow): {ruta_integrado_arrow}")
+    for formato, ruta in exportaciones.items():
+        print(f"- Datos integrados ({NOMBRES_FORMATOS[formato]}): {ruta}")
     print(f"- Base de datos: {config['database_dir'] / 'empresas_colombia.db'}")
     print(f"- Dashboards interactivos: {config['dashboards_dir']}/*.html")
     print(f"- Aplicación Streamlit: {config['dashboards_dir'] / 'app_empresas.py'}")
@@ -595,4 +948,18 @@ def main():
     print("¡Proyecto de Business Intelligence finalizado! 🎉")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Fase 3 - Integración y dashboard")
+    parser.add_argument('--formatos', type=parsear_formatos, default=FORMATOS_EXPORTACION,
+                        help="exportaciones a generar: csv, xlsx, csv,xlsx (por defecto) o ninguno")
+    parser.add_argument('--sin-exportaciones', dest='formatos', action='store_const', const=(),
+                        help="escribir solo el archivo de intercambio Arrow, sin CSV ni XLSX")
+    parser.add_argument('--perfilar-memoria', action='store_true',
+                        help="medir el pico de memoria de Python de cada etapa con tracemalloc (más lento)")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="guardar un perfil de cProfile por etapa en reports/perfiles/")
+    args = parser.parse_args()
+    
+    with Perfilador('fase3', memoria=args.perfilar_memoria, cprofile=args.cprofile):
+        main(formatos=args.formatos)
\ No newline at end of file
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Perfilado por etapas de las fases del pipeline
+Cada etapa instrumentada con el gestor de contexto etapa() o el decorador
+perfilar() registra el tiempo real, el tiempo de CPU, las filas de entrada y de
+salida y la memoria: el RSS del proceso (actual y pico) y, con memoria=True, el
+pico de memoria de Python asignada durante la etapa medido con tracemalloc.
+Opcionalmente guarda un perfil de cProfile por etapa.
+
+Sin un Perfilador activo las etapas no hacen nada, de modo que las funciones
+instrumentadas se llaman igual desde los benchmarks y los procesos trabajadores.
+Los resultados se guardan en reports/perfilado_etapas.json, junto a
+reporte_analisis.json, con una entrada por ejecución (fase1, fase2, pipeline...).
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: sin RSS pico
+    resource = None
+
+NOMBRE_ARCHIVO_PERFILADO = "perfilado_etapas.json"
+
+_perfilador_activo = None
+
+def rss_actual_mb():
+    """Memoria residente actual del proceso en MB (None si no se puede medir)"""
+    try:
+        with open('/proc/self/statm') as archivo:
+            paginas = int(archivo.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def rss_pico_mb():
+    """Pico de memoria residente del proceso desde su inicio en MB (None si no se puede medir)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en KB en Linux
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 1024
+
+def contar_filas(objeto):
+    """Filas de un DataFrame, Series o array (del primer elemento si es una tupla); None si no aplica"""
+    if isinstance(objeto, tuple) and objeto:
+        objeto = objeto[0]
+    forma = getattr(objeto, 'shape', None)
+    return int(forma[0]) if forma else None
+
+def _redondear(valor, decimales=4):
+    return None if valor is None else round(valor, decimales)
+
+class Medicion:
+    """Mediciones de una etapa; filas_salida se puede asignar dentro del bloque with"""
+
+    def __init__(self, nombre, ruta='', nivel=0, filas_entrada=None):
+        self.nombre = nombre
+        self.ruta = ruta or nombre
+        self.nivel = nivel
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+        self.segundos = None
+        self.cpu_segundos = None
+        self.memoria_pico_mb = None
+        self.rss_mb = None
+        self.rss_pico_mb = None
+        self.perfil = None
+        self.error = None
+        # Memoria de Python al empezar la etapa y pico absoluto visto por tracemalloc
+        self.memoria_inicial = 0
+        self.pico_absoluto = 0
+
+    def a_dict(self):
+        """Representación serializable de la medición"""
+        return {
+            'etapa': self.nombre,
+            'ruta': self.ruta,
+            'nivel': self.nivel,
+            'segundos': _redondear(self.segundos),
+            'cpu_segundos': _redondear(self.cpu_segundos),
+            'filas_entrada': self.filas_entrada,
+            'filas_salida': self.filas_salida,
+            'memoria_pico_mb': _redondear(self.memoria_pico_mb, 2),
+            'rss_mb': _redondear(self.rss_mb, 1),
+            'rss_pico_mb': _redondear(self.rss_pico_mb, 1),
+            'perfil': self.perfil,
+            'error': self.error,
+        }
+
+class Perfilador:
+    """Registra las etapas ejecutadas mientras está activo (bloque with) y guarda el resultado en JSON.
+
+    nombre: clave de la ejecución en perfilado_etapas.json.
+    memoria: medir el pico de memoria de Python por etapa con tracemalloc (hace más lenta la ejecución).
+    cprofile: guardar un perfil de cProfile por cada etapa de primer nivel en reports/perfiles/.
+    """
+
+    def __init__(self, nombre, reports_dir=None, memoria=False, cprofile=False):
+        self.nombre = nombre
+        self.reports_dir = Path(reports_dir) if reports_dir is not None else Path.cwd() / "reports"
+        self.memoria = memoria
+        self.directorio_perfiles = self.reports_dir / "perfiles" if cprofile else None
+        self.etapas = []
+        self._pila = []
+        self._perfil_en_curso = None
+        self._perfiles_guardados = 0
+        self._iniciar_tracemalloc = False
+
+    def __enter__(self):
+        global _perfilador_activo
+        if _perfilador_activo is not None:
+            raise RuntimeError(f"Ya hay un perfilador activo ({_perfilador_activo.nombre})")
+        _perfilador_activo = self
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciar_tracemalloc = True
+        self.fecha = datetime.now().isoformat(timespec='seconds')
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.process_time()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        global _perfilador_activo
+        self.segundos = time.perf_counter() - self._inicio
+        self.cpu_segundos = time.process_time() - self._inicio_cpu
+        _perfilador_activo = None
+        if self._iniciar_tracemalloc:
+            tracemalloc.stop()
+        self.guardar()
+        self.resumen()
+        return False
+
+    @contextmanager
+    def etapa(self, nombre, filas_entrada=None):
+        """Mide una etapa; las etapas anidadas se registran con la ruta de sus etapas contenedoras"""
+        padre = self._pila[-1] if self._pila else None
+        medicion = Medicion(nombre, f"{padre.ruta}/{nombre}" if padre else nombre, len(self._pila), filas_entrada)
+        self.etapas.append(medicion)
+
+        if self.memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            # El pico de la etapa contenedora hasta ahora se conserva antes de reiniciarlo para esta
+            if padre is not None:
+                padre.pico_absoluto = max(padre.pico_absoluto, pico)
+            tracemalloc.reset_peak()
+            medicion.memoria_inicial = medicion.pico_absoluto = actual
+
+        perfil = None
+        if self.directorio_perfiles is not None and self._perfil_en_curso is None:
+            import cProfile
+
+            perfil = self._perfil_en_curso = cProfile.Profile()
+
+        self._pila.append(medicion)
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield medicion
+        except BaseException as error:
+            medicion.error = type(error).__name__
+            raise
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            medicion.segundos = time.perf_counter() - inicio
+            medicion.cpu_segundos = time.process_time() - inicio_cpu
+            self._pila.pop()
+
+            if self.memoria:
+                pico = max(medicion.pico_absoluto, tracemalloc.get_traced_memory()[1])
+                medicion.memoria_pico_mb = (pico - medicion.memoria_inicial) / 2**20
+                if padre is not None:
+                    padre.pico_absoluto = max(padre.pico_absoluto, pico)
+                tracemalloc.reset_peak()
+
+            if perfil is not None:
+                self.directorio_perfiles.mkdir(parents=True, exist_ok=True)
+                # Número de secuencia: una etapa que se repite no sobrescribe el perfil anterior
+                self._perfiles_guardados += 1
+                ruta_perfil = self.directorio_perfiles / (
+                    f"{self.nombre}_{self._perfiles_guardados:03d}_{medicion.ruta.replace('/', '__')}.prof")
+                perfil.dump_stats(ruta_perfil)
+                medicion.perfil = str(ruta_perfil)
+                self._perfil_en_curso = None
+
+            medicion.rss_mb = rss_actual_mb()
+            medicion.rss_pico_mb = rss_pico_mb()
+
+    def a_dict(self):
+        """Representación serializable de la ejecución"""
+        return {
+            'fecha': self.fecha,
+            'segundos': _redondear(self.segundos),
+            'cpu_segundos': _redondear(self.cpu_segundos),
+            'rss_pico_mb': _redondear(rss_pico_mb(), 1),
+            'memoria_tracemalloc': self.memoria,
+            'etapas': [medicion.a_dict() for medicion in self.etapas],
+        }
+
+    def guardar(self):
+        """Guarda la ejecución en perfilado_etapas.json conservando las de otras fases (reemplazo atómico)"""
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        ruta = self.reports_dir / NOMBRE_ARCHIVO_PERFILADO
+        ejecuciones = {}
+        if ruta.exists():
+            try:
+                ejecuciones = json.loads(ruta.read_text(encoding='utf-8'))
+            except json.JSONDecodeError:
+                ejecuciones = {}
+        ejecuciones[self.nombre] = self.a_dict()
+
+        ruta_temporal = ruta.with_suffix('.tmp')
+        ruta_temporal.write_text(json.dumps(ejecuciones, indent=2, ensure_ascii=False), encoding='utf-8')
+        ruta_temporal.replace(ruta)
+        self.ruta = ruta
+        return ruta
+
+    def resumen(self):
+        """Imprime el tiempo, las filas y la memoria de cada etapa"""
+        print("\n" + "=" * 60)
+        print(f"PERFILADO POR ETAPAS ({self.nombre})")
+        print("=" * 60)
+        for medicion in self.etapas:
+            filas = f"{medicion.filas_entrada if medicion.filas_entrada is not None else '-'}"
+            filas += f" → {medicion.filas_salida if medicion.filas_salida is not None else '-'}"
+            memoria = f", pico {medicion.memoria_pico_mb:.1f} MB" if medicion.memoria_pico_mb is not None else ""
+            error = f" ✗ {medicion.error}" if medicion.error else ""
+            print(f"{'  ' * medicion.nivel}- {medicion.nombre}: {medicion.segundos:.3f}s "
+                  f"(CPU {medicion.cpu_segundos:.3f}s), filas {filas}{memoria}{error}")
+        print(f"Total: {self.segundos:.3f}s, RSS pico {rss_pico_mb() or 0:.1f} MB")
+        print(f"Perfilado guardado en: {self.ruta}")
+
+def perfilador_activo():
+    """El Perfilador activo en este proceso, o None"""
+    return _perfilador_activo
+
+def desactivar_en_trabajador():
+    """Descarta en un proceso trabajador el Perfilador heredado del proceso principal al bifurcarse.
+    
+    Las etapas del trabajador no se miden: su copia del perfilador nunca se
+    guardaría y seguiría perfilando y trazando memoria para nada.
+    """
+    global _perfilador_activo
+    if _perfilador_activo is None:
+        return
+    if _perfilador_activo._perfil_en_curso is not None:
+        _perfilador_activo._perfil_en_curso.disable()
+    if _perfilador_activo._iniciar_tracemalloc:
+        tracemalloc.stop()
+    _perfilador_activo = None
+
+@contextmanager
+def etapa(nombre, filas_entrada=None):
+    """Mide un bloque con el perfilador activo (sin perfilador activo no mide nada)"""
+    if _perfilador_activo is None:
+        yield Medicion(nombre, filas_entrada=filas_entrada)
+        return
+    with _perfilador_activo.etapa(nombre, filas_entrada) as medicion:
+        yield medicion
+
+def perfilar(nombre=None):
+    """Decorador que mide cada llamada a la función como una etapa.
+
+    Las filas de entrada son las del primer argumento y las de salida las del resultado.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _perfilador_activo is None:
+                return funcion(*args, **kwargs)
+            with _perfilador_activo.etapa(nombre or funcion.__name__,
+                                          contar_filas(args[0]) if args else None) as medicion:
+                resultado = funcion(*args, **kwargs)
+                medicion.filas_salida = contar_filas(resultado)
+            return resultado
+        return envoltura
+    return decorador
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Orquestador del pipeline (Fases 1 a 3 en un solo proceso)
+Objetivo: Ejecutar limpieza → enriquecimiento → integración → carga pasando los
+dataframes en memoria, sin que cada fase vuelva a leer los archivos de la anterior.
+
+Cada etapa tiene una huella calculada a partir de las huellas de las etapas de
+las que depende, del código fuente de sus módulos y de las opciones de la
+ejecución que cambian sus salidas (la primera etapa usa además el contenido de
+BD.xlsx). El resultado de cada etapa se guarda en
+data/cache_etapas/ junto con su huella en estado_etapas.json; al volver a
+ejecutar, las etapas cuya huella no cambió se omiten y su resultado solo se lee
+del disco si alguna etapa posterior lo necesita. Si una ejecución falla en la
+Fase 3, la siguiente retoma desde la última etapa completada en lugar de
+empezar otra vez desde el Excel.
+"""
+
+import hashlib
+import inspect
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "data"))
+
+import limpieza_datos
+import resolucion_ciudades
+import duplicados
+import cache_limpieza
+import esquema_datos
+import exportaciones
+import perfilado
+import agregados
+import resumenes_aproximados
+import fase2_analisis
+import carga_sqlite
+import fase3_integracion
+from agregados import obtener_agregados
+from exportaciones import FORMATOS_EXPORTACION, exportar_dataframe, parsear_formatos
+from cache_limpieza import CacheLimpieza
+from perfilado import Perfilador, etapa
+from esquema_datos import (ESQUEMA_LIMPIOS, ESQUEMA_ENRIQUECIDOS, ESQUEMA_INTEGRADOS,
+                           guardar_intercambio, leer_intercambio)
+
+def configurar_entorno():
+    """Configura las rutas y crea directorios necesarios"""
+    config = fase3_integracion.configurar_entorno()
+    config['raw_data_dir'] = config['base_dir'] / "data" / "raw"
+    config['cache_etapas_dir'] = config['base_dir'] / "data" / "cache_etapas"
+
+    # Crear directorios si no existen
+    for clave in ('output_data_dir', 'processed_data_dir', 'reports_dir', 'cache_etapas_dir'):
+        config[clave].mkdir(parents=True, exist_ok=True)
+
+    return config
+
+def huella(*partes):
+    """Combina varias partes (texto o bytes) en una huella hexadecimal corta"""
+    resumen = hashlib.sha256()
+    for parte in partes:
+        resumen.update(parte if isinstance(parte, bytes) else str(parte).encode('utf-8'))
+        resumen.update(b'\0')
+    return resumen.hexdigest()[:16]
+
+def huella_archivo(ruta):
+    """Calcula la huella del contenido de un archivo leyéndolo por bloques"""
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()[:16]
+
+def version_codigo(*modulos):
+    """Versión del código de una etapa: huella del código fuente de sus módulos"""
+    return huella(*(Path(inspect.getsourcefile(modulo)).read_bytes() for modulo in modulos))
+
+# ---------------------------------------------------------------------------
+# Etapas: cada una recibe la configuración y los resultados de sus dependencias
+# ---------------------------------------------------------------------------
+
+def etapa_limpieza(config, opciones):
+    """Fase 1: carga BD.xlsx, limpia los datos y genera el diccionario de datos"""
+    df = limpieza_datos.cargar_datos(config['raw_data_dir'] / "BD.xlsx")
+    if df is None:
+        raise RuntimeError("No se pudo cargar BD.xlsx")
+
+    cache = CacheLimpieza(config['database_dir'] / "cache_limpieza.db")
+    try:
+        df_clean = limpieza_datos.limpiar_datos(df, cache, opciones['procesos'])
+    finally:
+        cache.cerrar()
+
+    limpieza_datos.generar_diccionario_datos(df_clean).to_csv(
+        config['output_data_dir'] / "diccionario_datos.csv", index=False, encoding='utf-8')
+    limpieza_datos.generar_ciudades_normalizadas().to_csv(
+        config['output_data_dir'] / "ciudades_normalizadas.csv", index=False, encoding='utf-8')
+    exportar_dataframe(df_clean, config['output_data_dir'] / "datos_limpios", opciones['formatos'])
+
+    print(f"Registros originales: {len(df)}, después de limpieza: {len(df_clean)}")
+    return df_clean
+
+def etapa_enriquecimiento(config, opciones, df_limpio):
+    """Fase 2: análisis exploratorio, enriquecimiento, visualizaciones y reportes"""
+    df_enriquecido = fase2_analisis.enriquecer_datos(df_limpio)
+    # El análisis usa los agregados de los datos enriquecidos (mismas filas), que reutilizan las gráficas
+    resultados_analisis = fase2_analisis.analisis_exploratorio(
+        df_limpio, obtener_agregados(df_enriquecido), aproximado=opciones['aproximado'], procesos=opciones['procesos'])
+    fase2_analisis.generar_visualizaciones(df_enriquecido, resultados_analisis, config['reports_dir'],
+                                          procesos=opciones['procesos'])
+    fase2_analisis.generar_reporte(resultados_analisis, config['reports_dir'])
+
+    exportar_dataframe(df_enriquecido, config['processed_data_dir'] / "datos_enriquecidos", opciones['formatos'])
+    return df_enriquecido
+
+def etapa_integracion(config, opciones, df_enriquecido):
+    """Fase 3: integración con fuentes externas y puntuación de riesgo"""
+    return fase3_integracion.integrar_datos_externos(df_enriquecido)
+
+def etapa_carga(config, opciones, df_integrado):
+    """Fase 3: base de datos, dashboards, monitorización y aplicación Streamlit"""
+    if not fase3_integracion.crear_base_datos(df_integrado, config['database_dir']):
+        raise RuntimeError("No se pudo crear la base de datos")
+    fase3_integracion.crear_dashboard_interactivo(df_integrado, config['dashboards_dir'])
+    fase3_integracion.crear_sistema_monitorizacion(df_integrado, config['database_dir'])
+    fase3_integracion.crear_app_streamlit(df_integrado, config['dashboards_dir'])
+
+    exportar_dataframe(df_integrado, config['processed_data_dir'] / "datos_integrados", opciones['formatos'])
+    return None
+
+# Grafo de etapas en orden de ejecución:
+# nombre -> (dependencias, función, módulos, esquema del resultado, opciones).
+# Los módulos son todos los del proyecto cuyo código ejecuta la etapa, también
+# los importados por sus módulos principales. Las opciones son las de la
+# ejecución que cambian lo que la etapa escribe (exportaciones, reportes) pero
+# no su resultado; procesos no cambia ninguna salida y no forma parte de la huella.
+# Una etapa sin esquema no produce un dataframe, solo efectos (base de datos, dashboards).
+ETAPAS = {
+    'limpieza': ((), etapa_limpieza,
+                 (limpieza_datos, resolucion_ciudades, duplicados, cache_limpieza, esquema_datos,
+                  exportaciones, perfilado),
+                 ESQUEMA_LIMPIOS, ('formatos',)),
+    'enriquecimiento': (('limpieza',), etapa_enriquecimiento,
+                        (fase2_analisis, agregados, resumenes_aproximados, esquema_datos, exportaciones, perfilado),
+                        ESQUEMA_ENRIQUECIDOS, ('aproximado', 'formatos')),
+    'integracion': (('enriquecimiento',), etapa_integracion,
+                    (fase3_integracion, agregados, carga_sqlite, esquema_datos, exportaciones, perfilado),
+                    ESQUEMA_INTEGRADOS, ()),
+    'carga': (('integracion',), etapa_carga,
+              (fase3_integracion, agregados, carga_sqlite, esquema_datos, exportaciones, perfilado),
+              None, ('formatos',)),
+}
+
+def huella_opciones(opciones, claves):
+    """Partes de la huella con los valores de las opciones indicadas (los formatos sin importar su orden)"""
+    partes = []
+    for clave in claves:
+        valor = opciones[clave]
+        if isinstance(valor, (tuple, list)):
+            valor = sorted(valor)
+        partes.append(f"{clave}={valor}")
+    return partes
+
+def calcular_huellas(config, opciones):
+    """Calcula la huella de cada etapa a partir de sus entradas, la versión de su código y sus opciones.
+
+    Las etapas dependientes usan la huella del resultado, sin las opciones: una
+    ejecución con otros formatos repite las exportaciones de cada etapa pero no
+    invalida las posteriores.
+    """
+    huellas_resultado, huellas = {}, {}
+    for nombre, (dependencias, _, modulos, _, claves_opciones) in ETAPAS.items():
+        entradas = [huellas_resultado[dependencia] for dependencia in dependencias]
+        if not dependencias:
+            entradas.append(huella_archivo(config['raw_data_dir'] / "BD.xlsx"))
+        # El propio orquestador forma parte del código de cada etapa
+        huellas_resultado[nombre] = huella(nombre, version_codigo(sys.modules[__name__], *modulos), *entradas)
+        huellas[nombre] = huella(huellas_resultado[nombre], *huella_opciones(opciones, claves_opciones))
+    return huellas
+
+def leer_estado(ruta_estado):
+    """Lee las huellas de las etapas completadas en ejecuciones anteriores"""
+    if not ruta_estado.exists():
+        return {}
+    try:
+        return json.loads(ruta_estado.read_text(encoding='utf-8'))
+    except json.JSONDecodeError:
+        return {}
+
+def guardar_estado(ruta_estado, estado):
+    """Guarda las huellas de las etapas completadas (reemplazo atómico del archivo)"""
+    ruta_temporal = ruta_estado.with_suffix('.tmp')
+    ruta_temporal.write_text(json.dumps(estado, indent=2, ensure_ascii=False), encoding='utf-8')
+    ruta_temporal.replace(ruta_estado)
+
+def ejecutar_pipeline(config, procesos=1, formatos=FORMATOS_EXPORTACION, forzar=False, aproximado=False):
+    """Ejecuta las etapas pendientes y omite las que tienen un resultado vigente en caché"""
+    opciones = {'procesos': procesos, 'formatos': formatos, 'aproximado': aproximado}
+    ruta_estado = config['cache_etapas_dir'] / "estado_etapas.json"
+    estado = {} if forzar else leer_estado(ruta_estado)
+    huellas = calcular_huellas(config, opciones)
+
+    def ruta_resultado(nombre):
+        return config['cache_etapas_dir'] / f"{nombre}.arrow"
+
+    def vigente(nombre):
+        esquema = ETAPAS[nombre][3]
+        return estado.get(nombre) == huellas[nombre] and (esquema is None or ruta_resultado(nombre).exists())
+
+    resultados = {}
+
+    def obtener(nombre):
+        # Los resultados en caché se leen solo cuando una etapa posterior los necesita
+        if nombre not in resultados:
+            print(f"  - Leyendo resultado de '{nombre}' desde la caché")
+            resultados[nombre] = leer_intercambio(ruta_resultado(nombre))
+        return resultados[nombre]
+
+    for nombre, (dependencias, funcion, _, esquema, _) in ETAPAS.items():
+        print("\n" + "=" * 60)
+        if vigente(nombre):
+            print(f"ETAPA '{nombre}': sin cambios (huella {huellas[nombre]}), se omite")
+            print("=" * 60)
+            continue
+
+        print(f"ETAPA '{nombre}': ejecutando (huella {huellas[nombre]})")
+        print("=" * 60)
+        entradas = [obtener(dependencia) for dependencia in dependencias]
+        with etapa(nombre, len(entradas[0]) if entradas else None) as medicion:
+            resultado = funcion(config, opciones, *entradas)
+            medicion.filas_salida = len(resultado) if resultado is not None else None
+
+        if esquema is not None:
+            guardar_intercambio(resultado, ruta_resultado(nombre), esquema)
+            resultados[nombre] = resultado
+
+        # La etapa se marca como completada solo después de guardar su resultado
+        estado[nombre] = huellas[nombre]
+        guardar_estado(ruta_estado, estado)
+
+    return huellas
+
+def main(procesos=1, formatos=FORMATOS_EXPORTACION, forzar=False, aproximado=False):
+    """Función principal del orquestador"""
+    print("=" * 60)
+    print("PIPELINE COMPLETO (FASES 1 A 3)")
+    print("=" * 60)
+
+    config = configurar_entorno()
+    if not (config['raw_data_dir'] / "BD.xlsx").exists():
+        print("No se encontró data/raw/BD.xlsx. Verifique la ruta y el formato.")
+        return
+
+    ejecutar_pipeline(config, procesos=procesos, formatos=formatos, forzar=forzar, aproximado=aproximado)
+
+    print("\n¡Pipeline completado exitosamente!")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pipeline completo (Fases 1 a 3) con caché por etapa")
+    parser.add_argument('--procesos', type=int, default=1,
+                        help="número de procesos para los pasos de limpieza por fila")
+    parser.add_argument('--formatos', type=parsear_formatos, default=FORMATOS_EXPORTACION,
+                        help="exportaciones a generar: csv, xlsx, csv,xlsx (por defecto) o ninguno")
+    parser.add_argument('--sin-exportaciones', dest='formatos', action='store_const', const=(),
+                        help="no exportar CSV ni XLSX intermedios")
+    parser.add_argument('--forzar', action='store_true',
+                        help="ignorar la caché y ejecutar todas las etapas")
+    parser.add_argument('--aproximado', action='store_true',
+                        help="análisis exploratorio con resúmenes aproximados (HyperLogLog y Space-Saving)")
+    parser.add_argument('--perfilar-memoria', action='store_true',
+                        help="medir el pico de memoria de Python de cada etapa con tracemalloc (más lento)")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="guardar un perfil de cProfile por etapa en reports/perfiles/")
+    args = parser.parse_args()
+
+    with Perfilador('pipeline', memoria=args.perfilar_memoria, cprofile=args.cprofile):
+        main(procesos=args.procesos, formatos=args.formatos, forzar=args.forzar,
+             aproximado=args.aproximado)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Ejecución incremental del pipeline (Fases 1 a 3)
+Objetivo: Procesar solo las filas de BD.xlsx insertadas o modificadas desde la
+última ejecución y aplicar las eliminaciones, de modo que una actualización
+diaria cueste en proporción al cambio y no al tamaño del archivo.
+
+Cada fila cruda se identifica por un hash de su contenido; los hashes ya
+procesados se guardan en la tabla estado_filas de empresas_colombia.db. Una
+fila modificada aparece como la eliminación de su hash anterior y la inserción
+del nuevo. Las empresas descartadas como duplicadas no reaparecen si se borra
+la fila que se conservó: para eso se necesita una recarga completa (--completa).
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "data"))
+
+import limpieza_datos
+import fase2_analisis
+import fase3_integracion
+from cache_limpieza import CacheLimpieza
+
+def calcular_hashes_filas(df):
+    """Calcula un hash de 64 bits del contenido de cada fila (como entero con signo para SQLite)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+
+def leer_estado(ruta_db):
+    """Lee los hashes de las filas procesadas en ejecuciones anteriores"""
+    if not Path(ruta_db).exists():
+        return set()
+
+    conexion = sqlite3.connect(ruta_db)
+    try:
+        existe = conexion.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estado_filas'"
+        ).fetchone()
+        if existe is None:
+            return set()
+        return {fila[0] for fila in conexion.execute("SELECT hash_fila FROM estado_filas")}
+    finally:
+        conexion.close()
+
+def calcular_delta(df, hashes_previos):
+    """Separa las filas nuevas o modificadas y los hashes que ya no existen en origen"""
+    hashes = calcular_hashes_filas(df)
+    nuevas = ~pd.Series(hashes).isin(hashes_previos).to_numpy()
+
+    df_nuevas = df[nuevas].copy()
+    # El hash de contenido viaja como índice durante la limpieza
+    df_nuevas.index = hashes[nuevas]
+
+    hashes_eliminados = hashes_previos - set(hashes.tolist())
+    return df_nuevas, hashes_eliminados
+
+def limpiar_delta(df_nuevas, cache=None):
+    """Limpia las filas del delta y añade el hash de la fila de origen (el ID de empresa lo asigna la Fase 2)"""
+    df_limpio = limpieza_datos.limpiar_datos(df_nuevas, cache)
+
+    df_limpio['Hash_Fila'] = df_limpio.index.to_numpy()
+    return df_limpio.reset_index(drop=True)
+
+def main(completa=False):
+    """Función principal de la ejecución incremental"""
+    print("=" * 60)
+    print("EJECUCIÓN INCREMENTAL DEL PIPELINE (FASES 1 A 3)")
+    print("=" * 60)
+
+    config = fase3_integracion.configurar_entorno()
+    ruta_db = config['database_dir'] / "empresas_colombia.db"
+
+    df = limpieza_datos.cargar_datos(config['base_dir'] / "data" / "raw" / "BD.xlsx")
+    if df is None:
+        print("No se pudo cargar el archivo. Verifique la ruta y el formato.")
+        return
+
+    hashes_previos = set() if completa else leer_estado(ruta_db)
+    completa = completa or not hashes_previos
+
+    df_nuevas, hashes_eliminados = calcular_delta(df, hashes_previos)
+
+    print(f"\nFilas en origen: {len(df)}")
+    print(f"Filas nuevas o modificadas: {len(df_nuevas)}")
+    print(f"Filas eliminadas o modificadas: {len(hashes_eliminados)}")
+    if completa:
+        print("Sin estado previo: se hará una carga completa")
+
+    if len(df_nuevas) == 0 and not hashes_eliminados:
+        print("\nNo hay cambios desde la última ejecución.")
+        return
+
+    # Fase 1: limpieza del delta
+    cache = CacheLimpieza(config['database_dir'] / "cache_limpieza.db")
+    try:
+        df_limpio = limpiar_delta(df_nuevas, cache)
+    finally:
+        cache.cerrar()
+
+    # Fase 2: enriquecimiento del delta
+    df_enriquecido = fase2_analisis.enriquecer_datos(df_limpio)
+
+    # Fase 3: integración, puntuación de riesgo y carga del delta
+    df_integrado = fase3_integracion.integrar_datos_externos(df_enriquecido)
+    if not fase3_integracion.aplicar_delta_base_datos(
+        df_integrado,
+        hashes_insertados=set(df_nuevas.index.tolist()),
+        hashes_eliminados=hashes_eliminados,
+        database_dir=config['database_dir'],
+        completa=completa
+    ):
+        print("\nLa base de datos no se modificó.")
+        return
+
+    print("\n¡Ejecución incremental completada exitosamente!")
+
+if __name__ == "__main__":
+    main(completa='--completa' in sys.argv[1:])
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Resúmenes aproximados combinables (sketches) para el análisis exploratorio
+HyperLogLog estima el número de valores distintos y Space-Saving los valores
+más frecuentes con memoria fija, independiente del número de filas. Ambos se
+actualizan bloque a bloque y se combinan entre sí, de modo que cada proceso
+puede resumir una parte de los datos y el resultado se obtiene uniendo los
+resúmenes parciales, con cotas de error conocidas.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+# Bits del hash que eligen el registro de HyperLogLog (2**14 registros, ~0.8% de error estándar)
+PRECISION_HLL = 14
+
+# Contadores de Space-Saving (cota de error por valor: filas resumidas / capacidad)
+CAPACIDAD_SPACE_SAVING = 1_000
+
+def hash_valores(valores):
+    """Hash de 64 bits de cada valor (Series) o de cada fila (DataFrame), igual en todos los procesos"""
+    return pd.util.hash_pandas_object(valores, index=False).to_numpy(dtype=np.uint64)
+
+class HyperLogLog:
+    """Estimador de valores distintos con 2**precision registros de 8 bits"""
+
+    def __init__(self, precision=PRECISION_HLL):
+        self.precision = precision
+        self.registros = np.zeros(1 << precision, dtype=np.uint8)
+
+    def actualizar(self, valores):
+        """Añade un bloque de valores (Series o DataFrame; cada fila de un DataFrame es un valor)"""
+        hashes = hash_valores(valores)
+        if len(hashes) == 0:
+            return self
+        bits_resto = 64 - self.precision
+        indices = (hashes >> np.uint64(bits_resto)).astype(np.intp)
+        resto = hashes & np.uint64((1 << bits_resto) - 1)
+        # Posición del primer bit 1 del resto: frexp es exacto porque el resto cabe en la mantisa
+        _, longitud = np.frexp(resto.astype(np.float64))
+        rango = (bits_resto - longitud + 1).astype(np.uint8)
+        np.maximum.at(self.registros, indices, rango)
+        return self
+
+    def combinar(self, otro):
+        """Une otro resumen con la misma precisión (máximo registro a registro)"""
+        if otro.precision != self.precision:
+            raise ValueError("Solo se pueden combinar resúmenes HyperLogLog con la misma precisión")
+        np.maximum(self.registros, otro.registros, out=self.registros)
+        return self
+
+    def estimar(self):
+        """Número estimado de valores distintos"""
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimacion = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(np.int64)))
+        vacios = int(np.count_nonzero(self.registros == 0))
+        # Corrección para cardinalidades pequeñas (conteo lineal)
+        if estimacion <= 2.5 * m and vacios > 0:
+            estimacion = m * math.log(m / vacios)
+        return int(round(estimacion))
+
+    def error_relativo(self):
+        """Error relativo estándar de la estimación"""
+        return 1.04 / math.sqrt(len(self.registros))
+
+class SpaceSaving:
+    """Resumen Space-Saving de los valores más frecuentes con un número fijo de contadores.
+
+    Cada contador guarda (conteo, error): el conteo sobreestima la frecuencia real
+    y conteo - error la subestima. Un valor sin contador aparece como mucho
+    minimo() veces, y el error de cualquier valor no supera filas / capacidad.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_SPACE_SAVING):
+        self.capacidad = capacidad
+        self.contadores = {}
+        self.filas = 0
+
+    def minimo(self):
+        """Cota superior de la frecuencia de un valor sin contador"""
+        if len(self.contadores) < self.capacidad:
+            return 0
+        return min(conteo for conteo, _ in self.contadores.values())
+
+    def actualizar(self, conteos):
+        """Añade un bloque ya agregado (Series valor -> número de filas del bloque)"""
+        bloque = SpaceSaving(self.capacidad)
+        bloque.contadores = {valor: (int(conteo), 0) for valor, conteo in conteos.items() if conteo > 0}
+        bloque.filas = int(conteos.sum())
+        return self.combinar(bloque, exacto=True)
+
+    def combinar(self, otro, exacto=False):
+        """Une otro resumen: suma los contadores comunes y conserva los de mayor conteo.
+
+        exacto: los contadores de otro son frecuencias exactas (bloque completo).
+        """
+        minimo_propio = self.minimo()
+        minimo_otro = 0 if exacto else otro.minimo()
+        unidos = {}
+        for valor in self.contadores.keys() | otro.contadores.keys():
+            conteo_a, error_a = self.contadores.get(valor, (minimo_propio, minimo_propio))
+            conteo_b, error_b = otro.contadores.get(valor, (minimo_otro, minimo_otro))
+            unidos[valor] = (conteo_a + conteo_b, error_a + error_b)
+
+        if len(unidos) > self.capacidad:
+            unidos = dict(sorted(unidos.items(), key=lambda par: par[1][0], reverse=True)[:self.capacidad])
+        self.contadores = unidos
+        self.filas += otro.filas
+        return self
+
+    def top(self, n=10):
+        """Los n valores con mayor conteo estimado: lista de (valor, conteo, error)"""
+        ordenados = sorted(self.contadores.items(), key=lambda par: par[1][0], reverse=True)[:n]
+        return [(valor, conteo, error) for valor, (conteo, error) in ordenados]
+
+    def cota_error(self):
+        """Cota del error de cualquier conteo (filas resumidas / capacidad)"""
+        return self.filas / self.capacidad